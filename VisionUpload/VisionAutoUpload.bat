@@ -1,5 +1,5 @@
 @ECHO OFF
 
-python C:\Users\craig\source\repos\VisionUpload\VisionUpload\VisionUpload.py
+python C:\Users\craig\source\repos\VisionUpload\VisionUpload\VisionUpload.py %*
 
 PAUSE
\ No newline at end of file
@@ -7,19 +7,62 @@ import os
 import time
 import datetime
 import logging
-from tkinter import filedialog, Tk
-
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from selenium.common.exceptions import (
-    TimeoutException,
-    NoSuchElementException,
-    WebDriverException,
+import argparse
+import threading
+from contextlib import nullcontext
+from collections import namedtuple
+
+from scan_index import ScanFile, scan_folder, iter_date_folders, summarize
+from upload_ledger import UploadLedger, LEDGER_FILENAMES, relative_path
+from http_engine import (
+    VisionHttpClient,
+    VisionHttpError,
+    cookies_from_driver,
+    cookies_from_file,
+    upload_scan_file_http,
+)
+from chunked_upload import CHUNKED_UPLOAD_THRESHOLD, upload_scan_file_resumable
+from phase_metrics import (
+    METRICS_PATH,
+    MetricsRecorder,
+    NULL_TIMER,
+    estimate_upload_hours,
+)
+from folder_watcher import StabilityTracker, create_watcher
+from job_scheduler import (
+    SCHEDULE_POLICIES,
+    SCHEDULE_POLICY,
+    BATCH_MAX_FILES,
+    BATCH_MAX_BYTES,
+    JobScheduler,
+)
+from vision_preflight import find_mismatches, log_mismatches, filter_mismatched
+from bandwidth_control import (
+    WORKING_HOURS,
+    BandwidthCap,
+    ConcurrencyController,
+    TokenBucket,
+)
+from staging_cache import PREFETCH_COUNT, StagingCache
+from progress_monitor import UploadProgress, ProgressDisplay, start_progress_server
+from upload_plan import LeaseBoard, default_lease_dir, read_plan, write_plan
+from session_health import SESSION_RSS_LIMIT
+from upload_reconcile import (
+    REUPLOAD_KINDS,
+    UnrecognisedListingError,
+    reconcile,
+    remote_files,
+    log_discrepancies,
+)
+from e57_integrity import E57_EXTENSION, check_scan_files, full_checksums_available
+from upload_recovery import (
+    FAILURE_FATAL,
+    FAILURE_NETWORK,
+    FAILURE_UNKNOWN,
+    BACKOFF_BASE,
+    UploadFailedError,
+    backoff_delay,
+    classify_http_error,
 )
 
 # ------------------------- Configuration & Constants -------------------------
@@ -32,20 +75,22 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
 )
 
-# Centralized selectors and constants.
-SELECTORS = {
-    "create_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Create']]",
-    "continue_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Continue']]",
-    "save_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Save']]",
-    "date_label": "//label[normalize-space(.)='Date *']/following-sibling::input",
-    "module_dropdown": "//*[@data-vv-name and normalize-space(@data-vv-name)='Module']",
-    "survey_dropdown": "//*[@data-vv-name and normalize-space(@data-vv-name)='Survey']",
-    "upload_area": "//div[contains(concat(' ', normalize-space(@class), ' '), ' drop ')]",
-}
-
 MODULE_TEXT = "Module"
 VISION_URL = "http://gdi.vision"
 UPLOADED_LOG_FILENAME = "uploaded.log"
+WORKER_COUNT = os.cpu_count() or 1  # Number of parallel upload workers
+UPLOAD_ENGINE = "browser"  # "browser" drives the web form; "http" posts files directly
+APP_DIR = os.path.join(os.path.expanduser("~"), ".vision_upload")
+SESSION_COOKIES_PATH = os.path.join(APP_DIR, "session_cookies.json")
+STAGING_DIR = os.path.join(APP_DIR, "staging")
+# A single unit of upload work handed to a worker by the job scheduler.
+UploadJob = namedtuple(
+    "UploadJob",
+    ["survey", "level", "scan_date", "file_path", "rel_path", "size", "mtime"],
+)
+
+# Bookkeeping files that are never scans and never uploaded.
+IGNORED_FILENAMES = (UPLOADED_LOG_FILENAME,) + LEDGER_FILENAMES
 
 # ------------------------- Helper Functions -------------------------
 
@@ -56,369 +101,1246 @@ def debug_pause(message="DEBUG MODE: Press Enter to continue..."):
         input(message)
 
 
-def wait_for_element(driver, by, value, timeout=10):
-    """Waits for an element to be present and returns it."""
-    return WebDriverWait(driver, timeout).until(
-        EC.presence_of_element_located((by, value))
-    )
+def retry_action(action, retries=3, delay=BACKOFF_BASE, classify=None, recover=None):
+    """
+    Tries to perform an action up to 'retries' times before failing.
+    Each failure is sorted into a kind by classify(error), if given. Fatal
+    failures are not retried; otherwise the next attempt waits an exponentially
+    growing, jittered delay and then calls recover(kind) to reset any state the
+    failure left behind. Raises UploadFailedError with the last failure's kind.
+    """
+    kind = FAILURE_UNKNOWN
+    for attempt in range(retries):
+        try:
+            return action()
+        except Exception as e:
+            kind = classify(e) if classify is not None else FAILURE_UNKNOWN
+            logging.warning("Attempt %d failed (%s): %s", attempt + 1, kind, e)
+            if kind == FAILURE_FATAL or attempt == retries - 1:
+                raise UploadFailedError(
+                    "Action failed after {} attempts.".format(attempt + 1), kind
+                ) from e
+            time.sleep(backoff_delay(attempt, delay))
+            if recover is not None:
+                try:
+                    recover(kind)
+                except Exception as recover_error:
+                    logging.warning("Recovery failed: %s", recover_error)
 
 
-def wait_for_clickable(driver, by, value, timeout=10):
-    """Waits for an element to be clickable and returns it."""
-    return WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((by, value)))
+# ------------------------- Parallel Upload Workers -------------------------
 
 
-def drop_file(driver, file_path, target, offsetX=0, offsetY=0):
+class HttpUploader:
     """
-    Simulates drag-and-drop file upload by injecting a hidden file input.
+    Uploads jobs straight to Vision's HTTP endpoints with a shared client.
+    Large files go up in resumable chunks tracked in the ledger.
     """
-    JS_DROP_FILE = (
-        "var target = arguments[0],"
-        "    offsetX = arguments[1],"
-        "    offsetY = arguments[2],"
-        "    document = target.ownerDocument || document,"
-        "    window = document.defaultView || window;"
-        "var input = document.createElement('INPUT');"
-        "input.type = 'file';"
-        "input.style.display = 'none';"
-        "input.onchange = function () {"
-        "  var rect = target.getBoundingClientRect(),"
-        "      x = rect.left + (offsetX || (rect.width >> 1)),"
-        "      y = rect.top + (offsetY || (rect.height >> 1)),"
-        "      dataTransfer = { files: this.files };"
-        "  ['dragenter', 'dragover', 'drop'].forEach(function (name) {"
-        "    var evt = document.createEvent('MouseEvent');"
-        "    evt.initMouseEvent(name, true, true, window, 0, 0, 0, x, y, false, false, false, false, 0, null);"
-        "    evt.dataTransfer = dataTransfer;"
-        "    target.dispatchEvent(evt);"
-        "  });"
-        "  setTimeout(function () { document.body.removeChild(input); }, 25);"
-        "};"
-        "document.body.appendChild(input);"
-        "return input;"
+
+    def __init__(self, client, ledger, module_text=MODULE_TEXT):
+        self.client = client
+        self.ledger = ledger
+        self.module_text = module_text
+
+    def open_level(self, survey, level):
+        pass  # Records carry their level; there is no page to navigate to.
+
+    def upload(self, job, timer=NULL_TIMER):
+        if job.size >= CHUNKED_UPLOAD_THRESHOLD:
+            upload_scan_file_resumable(
+                self.client,
+                self.ledger,
+                (job.rel_path, job.size, job.mtime),
+                job.file_path,
+                job.size,
+                job.scan_date,
+                self.module_text,
+                job.survey,
+                job.level,
+                timer=timer,
+            )
+            return
+        upload_scan_file_http(
+            self.client,
+            job.file_path,
+            job.size,
+            job.scan_date,
+            self.module_text,
+            job.survey,
+            job.level,
+            timer=timer,
+        )
+
+    def limit_bandwidth(self, rate):
+        pass  # The client's shared TokenBucket enforces the cap for all uploads.
+
+    def classify(self, error):
+        return classify_http_error(error)
+
+    def recover(self, kind):
+        if kind == FAILURE_NETWORK:
+            # Idle keep-alive connections may have been dropped along the way.
+            self.client.pool.close()
+
+    def close(self):
+        pass  # The client is shared and closed by its owner.
+
+
+def dead_letter(uploader, job, ledger, worker_id, error, recover=True):
+    """
+    Records a file that failed every retry in the ledger's dead-letter queue,
+    then recovers the uploader (if recover is set) so the next file starts
+    from a clean state. Returns False if the uploader could not be recovered.
+    """
+    kind = getattr(error, "kind", FAILURE_UNKNOWN)
+    ledger.record_failure(job.rel_path, job.size, job.mtime, error)
+    ledger.add_dead_letter(
+        job.rel_path,
+        job.size,
+        job.mtime,
+        job.survey,
+        job.level,
+        job.scan_date,
+        kind,
+        error.__cause__ or error,
     )
+    if not recover:
+        return True
     try:
-        input_element = driver.execute_script(JS_DROP_FILE, target, offsetX, offsetY)
-        input_element.send_keys(file_path)
-    except WebDriverException as e:
-        logging.error("Error dropping file: %s", e)
-        raise
+        uploader.recover(kind)
+        return True
+    except Exception as e:
+        logging.warning("[Worker %d] Could not recover after failure: %s", worker_id, e)
+        return False
+
+
+def upload_worker(
+    uploader,
+    scheduler,
+    worker_id,
+    ledger,
+    recorder=None,
+    controller=None,
+    bandwidth_share=None,
+    staging=None,
+    progress=None,
+    leases=None,
+    batch=None,
+):
+    """
+    Takes upload jobs from the shared JobScheduler until none are left and
+    runs the full upload sequence for each one with this worker's uploader.
+    Files that fail every retry are queued as dead letters for --replay-failed.
+    Phase timings are written to recorder if one is given. Each upload waits
+    for a slot from controller, if given, and is limited to the rate returned
+    by bandwidth_share(). With a StagingCache, files are uploaded from their
+    staged copy when one is ready. Finished files are counted in progress.
+    With a LeaseBoard, only jobs this node can claim are uploaded.
+    If batch is (max_files, max_bytes), files of one date folder are uploaded
+    together into one record; a batch that fails is retried one file at a time.
+    """
+    current_level = None
+    singles = []  # Jobs of a failed batch, to be uploaded one per record
+    while True:
+        if singles:
+            jobs = [singles.pop(0)]
+        elif batch is not None:
+            jobs = scheduler.next_batch(worker_id, *batch)
+        else:
+            job = scheduler.next_job(worker_id)
+            jobs = [job] if job is not None else []
+        if not jobs:
+            return
+        if leases is not None:
+            claimed = []
+            for job in jobs:
+                try:
+                    if leases.claim(job):
+                        claimed.append(job)
+                    elif progress is not None:
+                        # Finished or being uploaded by another machine.
+                        progress.discard_job(job)
+                except OSError as e:
+                    logging.error(
+                        "[Worker %d] Could not claim '%s': %s",
+                        worker_id,
+                        job.rel_path,
+                        e,
+                    )
+                    dead_letter(uploader, job, ledger, worker_id, e, recover=False)
+                    if progress is not None:
+                        progress.start_file(job)
+                        progress.finish_file(job, ok=False)
+            jobs = claimed
+            if not jobs:
+                continue
+        job = jobs[0]
+        if len(jobs) == 1:
+            scan_file = os.path.basename(job.file_path)
+            label = job.file_path
+        else:
+            scan_file = label = "%d files in %s" % (
+                len(jobs),
+                os.path.dirname(job.file_path),
+            )
+        size = sum(job.size for job in jobs)
+        if progress is not None:
+            for job in jobs:
+                progress.start_file(job)
+
+        if (job.survey, job.level) != current_level:
+            try:
+                retry_action(
+                    lambda: uploader.open_level(job.survey, job.level),
+                    classify=uploader.classify,
+                    recover=uploader.recover,
+                )
+                current_level = (job.survey, job.level)
+            except UploadFailedError as e:
+                logging.error(
+                    "[Worker %d] Skipping '%s' as level '%s' could not be opened: %s",
+                    worker_id,
+                    scan_file,
+                    job.level,
+                    e.__cause__,
+                )
+                current_level = None
+                for job in jobs:
+                    dead_letter(uploader, job, ledger, worker_id, e)
+                    if progress is not None:
+                        progress.finish_file(job, ok=False)
+                    if leases is not None:
+                        leases.release(job)
+                continue
+
+        logging.info("[Worker %d] Uploading file: %s", worker_id, label)
+        for job in jobs:
+            ledger.record_attempt(job.rel_path, job.size, job.mtime)
+        timer = recorder.timer(label, size, len(jobs)) if recorder else NULL_TIMER
+
+        upload_jobs = jobs
+
+        def attempt():
+            timer.next_attempt()
+            try:
+                if len(upload_jobs) == 1:
+                    uploader.upload(upload_jobs[0], timer)
+                else:
+                    uploader.upload_batch(upload_jobs, timer)
+            except Exception as e:
+                if controller is not None:
+                    controller.record_failure(uploader.classify(e))
+                raise
 
+        def recover(kind):
+            with timer.phase("retry"):
+                uploader.recover(kind)
 
-def login_to_vision(driver, url):
+        try:
+            if staging is not None:
+                with timer.phase("stage"):
+                    upload_jobs = [
+                        job._replace(file_path=staging.acquire(job)) for job in jobs
+                    ]
+            with controller.slot() if controller is not None else nullcontext():
+                if bandwidth_share is not None:
+                    uploader.limit_bandwidth(bandwidth_share())
+                # Use retry_action to recover from intermittent issues.
+                retry_action(
+                    attempt, retries=3, classify=uploader.classify, recover=recover
+                )
+            # Log the successful upload.
+            for job in jobs:
+                ledger.record_success(job.rel_path, job.size, job.mtime)
+                if leases is not None:
+                    leases.complete(job)
+                if progress is not None:
+                    progress.finish_file(job, ok=True)
+            timer.finish(ok=True)
+            if controller is not None:
+                controller.record_success(size)
+        except Exception as e:
+            timer.finish(ok=False)
+            if leases is not None:
+                for job in jobs:
+                    leases.release(job)
+            if len(jobs) > 1:
+                logging.warning(
+                    "[Worker %d] Batch upload of %s failed (%s); uploading its files one at a time",
+                    worker_id,
+                    label,
+                    e.__cause__ or e,
+                )
+                if progress is not None:
+                    for job in jobs:
+                        progress.retry_file(job)
+                singles.extend(jobs)
+                try:
+                    uploader.recover(getattr(e, "kind", FAILURE_UNKNOWN))
+                except Exception as recover_error:
+                    logging.warning(
+                        "[Worker %d] Could not recover after failure: %s",
+                        worker_id,
+                        recover_error,
+                    )
+                    current_level = None
+                continue
+            if progress is not None:
+                progress.finish_file(job, ok=False)
+            logging.error(
+                "[Worker %d] Error uploading file '%s': %s",
+                worker_id,
+                scan_file,
+                e.__cause__ or e,
+            )
+            if not dead_letter(uploader, job, ledger, worker_id, e):
+                current_level = None
+            continue
+        finally:
+            if staging is not None:
+                for job in jobs:
+                    staging.release(job)
+
+        # Optional pause for manual inspection (only when debug mode is on)
+        debug_pause("File uploaded. Press Enter to continue with the next file...")
+
+
+def run_upload_pool(
+    uploaders,
+    jobs,
+    ledger,
+    recorder=None,
+    policy=SCHEDULE_POLICY,
+    controller=None,
+    cap=None,
+    staging=None,
+    progress=None,
+    leases=None,
+    batch=None,
+):
     """
-    Navigates to the Vision login page and waits for the user to log in manually.
+    Uploads all jobs in parallel, with one worker thread per uploader taking
+    jobs from a shared scheduler that keeps each worker on its open level.
+    If a ConcurrencyController is given, it decides how many of the workers
+    upload at once; a BandwidthCap is split evenly between those uploads.
+    A StagingCache, if given, prefetches the next files to local disk.
+    With batch as (max_files, max_bytes), each date folder goes in one record.
     """
-    driver.get(url)
-    logging.info("Navigated to %s", url)
-    input("Log in to Vision and then press Enter to continue...")  # Manual login step
+    scheduler = JobScheduler(jobs, policy)
+
+    def bandwidth_share():
+        rate = cap.rate()
+        if not rate:
+            return None
+        return rate / (controller.limit if controller is not None else len(uploaders))
+
+    logging.info("Uploading %d files using %d workers", len(jobs), len(uploaders))
+
+    threads = [
+        threading.Thread(
+            target=upload_worker,
+            args=(
+                uploader,
+                scheduler,
+                worker_id,
+                ledger,
+                recorder,
+                controller,
+                bandwidth_share if cap is not None else None,
+                staging,
+                progress,
+                leases,
+                batch,
+            ),
+            name=f"upload-worker-{worker_id}",
+            daemon=True,
+        )
+        for worker_id, uploader in enumerate(uploaders)
+    ]
+    if staging is not None:
+        staging.start(scheduler)
+    if leases is not None:
+        leases.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if leases is not None:
+        leases.stop()
+    if staging is not None:
+        staging.stop()
+
 
+# ------------------------- New Helper Functions for Folder Summary & Validation -------------------------
 
-def navigate_to_level(driver, level_dir):
+
+def print_directory_tree(index):
+    """
+    Prints a tree-view of the scanned directory structure, excluding any log files.
     """
-    Attempts to locate and click on a level button (i.e. Deck) on the Vision page.
+    print("\nFolder Structure Summary:")
+
+    def print_folder(node, level):
+        indent = " " * 4 * level
+        print(f"{indent}{node.name}/")
+        subindent = " " * 4 * (level + 1)
+        for f in node.files:
+            if f.name in IGNORED_FILENAMES:
+                continue  # Skip printing log files
+            print(f"{subindent}{f.name}")
+        for folder in node.folders.values():
+            print_folder(folder, level + 1)
+
+    print_folder(index, 0)
+    print()  # Extra newline at the end
+
+
+def validate_folder_structure(index):
+    """
+    Validates that the scanned folder structure matches the expected layout:
+      Parent Folder
+          └── Survey Folder(s)
+                   └── Level Folder(s)
+                             └── Date Folder(s) (name in ddmmyy format)
+                                        └── Scan files (excluding log files)
+    Returns True if valid; otherwise False.
     """
+    valid = True
+    if not index.folders:
+        logging.error("No survey directories found in the parent folder.")
+        valid = False
+
+    for survey, survey_node in index.folders.items():
+        if not survey_node.folders:
+            logging.error("Survey '%s' does not contain any level directories.", survey)
+            valid = False
+            continue
+        for level, level_node in survey_node.folders.items():
+            if not level_node.folders:
+                logging.error(
+                    "Level '%s' in survey '%s' does not contain any date directories.",
+                    level,
+                    survey,
+                )
+                valid = False
+                continue
+            for date_dir, date_node in level_node.folders.items():
+                # Check for correct date format (ddmmyy)
+                if parse_date_folder(date_dir) is None:
+                    logging.error(
+                        "Directory '%s' in level '%s' of survey '%s' is not in ddmmyy format.",
+                        date_dir,
+                        level,
+                        survey,
+                    )
+                    valid = False
+                    continue
+                # Exclude the uploaded log file from scan files
+                scan_files = [
+                    f for f in date_node.files if f.name not in IGNORED_FILENAMES
+                ]
+                if not scan_files:
+                    logging.error(
+                        "Date directory '%s' in level '%s' of survey '%s' does not contain any scan files.",
+                        date_dir,
+                        level,
+                        survey,
+                    )
+                    valid = False
+    return valid
+
+
+def parse_date_folder(date_dir):
+    """Returns the date encoded in a ddmmyy folder name, or None if it is invalid."""
     try:
-        level_button = wait_for_clickable(
-            driver, By.XPATH, f"//tr/td[contains(.,'{level_dir}')]"
-        )
-        level_button.click()
-        logging.info("Clicked on level '%s'", level_dir)
-    except TimeoutException:
-        logging.error("Level '%s' not found on the page.", level_dir)
-        raise
+        return datetime.datetime.strptime(date_dir, "%d%m%y").date()
+    except ValueError:
+        return None
+
+
+def job_for_file(root, scan_file):
+    """
+    Returns the UploadJob for a scan file found at Parent / Survey / Level /
+    Date / file, or None if the file is anywhere else or the date is invalid.
+    """
+    rel_path = relative_path(root, scan_file.path)
+    parts = rel_path.split("/")
+    if len(parts) != 4 or scan_file.name in IGNORED_FILENAMES:
+        return None
+    survey, level, date_dir, _ = parts
+    scan_date = parse_date_folder(date_dir)
+    if scan_date is None:
+        return None
+    return UploadJob(
+        survey=survey,
+        level=level,
+        scan_date=scan_date,
+        file_path=scan_file.path,
+        rel_path=rel_path,
+        size=scan_file.size,
+        mtime=scan_file.mtime,
+    )
 
 
-def select_date(driver, scan_date, current_date):
+# ------------------------- Watch Mode -------------------------
+
+
+def watch_folder(
+    root,
+    initial_jobs,
+    uploaders,
+    ledger,
+    recorder=None,
+    stable_seconds=60.0,
+    poll_interval=10.0,
+    force_polling=False,
+    verify=True,
+    policy=SCHEDULE_POLICY,
+    controller=None,
+    cap=None,
+    staging=None,
+    progress=None,
+    batch=None,
+):
     """
-    Selects the scan date by interacting with a Vuetify date-picker.
-    This version narrows the search for the day button to the date-picker table container.
+    Keeps running, uploading new scans as they appear under root with the
+    same (already logged-in) uploaders. A file is queued only once its size
+    and mtime have been stable for stable_seconds, and if verify is set, only
+    if it passes the integrity check. Stops on Ctrl+C.
     """
+    tracker = StabilityTracker(stable_seconds)
+    for job in initial_jobs:
+        tracker.observe(job.file_path, job.size, job.mtime)
+
+    watcher = create_watcher(root, poll_interval, force_polling)
+    logging.info("Watching for new scans. Press Ctrl+C to stop.")
     try:
-        # Click on the date input field.
-        date_input = wait_for_clickable(driver, By.XPATH, SELECTORS["date_label"])
-        driver.execute_script("arguments[0].click();", date_input)
-        logging.debug("Clicked on date input")
-
-        # Select the month/year header
-        header_button_xpath = (
-            "//div[contains(@class, 'v-date-picker-header__value')]//button"
-        )
-        header_button = wait_for_clickable(driver, By.XPATH, header_button_xpath)
-        header_button.click()
-        logging.debug("Clicked on month/year header")
+        while True:
+            for path in watcher.changed_dirs(timeout=poll_interval):
+                for scan_file in scan_folder(path).iter_files(IGNORED_FILENAMES):
+                    job = job_for_file(root, scan_file)
+                    if job is None or ledger.is_uploaded(
+                        job.rel_path, job.size, job.mtime
+                    ):
+                        continue
+                    tracker.observe(scan_file.path, scan_file.size, scan_file.mtime)
+
+            tracker.refresh()
+            jobs = []
+            for path, size, mtime in tracker.pop_ready():
+                scan_file = ScanFile(os.path.basename(path), path, size, mtime)
+                job = job_for_file(root, scan_file)
+                if job and not ledger.is_uploaded(job.rel_path, size, mtime):
+                    jobs.append(job)
+            if jobs and verify:
+                jobs = verify_jobs(jobs, ledger)
+            if jobs:
+                logging.info(
+                    "%d new scans are ready (%d still settling)",
+                    len(jobs),
+                    len(tracker),
+                )
+                if progress is not None:
+                    progress.add_jobs(jobs)
+                run_upload_pool(
+                    uploaders,
+                    jobs,
+                    ledger,
+                    recorder,
+                    policy,
+                    controller,
+                    cap,
+                    staging,
+                    progress,
+                    batch=batch,
+                )
+    except KeyboardInterrupt:
+        logging.info("Stopping watch mode.")
+    finally:
+        watcher.close()
 
-        # Wait for the year selector to appear
-        time.sleep(1.5)
 
-        # Click the header again if necessary to switch to the year selection view.
-        header_button = wait_for_clickable(driver, By.XPATH, header_button_xpath)
-        header_button.click()
-        logging.debug("Clicked on year header")
+# ------------------------- Main Process -------------------------
 
-        # Select the specific year for the scan date
-        year_str = scan_date.strftime("%Y")
-        year_xpath = f"//li[contains(.,'{year_str}')]"
-        year_button = wait_for_clickable(driver, By.XPATH, year_xpath)
-        year_button.click()
-        logging.debug("Selected scan year: %s", year_str)
 
-        # Select the desired month
-        month_str = scan_date.strftime("%b")
-        month_xpath = f"//button/div[contains(.,'{month_str}')]"
-        month_button = wait_for_clickable(driver, By.XPATH, month_xpath)
-        month_button.click()
-        logging.debug("Selected scan month: %s", month_str)
+def import_legacy_logs(index, ledger):
+    """Imports any old per-date uploaded.log files into the ledger (once each)."""
+    for _, _, date_node in iter_date_folders(index):
+        files = {f.name: f for f in date_node.files}
+        if UPLOADED_LOG_FILENAME in files:
+            imported = ledger.import_legacy_log(
+                files[UPLOADED_LOG_FILENAME].path, files
+            )
+            if imported:
+                logging.info(
+                    "Imported %d entries from %s",
+                    imported,
+                    files[UPLOADED_LOG_FILENAME].path,
+                )
+
+
+def build_jobs(index, ledger):
+    """Returns an UploadJob for every scan in the index not yet in the ledger."""
+    jobs = []
+    for survey_node, level_node, date_node in iter_date_folders(index):
+        scan_date = parse_date_folder(date_node.name)
+        if scan_date is None:
+            logging.error(
+                "Invalid date format for directory '%s'. Must be ddmmyy. Skipping...",
+                date_node.name,
+            )
+            continue
 
-        # Prepare the day string without any leading zero.
-        day_str = scan_date.strftime("%d").lstrip("0")
-        logging.debug("Looking for day: %s", day_str)
+        # Queue each scan file in the date directory.
+        for scan_file in date_node.files:
+            if scan_file.name in IGNORED_FILENAMES:
+                continue
+            rel_path = relative_path(index.path, scan_file.path)
+            if ledger.is_uploaded(rel_path, scan_file.size, scan_file.mtime):
+                logging.info("File '%s' already uploaded. Skipping...", scan_file.name)
+                continue
+            jobs.append(
+                UploadJob(
+                    survey=survey_node.name,
+                    level=level_node.name,
+                    scan_date=scan_date,
+                    file_path=scan_file.path,
+                    rel_path=rel_path,
+                    size=scan_file.size,
+                    mtime=scan_file.mtime,
+                )
+            )
+    return jobs
 
-        # Narrow the scope to only elements inside the date-picker table container.
-        day_button_xpath = f"//div[contains(@class, 'v-date-picker-table--date')]//button[.//div[text()='{day_str}']]"
-        day_button = wait_for_clickable(driver, By.XPATH, day_button_xpath)
-        day_button.click()
-        logging.debug("Selected scan day: %s", day_str)
 
-    except TimeoutException as e:
-        logging.error("Timeout while selecting date: %s", e)
-        raise
+def verify_jobs(jobs, ledger):
+    """
+    Checks the integrity of every scan about to be uploaded, in parallel,
+    reusing cached results for files that have not changed since they were
+    last checked. Files that only passed a sampled check are checked again
+    once full checksums are available. Damaged files are reported and left
+    out of the returned jobs.
+    """
+    full_checks = full_checksums_available()
+    cached = ledger.integrity_results(sampled_passes=not full_checks)
+    unchecked = [
+        job
+        for job in jobs
+        if job.file_path.lower().endswith(E57_EXTENSION)
+        and (job.rel_path, job.size, job.mtime) not in cached
+    ]
+    if unchecked:
+        logging.info(
+            "Checking the integrity of %d scan files (%.2f GB)...",
+            len(unchecked),
+            sum(job.size for job in unchecked) / (1024**3),
+        )
+        started = time.monotonic()
+        problems = check_scan_files([job.file_path for job in unchecked])
+        results = {
+            (job.rel_path, job.size, job.mtime): problems[job.file_path]
+            for job in unchecked
+        }
+        ledger.record_integrity_results(results, sampled=not full_checks)
+        cached.update(results)
+        logging.info("Integrity check finished in %.1f s", time.monotonic() - started)
+
+    good_jobs, bad_jobs = [], []
+    for job in jobs:
+        if cached.get((job.rel_path, job.size, job.mtime)):
+            bad_jobs.append(job)
+        else:
+            good_jobs.append(job)
+    if bad_jobs:
+        logging.error(
+            "%d scan files are damaged and will not be uploaded:", len(bad_jobs)
+        )
+        for job in bad_jobs:
+            logging.error(
+                "  %s: %s", job.rel_path, cached[(job.rel_path, job.size, job.mtime)]
+            )
+    return good_jobs
 
 
-def select_module(driver, module_text):
+def saved_http_session(url, cookie_path):
     """
-    Finds the module dropdown, sends the module text, and confirms the selection.
+    Returns the session cookies saved in cookie_path if Vision still accepts
+    them over HTTP, so the HTTP engine can run without a browser, or None.
     """
+    cookies = cookies_from_file(cookie_path)
+    if not cookies:
+        return None
+    client = VisionHttpClient(url, cookies, pool_size=1)
     try:
-        dropdown = wait_for_clickable(driver, By.XPATH, SELECTORS["module_dropdown"])
-        dropdown.clear()
-        dropdown.send_keys(module_text)
-        logging.debug("Entered module text: %s", module_text)
-        dropdown.send_keys(Keys.RETURN)
-        logging.debug("Confirmed module selection")
-    except TimeoutException:
-        logging.error("Module dropdown not found.")
-        raise
+        client.list_levels()
+    except (VisionHttpError, OSError, ValueError) as e:
+        logging.debug("The saved session does not work over HTTP: %s", e)
+        return None
+    finally:
+        client.close()
+    logging.info("Reusing the saved Vision session without a browser")
+    return cookies
 
 
-def select_survey(driver, survey_text):
+def fetch_vision_catalog(driver, url, cookies=None):
     """
-    Finds the survey dropdown, sends the survey text, and confirms the selection.
+    Returns (levels, surveys) known to Vision, asked for in bulk over HTTP
+    with the session's cookies (by default the browser's), or scraped from
+    the page if that fails and there is a browser. The page only yields
+    levels, as reading the surveys there would leave a draft record behind.
     """
+    if cookies is None:
+        cookies = cookies_from_driver(driver)
+    client = VisionHttpClient(url, cookies, pool_size=1)
     try:
-        dropdown = wait_for_clickable(driver, By.XPATH, SELECTORS["survey_dropdown"])
-        dropdown.clear()
-        dropdown.send_keys(survey_text)
-        logging.debug("Entered survey text: %s", survey_text)
-        dropdown.send_keys(Keys.RETURN)
-        logging.debug("Confirmed survey selection")
-    except TimeoutException:
-        logging.error("Survey dropdown not found.")
-        raise
+        return client.list_levels(), client.list_surveys()
+    except (VisionHttpError, OSError, ValueError) as e:
+        logging.debug("Could not list levels and surveys over HTTP: %s", e)
+    finally:
+        client.close()
+    if driver is None:
+        return [], []
 
+    from vision_browser import scrape_vision_catalog
 
-def upload_scan_file(driver, file_path, scan_date, module_text, survey_text):
+    return scrape_vision_catalog(driver)
+
+
+def preflight_jobs(jobs, driver, url, proceed_answer=None, cookies=None):
     """
-    Executes the full sequence to upload a single scan file.
+    Checks every survey and level folder used by jobs against Vision before
+    anything is uploaded. Returns the jobs to upload: all of them if every
+    name matched, only those in matching folders if the user chooses to go
+    on, or None to stop. proceed_answer ("y" or "n") skips the question.
     """
-    current_date = datetime.datetime.now()
-
-    # Click the "Create" button (using the 3rd instance of the element, per original script)
-    try:
-        create_buttons = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.XPATH, SELECTORS["create_button"]))
-        )
-        if len(create_buttons) < 3:
-            raise Exception("Not enough 'Create' buttons found.")
-        create_button = create_buttons[2]
-        wait_for_element(driver, By.XPATH, SELECTORS["create_button"])
-        create_button.click()
-        logging.info("Clicked Create button")
-    except TimeoutException as e:
-        logging.error("Create button not clickable: %s", e)
-        raise
-
-    # Click the "Continue" button
-    try:
-        continue_button = wait_for_clickable(
-            driver, By.XPATH, SELECTORS["continue_button"]
+    levels, surveys = fetch_vision_catalog(driver, url, cookies)
+    if not levels and not surveys:
+        logging.warning(
+            "Could not read the survey and level names from Vision; skipping the preflight check."
         )
-        continue_button.click()
-        logging.info("Clicked Continue button")
-    except TimeoutException:
-        logging.error("Continue button not clickable.")
-        raise
+        return jobs
+    mismatches = find_mismatches(jobs, levels, surveys)
+    if not mismatches:
+        logging.info("All survey and level folders match Vision.")
+        return jobs
+
+    log_mismatches(mismatches)
+    remaining = filter_mismatched(jobs, mismatches)
+    proceed = proceed_answer or input(
+        f"Upload the other {len(remaining)} files and skip these folders? (y/n): "
+    )
+    if proceed.lower() != "y":
+        return None
+    return remaining
 
-    # Set the scan date using the date picker
-    select_date(driver, scan_date, current_date)
 
-    # Set the module field
-    select_module(driver, module_text)
+class RecordLister:
+    """
+    Reads the record list of a level in Vision: over HTTP with the session's
+    cookies (by default the browser's), or from the level's page if that
+    fails and there is a browser. Once the page turns out to have no record
+    list, it is not opened again for other levels.
+    """
+
+    def __init__(self, driver, url, cookies=None):
+        self.driver = driver
+        if cookies is None:
+            cookies = cookies_from_driver(driver)
+        self.client = VisionHttpClient(url, cookies, pool_size=1)
+        self.scrape = True
+
+    def files(self, level):
+        """
+        Returns the RemoteFiles on level. Raises UnrecognisedListingError if
+        the list is not in the expected form, or another error if it cannot
+        be read at all.
+        """
+        from vision_browser import scrape_level_records
+
+        if self.client is not None:
+            try:
+                return remote_files(self.client.list_records(level))
+            except (VisionHttpError, OSError, ValueError) as e:
+                if self.driver is None:
+                    raise
+                logging.debug("Could not list records over HTTP: %s", e)
+                self.client.close()
+                self.client = None
+        if not self.scrape:
+            raise UnrecognisedListingError("Vision shows no record list")
+        try:
+            return remote_files(scrape_level_records(self.driver, level))
+        except UnrecognisedListingError:
+            self.scrape = False
+            raise
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
 
-    # Set the survey field
-    select_survey(driver, survey_text)
 
-    # Locate the drop area (by class name) and drop the file
+def listable_levels(jobs, driver, url):
+    """
+    Returns the levels of jobs whose record list can be read from Vision, so
+    their saves can be confirmed by reconcile_jobs instead of waiting for the
+    save toast after every file. A level whose list cannot be read, is not
+    in the expected form or shows no files yet is left out, and keeps the
+    toast wait.
+    """
+    levels = sorted({job.level for job in jobs})
+    lister = RecordLister(driver, url)
+    listable = set()
     try:
-        drop_area = wait_for_clickable(driver, By.CLASS_NAME, "drop")
-        drop_file(driver, file_path, drop_area)
-        logging.info("Dropped file: %s", file_path)
-    except Exception as e:
-        logging.error("Error during file drop: %s", e)
-        raise
+        for level in levels:
+            try:
+                files = lister.files(level)
+            except UnrecognisedListingError as e:
+                logging.error(
+                    "The record list of level '%s' is not in a recognised form (%s); "
+                    "waiting for the save confirmation of each file there instead",
+                    level,
+                    e,
+                )
+            except Exception as e:
+                logging.warning(
+                    "Could not read the record list of level '%s' (%s); "
+                    "waiting for the save confirmation of each file there instead",
+                    level,
+                    e,
+                )
+            else:
+                # An empty list says nothing about whether files would show up.
+                if files:
+                    listable.add(level)
+    finally:
+        lister.close()
+    logging.info(
+        "Saves on %d of %d levels will be confirmed from their record lists",
+        len(listable),
+        len(levels),
+    )
+    return listable
 
-    # Wait until the upload completes (i.e. "Uploading" text is gone)
+
+def reconcile_jobs(jobs, ledger, driver, url, cookies=None):
+    """
+    Checks every uploaded job against the record list of its level in Vision,
+    read through a RecordLister. Files missing from Vision, or saved with the
+    wrong size, are marked failed and queued for --replay-failed; duplicates
+    are only reported. A level whose list cannot be read is reported as
+    unverified and left alone; one whose list is not in a recognised form is
+    reported as an error. Returns the Discrepancy list.
+    """
+    uploaded = [
+        job for job in jobs if ledger.is_uploaded(job.rel_path, job.size, job.mtime)
+    ]
+    by_level = {}
+    for job in uploaded:
+        by_level.setdefault(job.level, []).append(job)
+    logging.info(
+        "Reconciling %d uploaded files on %d levels with Vision",
+        len(uploaded),
+        len(by_level),
+    )
+
+    lister = RecordLister(driver, url, cookies)
+    discrepancies = []
+    unverified = 0
     try:
-        WebDriverWait(driver, 600).until_not(
-            EC.presence_of_element_located(
-                (By.XPATH, "//*[contains(text(),'Uploading')]")
-            )
+        for level, level_jobs in by_level.items():
+            # Without a trustworthy list nothing can be said about these
+            # files; treating them as missing would upload them twice.
+            try:
+                files = lister.files(level)
+            except UnrecognisedListingError as e:
+                logging.error(
+                    "The record list of level '%s' is not in a recognised form (%s); "
+                    "the saves of its %d files are unconfirmed",
+                    level,
+                    e,
+                    len(level_jobs),
+                )
+                unverified += len(level_jobs)
+                continue
+            except Exception as e:
+                logging.warning(
+                    "Could not verify the %d files on level '%s': %s",
+                    len(level_jobs),
+                    level,
+                    e,
+                )
+                unverified += len(level_jobs)
+                continue
+            if not files:
+                logging.warning(
+                    "Vision listed no files on level '%s'; its %d files could not be verified",
+                    level,
+                    len(level_jobs),
+                )
+                unverified += len(level_jobs)
+                continue
+            discrepancies.extend(reconcile(level_jobs, files))
+    finally:
+        lister.close()
+
+    for discrepancy in discrepancies:
+        if discrepancy.kind not in REUPLOAD_KINDS:
+            continue
+        job = discrepancy.job
+        key = (job.rel_path, job.size, job.mtime)
+        error = f"{discrepancy.kind} in Vision"
+        ledger.record_failure(*key, error)
+        ledger.add_dead_letter(
+            *key,
+            job.survey,
+            job.level,
+            job.scan_date,
+            discrepancy.kind,
+            error,
+        )
+    if len(uploaded) > unverified:
+        log_discrepancies(discrepancies, len(uploaded) - unverified)
+    if unverified:
+        logging.warning(
+            "%d uploaded files could not be verified and are still counted as uploaded",
+            unverified,
         )
-        logging.info("File upload completed for %s", file_path)
-    except TimeoutException:
-        logging.warning("Upload may be taking too long for file %s", file_path)
+    return discrepancies
 
-    # Click the "Save" button
-    try:
-        save_button = wait_for_clickable(driver, By.XPATH, SELECTORS["save_button"])
-        save_button.click()
-        logging.info("Clicked Save button for %s", file_path)
-    except TimeoutException:
-        logging.error("Save button not clickable for %s", file_path)
-        raise
-
-    # wait for toast saying Saved Successfully by checking for that text anywhere
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//*[contains(text(),'Successfully Saved')]")
+
+def ledger_jobs(root, ledger):
+    """
+    Returns an UploadJob for every file the ledger records as uploaded whose
+    path has the survey/level/date layout, without touching the folder tree.
+    """
+    jobs = []
+    for entry in ledger.uploaded_entries():
+        parts = entry.rel_path.split("/")
+        scan_date = parse_date_folder(parts[2]) if len(parts) == 4 else None
+        if scan_date is None:
+            continue
+        jobs.append(
+            UploadJob(
+                survey=parts[0],
+                level=parts[1],
+                scan_date=scan_date,
+                file_path=os.path.join(root, *parts),
+                rel_path=entry.rel_path,
+                size=entry.size,
+                mtime=entry.mtime,
             )
         )
-        logging.info("File saved successfully for %s", file_path)
-    except TimeoutException:
-        logging.error("Save confirmation not found for %s", file_path)
-        # raise
+    return jobs
 
-    time.sleep(5)  # Optional pause for the UI to stabilize
 
-
-def retry_action(action, retries=3, delay=2):
+def replay_jobs(root, ledger):
     """
-    Tries to perform an action up to 'retries' times before failing.
+    Returns an UploadJob for every file in the ledger's dead-letter queue that
+    is still on disk unchanged, without rescanning the folder tree. Files that
+    were deleted or have changed since are dropped from the queue; a changed
+    file is picked up by the next normal run instead.
     """
-    for attempt in range(retries):
+    jobs = []
+    for letter in ledger.dead_letters():
+        key = (letter.rel_path, letter.size, letter.mtime)
+        file_path = os.path.join(root, *letter.rel_path.split("/"))
         try:
-            return action()
-        except Exception as e:
-            logging.warning("Attempt %d failed: %s", attempt + 1, e)
-            time.sleep(delay)
-    raise Exception("Action failed after {} retries.".format(retries))
-
-
-# ------------------------- New Helper Functions for Folder Summary & Validation -------------------------
+            stat = os.stat(file_path)
+        except OSError:
+            logging.warning("'%s' no longer exists. Skipping...", letter.rel_path)
+            ledger.remove_dead_letter(*key)
+            continue
+        if (stat.st_size, stat.st_mtime) != (letter.size, letter.mtime):
+            logging.warning(
+                "'%s' has changed since it failed; it will be uploaded by a normal run.",
+                letter.rel_path,
+            )
+            ledger.remove_dead_letter(*key)
+            continue
+        if ledger.is_uploaded(*key):
+            ledger.remove_dead_letter(*key)
+            continue
+        logging.info(
+            "Replaying '%s' (failed with %s: %s)",
+            letter.rel_path,
+            letter.kind,
+            letter.error,
+        )
+        jobs.append(
+            UploadJob(
+                survey=letter.survey,
+                level=letter.level,
+                scan_date=letter.scan_date,
+                file_path=file_path,
+                rel_path=letter.rel_path,
+                size=letter.size,
+                mtime=letter.mtime,
+            )
+        )
+    return jobs
 
 
-def print_directory_tree(startpath):
+def plan_jobs(root, plan_path, ledger, leases):
     """
-    Prints a tree-view of the directory structure starting at startpath,
-    excluding any log files.
+    Returns an UploadJob for every file in the plan at plan_path that no node
+    has finished and that is still on disk unchanged. Files this machine has
+    already uploaded are marked finished for the other nodes.
     """
-    print("\nFolder Structure Summary:")
-    for root, dirs, files in os.walk(startpath):
-        level = root.replace(startpath, "").count(os.sep)
-        indent = " " * 4 * level
-        folder_name = os.path.basename(root) if os.path.basename(root) else startpath
-        print(f"{indent}{folder_name}/")
-        subindent = " " * 4 * (level + 1)
-        for f in files:
-            if f == UPLOADED_LOG_FILENAME:
-                continue  # Skip printing log files
-            print(f"{subindent}{f}")
-    print()  # Extra newline at the end
+    jobs = []
+    for entry in leases.unfinished(read_plan(plan_path, root)):
+        file_path = os.path.join(root, *entry.rel_path.split("/"))
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            logging.warning("'%s' no longer exists. Skipping...", entry.rel_path)
+            continue
+        if (stat.st_size, stat.st_mtime) != (entry.size, entry.mtime):
+            logging.warning(
+                "'%s' has changed since the plan was made. Skipping...",
+                entry.rel_path,
+            )
+            continue
+        job = UploadJob(
+            survey=entry.survey,
+            level=entry.level,
+            scan_date=entry.scan_date,
+            file_path=file_path,
+            rel_path=entry.rel_path,
+            size=entry.size,
+            mtime=entry.mtime,
+        )
+        if ledger.is_uploaded(job.rel_path, job.size, job.mtime):
+            leases.complete(job)
+            continue
+        jobs.append(job)
+    logging.info("%d files of the plan are left to upload", len(jobs))
+    return jobs
 
 
-def validate_folder_structure(parent_folder):
-    """
-    Validates that the folder structure matches the expected layout:
-      Parent Folder
-          └── Survey Folder(s)
-                   └── Level Folder(s)
-                             └── Date Folder(s) (name in ddmmyy format)
-                                        └── Scan files (excluding log files)
-    Returns True if valid; otherwise False.
-    """
-    valid = True
-    survey_dirs = [
-        d
-        for d in os.listdir(parent_folder)
-        if os.path.isdir(os.path.join(parent_folder, d))
-    ]
-    if not survey_dirs:
-        logging.error("No survey directories found in the parent folder.")
-        valid = False
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vision Automatic Scan Upload Script")
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        help="parent folder containing the survey folders (prompts if omitted)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("browser", "http"),
+        default=UPLOAD_ENGINE,
+        help="drive the web form, or send files straight to Vision's HTTP endpoints",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKER_COUNT,
+        help="maximum number of parallel upload workers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fixed-workers",
+        action="store_true",
+        help="always run every worker at once instead of adapting to the link",
+    )
+    parser.add_argument(
+        "--max-mbps",
+        type=float,
+        help="cap the total upload rate at this many MB/s during --cap-hours",
+    )
+    parser.add_argument(
+        "--cap-hours",
+        default=WORKING_HOURS,
+        help="weekday hours the --max-mbps cap applies, or 'always' (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stage-budget-gb",
+        type=float,
+        help="copy upcoming files to --stage-dir first, using at most this much space",
+    )
+    parser.add_argument(
+        "--stage-dir",
+        default=STAGING_DIR,
+        help="local folder for staged copies (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=PREFETCH_COUNT,
+        help="files to stage ahead of the uploads (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--progress-port",
+        type=int,
+        help="serve live progress on this local port at /progress (JSON) and /metrics (Prometheus)",
+    )
+    parser.add_argument(
+        "--form-fill",
+        choices=("fast", "picker"),
+        default="fast",
+        help="fill the form in one script call, or click through each widget",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="browser engine: upload the scans of each date folder into one record",
+    )
+    parser.add_argument(
+        "--batch-max-files",
+        type=int,
+        default=BATCH_MAX_FILES,
+        help="most files per --batch record (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-max-gb",
+        type=float,
+        default=BATCH_MAX_BYTES / 1024**3,
+        help="most data per --batch record (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--order",
+        choices=SCHEDULE_POLICIES,
+        default=SCHEDULE_POLICY,
+        help="order of the levels and files within them (default: %(default)s)",
+    )
+    parser.add_argument("--url", default=VISION_URL, help="Vision base URL")
+    parser.add_argument("--module", default=MODULE_TEXT, help="module to select")
+    parser.add_argument(
+        "--headless", action="store_true", help="run Chrome without a window"
+    )
+    parser.add_argument(
+        "--unattended",
+        action="store_true",
+        help="never wait for keyboard input; fail instead if a manual login is needed",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="continue even if the folder structure is invalid",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="scan, validate and estimate only; do not start a browser",
+    )
+    parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="skip the integrity check of the scan files before uploading",
+    )
+    parser.add_argument(
+        "--no-preflight",
+        action="store_true",
+        help="skip checking the survey and level folder names against Vision",
+    )
+    parser.add_argument(
+        "--replay-failed",
+        action="store_true",
+        help="retry only the files that failed on earlier runs, without a rescan",
+    )
+    parser.add_argument(
+        "--write-plan",
+        metavar="PLAN",
+        help="write the jobs to a plan file for --plan and exit without uploading",
+    )
+    parser.add_argument(
+        "--plan",
+        help="upload the jobs in a plan file, sharing them with any other machine running it",
+    )
+    parser.add_argument(
+        "--lease-dir",
+        help="shared folder for the plan's leases (default: next to the plan file)",
+    )
+    parser.add_argument(
+        "--node-id",
+        help="name of this machine in the plan's leases (default: the host name)",
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="check all records in Vision after the run, skipping the per-file save "
+        "confirmation on levels whose record list can be read",
+    )
+    parser.add_argument(
+        "--reconcile-only",
+        action="store_true",
+        help="check every file the ledger records as uploaded against Vision, then exit",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and upload new scans as they appear",
+    )
+    parser.add_argument(
+        "--stable-seconds",
+        type=float,
+        default=60.0,
+        help="watch mode: how long a file's size and mtime must stay unchanged (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=10.0,
+        help="watch mode: seconds between checks (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="watch mode: poll instead of using inotify (needed for network shares)",
+    )
+    parser.add_argument(
+        "--no-recycle",
+        action="store_true",
+        help="browser engine: never replace a worn-out or crashed Chrome session with a fresh one",
+    )
+    parser.add_argument(
+        "--recycle-rss-gb",
+        type=float,
+        default=SESSION_RSS_LIMIT / 1024**3,
+        help="browser engine: recycle a session once Chrome uses this much memory (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="persistent Chrome profile directory used to keep the login between runs",
+    )
+    parser.add_argument(
+        "--cookies",
+        default=SESSION_COOKIES_PATH,
+        help="file the session cookies are saved to and restored from",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=METRICS_PATH,
+        help="file the phase timings are appended to and estimates are fitted on",
+    )
+    args = parser.parse_args(argv)
+    if args.plan and (args.watch or args.replay_failed or args.write_plan):
+        parser.error(
+            "--plan cannot be combined with --watch, --replay-failed or --write-plan"
+        )
+    if args.batch and args.engine != "browser":
+        parser.error("--batch needs the browser engine")
+    if args.reconcile and args.watch:
+        parser.error("--reconcile cannot be combined with --watch")
+    if args.reconcile_only and (args.plan or args.replay_failed or args.write_plan):
+        parser.error(
+            "--reconcile-only cannot be combined with --plan, --replay-failed or --write-plan"
+        )
+    return args
 
-    for survey in survey_dirs:
-        survey_path = os.path.join(parent_folder, survey)
-        level_dirs = [
-            d
-            for d in os.listdir(survey_path)
-            if os.path.isdir(os.path.join(survey_path, d))
-        ]
-        if not level_dirs:
-            logging.error("Survey '%s' does not contain any level directories.", survey)
-            valid = False
-        else:
-            for level in level_dirs:
-                level_path = os.path.join(survey_path, level)
-                date_dirs = [
-                    d
-                    for d in os.listdir(level_path)
-                    if os.path.isdir(os.path.join(level_path, d))
-                ]
-                if not date_dirs:
-                    logging.error(
-                        "Level '%s' in survey '%s' does not contain any date directories.",
-                        level,
-                        survey,
-                    )
-                    valid = False
-                else:
-                    for date_dir in date_dirs:
-                        # Check for correct date format (ddmmyy)
-                        try:
-                            _ = datetime.datetime.strptime(date_dir, "%d%m%y").date()
-                        except ValueError:
-                            logging.error(
-                                "Directory '%s' in level '%s' of survey '%s' is not in ddmmyy format.",
-                                date_dir,
-                                level,
-                                survey,
-                            )
-                            valid = False
-                            continue
-                        date_path = os.path.join(level_path, date_dir)
-                        # Exclude the uploaded log file from scan files
-                        scan_files = [
-                            f
-                            for f in os.listdir(date_path)
-                            if os.path.isfile(os.path.join(date_path, f))
-                            and f != UPLOADED_LOG_FILENAME
-                        ]
-                        if not scan_files:
-                            logging.error(
-                                "Date directory '%s' in level '%s' of survey '%s' does not contain any scan files.",
-                                date_dir,
-                                level,
-                                survey,
-                            )
-                            valid = False
-    return valid
 
+def choose_folder():
+    """Asks for the parent folder with a Tkinter dialog."""
+    from tkinter import filedialog, Tk
 
-# ------------------------- Main Process -------------------------
+    root = Tk()
+    root.withdraw()
+    return filedialog.askdirectory(
+        title="Select parent folder containing survey folders to upload"
+    )
 
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+
     # Display introductory information in the log.
     logging.info("#" * 80)
     logging.info("### Vision Automatic Scan Upload Script")
@@ -436,142 +1358,288 @@ def main():
     )
     logging.info("        └── Date Folder (format: ddmmyy, e.g., '041122')")
     logging.info("            └── Scan files (e.g., 'Scan 001.e57', 'Scan 002.e57')")
-    logging.info("The module will be set to '%s'", MODULE_TEXT)
+    logging.info("The module will be set to '%s'", args.module)
 
-    # Choose the parent folder containing survey folders using a Tkinter dialog.
-    root = Tk()
-    root.withdraw()
-    files_to_upload_dir = filedialog.askdirectory(
-        title="Select parent folder containing survey folders to upload"
-    )
+    # Use the folder given on the command line, or ask with a Tkinter dialog.
+    files_to_upload_dir = args.folder
+    if not files_to_upload_dir and not args.unattended:
+        files_to_upload_dir = choose_folder()
     if not files_to_upload_dir:
         logging.error("No folder selected! Exiting...")
         return
 
     logging.info("Parent folder selected: %s", files_to_upload_dir)
 
-    # Print a summary of the directory structure.
-    print_directory_tree(files_to_upload_dir)
-
-    # Validate the folder structure.
-    if not validate_folder_structure(files_to_upload_dir):
-        logging.error("The folder structure does not match the expected layout.")
-        proceed = input(
-            "The folder structure appears invalid. Do you want to continue with the upload? (y/n): "
+    leases = None
+    if args.reconcile_only:
+        # Check what the ledger says was uploaded, without a rescan.
+        ledger = UploadLedger(files_to_upload_dir, read_only=args.dry_run)
+        jobs = ledger_jobs(files_to_upload_dir, ledger)
+    elif args.replay_failed:
+        # Retry the dead-letter queue straight from the ledger.
+        ledger = UploadLedger(files_to_upload_dir, read_only=args.dry_run)
+        jobs = replay_jobs(files_to_upload_dir, ledger)
+    elif args.plan:
+        # Share the plan's jobs with the other machines running it. SQLite
+        # cannot be shared between machines, so each keeps its own ledger.
+        leases = LeaseBoard(
+            args.lease_dir or default_lease_dir(args.plan), args.node_id
         )
-        if proceed.lower() != "y":
-            logging.info("Exiting per user request.")
-            return
+        os.makedirs(APP_DIR, exist_ok=True)
+        ledger = UploadLedger(
+            files_to_upload_dir,
+            path=os.path.join(
+                APP_DIR, os.path.splitext(os.path.basename(args.plan))[0] + ".db"
+            ),
+            read_only=args.dry_run,
+        )
+        jobs = plan_jobs(files_to_upload_dir, args.plan, ledger, leases)
+        logging.info("Running the plan as node '%s'", leases.node_id)
     else:
-        logging.info("Folder structure appears valid.")
-
-    # Calculate total size and count of files for informational purposes.
-    total_size_bytes = 0
-    all_files = []
-    for dp, dn, filenames in os.walk(files_to_upload_dir):
-        for f in filenames:
-            file_full_path = os.path.join(dp, f)
-            all_files.append(file_full_path)
-            total_size_bytes += os.path.getsize(file_full_path)
-    logging.info(
-        "Final upload: Total files: %d, Total size: %.2f GB",
-        len(all_files),
-        total_size_bytes / (1024**3),
-    )
-    estimated_time = (30 * len(all_files) + total_size_bytes / (1024**2) / 100) / 3600
-    logging.info("Estimated upload time: %.2f hours @ 100 MBps", estimated_time)
+        # Scan the parent folder once; everything below works from this index.
+        index = scan_folder(files_to_upload_dir)
+
+        # Print a summary of the directory structure.
+        print_directory_tree(index)
+
+        # Validate the folder structure.
+        if not validate_folder_structure(index):
+            logging.error("The folder structure does not match the expected layout.")
+            if args.yes:
+                proceed = "y"
+            elif args.unattended:
+                proceed = "n"
+            else:
+                proceed = input(
+                    "The folder structure appears invalid. Do you want to continue with the upload? (y/n): "
+                )
+            if proceed.lower() != "y":
+                logging.info("Exiting per user request.")
+                return
+        else:
+            logging.info("Folder structure appears valid.")
+
+        # Calculate total size and count of files for informational purposes.
+        file_count, total_size_bytes = summarize(index, exclude=IGNORED_FILENAMES)
+        logging.info(
+            "Final upload: Total files: %d, Total size: %.2f GB",
+            file_count,
+            total_size_bytes / (1024**3),
+        )
 
-    # Initialize the Selenium Chrome driver.
-    driver = webdriver.Chrome()
-    driver.maximize_window()
+        # Open the upload ledger, importing any old per-date uploaded.log files
+        # once. A dry run works on a copy and leaves the ledger untouched.
+        ledger = UploadLedger(files_to_upload_dir, read_only=args.dry_run)
+        import_legacy_logs(index, ledger)
 
-    # Log in to Vision (manual step).
-    login_to_vision(driver, VISION_URL)
+        # Build the list of upload jobs from the folder structure.
+        jobs = build_jobs(index, ledger)
 
-    # Iterate through each survey folder in the parent folder.
-    for survey_dir in os.listdir(files_to_upload_dir):
-        survey_path = os.path.join(files_to_upload_dir, survey_dir)
-        if not os.path.isdir(survey_path):
-            continue
+    # Report damaged scans now rather than after a long upload.
+    if jobs and not (args.no_verify or args.reconcile_only):
+        jobs = verify_jobs(jobs, ledger)
 
-        # The survey name is taken from the survey folder's basename.
-        survey_name = survey_dir
-        logging.info("Processing Survey: %s", survey_name)
+    if args.write_plan:
+        write_plan(args.write_plan, files_to_upload_dir, jobs)
+        ledger.close()
+        return
 
-        # Loop over each level (Deck) directory inside the current survey folder.
-        for level_dir in os.listdir(survey_path):
-            level_path = os.path.join(survey_path, level_dir)
-            if not os.path.isdir(level_path):
-                continue
+    if not jobs and not args.watch:
+        logging.info("No files left to upload.")
+        ledger.close()
+        return
 
-            logging.info("Checking that level '%s' exists in Vision", level_dir)
-            try:
-                navigate_to_level(driver, level_dir)
-            except Exception as e:
-                logging.error("Skipping level '%s' due to error: %s", level_dir, e)
-                continue
+    # Watch mode keeps every worker, as more files may arrive later.
+    worker_count = max(1, args.workers if args.watch else min(args.workers, len(jobs)))
+    if not args.reconcile_only:
+        estimated_time, basis = estimate_upload_hours(
+            [job.size for job in jobs], worker_count, args.metrics_file, args.engine
+        )
+        logging.info(
+            "Estimated upload time for %d remaining files: %.2f hours (%s)",
+            len(jobs),
+            estimated_time,
+            basis,
+        )
 
-            # Loop over each date directory within the current level.
-            for date_dir in os.listdir(level_path):
-                date_path = os.path.join(level_path, date_dir)
-                if not os.path.isdir(date_path):
-                    continue
-                try:
-                    scan_date = datetime.datetime.strptime(date_dir, "%d%m%y").date()
-                except ValueError:
-                    logging.error(
-                        "Invalid date format for directory '%s'. Must be ddmmyy. Skipping...",
-                        date_dir,
-                    )
-                    continue
+    if args.dry_run:
+        logging.info("Dry run: not uploading anything.")
+        ledger.close()
+        return
 
-                date_string = scan_date.strftime("%d-%b-%Y")
-                logging.info("Processing Level: '%s', Date: %s", level_dir, date_string)
+    # Selenium is only imported once a browser is actually needed.
+    from vision_browser import (
+        STEP_TIMEOUTS,
+        create_driver,
+        login_to_vision,
+        create_browser_uploaders,
+    )
 
-                # Load (or initialize) a log file to track already uploaded files.
-                log_filename = os.path.join(date_path, UPLOADED_LOG_FILENAME)
-                try:
-                    with open(log_filename, "r") as log_file:
-                        uploaded_files = [line.strip() for line in log_file.readlines()]
-                except IOError:
-                    uploaded_files = []
-
-                # Loop over each scan file in the date directory.
-                for scan_file in os.listdir(date_path):
-                    if scan_file == UPLOADED_LOG_FILENAME:
-                        continue
-                    if scan_file in uploaded_files:
-                        logging.info(
-                            "File '%s' already uploaded. Skipping...", scan_file
-                        )
-                        continue
+    # The HTTP engine needs no browser while the saved session still works.
+    # Otherwise cookies stays None and is read from the browser when needed.
+    driver = None
+    cookies = None
+    if args.engine == "http" and args.cookies:
+        cookies = saved_http_session(args.url, args.cookies)
+    if cookies is None:
+        # Initialize the Selenium Chrome driver.
+        driver = create_driver(headless=args.headless, profile_dir=args.profile_dir)
+
+        # Log in to Vision, reusing the saved session where possible.
+        try:
+            login_to_vision(
+                driver,
+                args.url,
+                cookie_path=args.cookies,
+                # Nobody can log in to a headless browser by hand.
+                interactive=not (args.unattended or args.headless),
+            )
+        except Exception:
+            ledger.close()
+            driver.quit()
+            raise
 
-                    file_path = os.path.join(date_path, scan_file)
-                    logging.info("Uploading file: %s", file_path)
-
-                    try:
-                        # Use retry_action to handle intermittent issues.
-                        retry_action(
-                            lambda: upload_scan_file(
-                                driver, file_path, scan_date, MODULE_TEXT, survey_name
-                            ),
-                            retries=3,
-                            delay=2,
-                        )
-                        # Log the successful upload.
-                        with open(log_filename, "a") as log_file:
-                            log_file.write(scan_file + "\n")
-                    except Exception as e:
-                        logging.error("Error uploading file '%s': %s", scan_file, e)
-                        continue
+    if args.reconcile_only:
+        try:
+            reconcile_jobs(jobs, ledger, driver, args.url, cookies)
+        finally:
+            ledger.close()
+            if driver is not None:
+                driver.quit()
+        return
 
-                    # Optional pause for manual inspection (only when debug mode is on)
-                    debug_pause(
-                        "File uploaded. Press Enter to continue with the next file..."
-                    )
+    # Check the folder names against Vision before the long upload starts.
+    if jobs and not args.no_preflight:
+        if args.yes:
+            proceed_answer = "y"
+        elif args.unattended:
+            proceed_answer = "n"
+        else:
+            proceed_answer = None
+        jobs = preflight_jobs(jobs, driver, args.url, proceed_answer, cookies)
+        if jobs is None:
+            logging.info("Exiting so the folder names can be fixed.")
+            ledger.close()
+            if driver is not None:
+                driver.quit()
+            return
 
+    # Upload the queued files using a pool of workers.
+    recorder = MetricsRecorder(args.metrics_file, engine=args.engine)
+    cap = None
+    if args.max_mbps:
+        cap = BandwidthCap(args.max_mbps, args.cap_hours)
+        logging.info(
+            "Upload bandwidth capped at %.1f MB/s (%s)", args.max_mbps, args.cap_hours
+        )
+    # With --reconcile, saves on levels whose record list can be read are
+    # confirmed in bulk after the run; elsewhere the toast is still awaited.
+    confirmed_levels = ()
+    if args.reconcile and args.engine == "browser" and jobs:
+        confirmed_levels = listable_levels(jobs, driver, args.url)
+    client = None
+    if args.engine == "http":
+        client = VisionHttpClient(
+            args.url,
+            cookies if cookies is not None else cookies_from_driver(driver),
+            pool_size=worker_count,
+            throttle=TokenBucket(cap.rate) if cap is not None else None,
+        )
+        uploaders = [
+            HttpUploader(client, ledger, args.module) for _ in range(worker_count)
+        ]
+    else:
+        uploaders = create_browser_uploaders(
+            driver,
+            worker_count,
+            args.url,
+            args.module,
+            form_fill_mode=args.form_fill,
+            headless=args.headless,
+            cookie_path=args.cookies,
+            confirmed_levels=confirmed_levels,
+            profile_dir=args.profile_dir,
+            recycle=not args.no_recycle,
+            rss_limit=int(args.recycle_rss_gb * 1024**3),
+        )
+    # Copy upcoming files to local disk first if the source is slow.
+    staging = None
+    if args.stage_budget_gb:
+        staging = StagingCache(
+            args.stage_dir, int(args.stage_budget_gb * 1024**3), args.prefetch
+        )
+    # Tune how many of the workers upload at once to what the link can take.
+    controller = None
+    if not args.fixed_workers:
+        controller = ConcurrencyController(len(uploaders))
+    # Show live progress, and serve it for monitoring if a port is given.
+    # Watch mode counts the initial jobs once they have settled.
+    progress = UploadProgress(() if args.watch else jobs)
+    progress_server = None
+    if args.progress_port is not None:
+        progress_server = start_progress_server(progress, args.progress_port)
+    display = ProgressDisplay(progress).start()
+    # Drop each date folder's files into one record, if asked.
+    batch = None
+    if args.batch:
+        batch = (args.batch_max_files, int(args.batch_max_gb * 1024**3))
+    try:
+        if args.watch:
+            watch_folder(
+                files_to_upload_dir,
+                jobs,
+                uploaders,
+                ledger,
+                recorder,
+                stable_seconds=args.stable_seconds,
+                poll_interval=args.poll_interval,
+                force_polling=args.poll,
+                verify=not args.no_verify,
+                policy=args.order,
+                controller=controller,
+                cap=cap,
+                staging=staging,
+                progress=progress,
+                batch=batch,
+            )
+        else:
+            run_upload_pool(
+                uploaders,
+                jobs,
+                ledger,
+                recorder,
+                args.order,
+                controller,
+                cap,
+                staging,
+                progress,
+                leases,
+                batch,
+            )
+            if client is None:
+                # Recycling may have replaced the primary driver.
+                driver = uploaders[0].driver
+            if args.reconcile:
+                reconcile_jobs(jobs, ledger, driver, args.url, cookies)
+    finally:
+        display.stop()
+        if progress_server is not None:
+            progress_server.shutdown()
+            progress_server.server_close()
+        ledger.close()
+        recorder.log_summary()
+        recorder.close()
+        # The first browser uploader wraps the primary driver, or the one that
+        # replaced it, so closing every uploader also closes the primary.
+        for uploader in uploaders:
+            uploader.close()
+        if client is not None:
+            client.close()
+            if driver is not None:
+                driver.quit()
+
+    logging.debug("Learned step timeouts: %s", STEP_TIMEOUTS.snapshot())
     logging.info("Upload process complete.")
-    driver.quit()
 
 
 if __name__ == "__main__":
@@ -579,3 +1647,4 @@ if __name__ == "__main__":
         main()
     except Exception as exc:
         logging.exception("An unexpected error occurred: %s", exc)
+        raise SystemExit(1)
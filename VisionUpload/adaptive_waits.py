@@ -0,0 +1,112 @@
+"""
+Per-step wait timeouts learned from observed latencies.
+
+Every condition-based wait in the upload sequence belongs to a named step.
+The time each step actually took is recorded, and once enough samples exist
+the step's timeout becomes a multiple of its recent 95th percentile latency,
+kept within sensible bounds. Until then the hard-coded default applies.
+
+File transfers are too varied in size for a per-step timeout, so their
+deadline is worked out per file from the measured upload throughput.
+"""
+
+import math
+import threading
+from collections import defaultdict, deque
+
+POLL_INTERVAL = 0.1  # Seconds between DOM checks in condition-based waits
+TRANSFER_MIN_RATE = 1024**2  # Bytes/s assumed for transfers before any is measured
+TRANSFER_DEADLINE_MARGIN = 4.0  # Deadline as a multiple of the expected transfer time
+TRANSFER_DEADLINE_FLOOR = 60  # Seconds every transfer is allowed on top of that
+TRANSFER_MIN_SAMPLE_SIZE = 10 * 1024**2  # Smallest transfer used to measure throughput
+
+
+class AdaptiveTimeouts:
+    """Thread-safe store of learned per-step timeouts."""
+
+    def __init__(
+        self,
+        defaults,
+        fallback=10,
+        factor=3.0,
+        floor=2.0,
+        ceiling_factor=4.0,
+        min_samples=5,
+        window=50,
+    ):
+        self.defaults = dict(defaults)
+        self.fallback = fallback
+        self.factor = factor
+        self.floor = floor
+        self.ceiling_factor = ceiling_factor
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def default(self, step):
+        return self.defaults.get(step, self.fallback)
+
+    def timeout(self, step):
+        """Returns the timeout in seconds to use for the next wait of step."""
+        default = self.default(step)
+        with self._lock:
+            samples = sorted(self._samples[step])
+        if len(samples) < self.min_samples:
+            return default
+        p95 = samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+        return min(max(self.floor, p95 * self.factor), default * self.ceiling_factor)
+
+    def observe(self, step, seconds):
+        """Records how long a successful wait for step took."""
+        with self._lock:
+            self._samples[step].append(seconds)
+
+    def snapshot(self):
+        """Returns {step: current timeout} for every step seen so far."""
+        with self._lock:
+            steps = set(self.defaults) | set(self._samples)
+        return {step: self.timeout(step) for step in sorted(steps)}
+
+
+class TransferDeadlines:
+    """
+    Thread-safe estimate of the upload throughput, used to give each file
+    transfer a deadline that scales with its size. Until a transfer has been
+    measured, min_rate is assumed.
+    """
+
+    def __init__(
+        self,
+        min_rate=TRANSFER_MIN_RATE,
+        margin=TRANSFER_DEADLINE_MARGIN,
+        floor=TRANSFER_DEADLINE_FLOOR,
+        alpha=0.3,
+    ):
+        self.min_rate = min_rate
+        self.margin = margin
+        self.floor = floor
+        self.alpha = alpha
+        self._rate = None
+        self._lock = threading.Lock()
+
+    def deadline(self, size):
+        """Returns the seconds a transfer of size bytes may take."""
+        with self._lock:
+            rate = max(self._rate or 0, self.min_rate)
+        return self.floor + self.margin * size / rate
+
+    def observe(self, size, seconds):
+        """Records a completed transfer; small files say little about throughput."""
+        if size < TRANSFER_MIN_SAMPLE_SIZE or seconds <= 0:
+            return
+        rate = size / seconds
+        with self._lock:
+            if self._rate is None:
+                self._rate = rate
+            else:
+                self._rate += self.alpha * (rate - self._rate)
+
+    @property
+    def rate(self):
+        with self._lock:
+            return self._rate
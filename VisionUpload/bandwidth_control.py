@@ -0,0 +1,172 @@
+"""
+Adaptive upload concurrency and an optional bandwidth cap.
+
+The link to Vision can be anything from a shared 4G uplink to gigabit, so
+the number of uploads running at once is tuned during the run instead of
+being fixed. ConcurrencyController starts with every worker uploading, as
+without the controller, measures the aggregate throughput of completed
+uploads over a window and hill-climbs: it steps the number of upload slots
+down and back up, keeping a change only while it raises throughput. Network and server failures halve the number of slots straight away,
+since they usually mean the link is overloaded.
+
+BandwidthCap limits the total upload rate during working hours, so a run
+does not starve everyone else on site. The HTTP engine enforces it with a
+TokenBucket shared by all connections; browser sessions each get an equal
+share through Chrome's network throttling.
+"""
+
+import time
+import datetime
+import logging
+import threading
+from contextlib import contextmanager
+
+from upload_recovery import FAILURE_NETWORK, FAILURE_SERVER
+
+ADJUST_INTERVAL = 60.0  # Minimum seconds of measurement before each change
+MIN_GAIN = 0.05  # Relative throughput gain needed to keep adding slots
+TOKEN_BURST = 0.5  # Seconds of bandwidth an idle link may send at once
+WORKING_HOURS = "08:00-18:00"
+WORKING_DAYS = (0, 1, 2, 3, 4)  # Monday to Friday
+
+
+class ConcurrencyController:
+    """Thread-safe, self-tuning limit on the number of uploads in flight."""
+
+    def __init__(
+        self,
+        max_slots,
+        initial=None,
+        min_slots=1,
+        interval=ADJUST_INTERVAL,
+    ):
+        self.max_slots = max(1, max_slots)
+        self.min_slots = min(min_slots, self.max_slots)
+        if initial is None:
+            initial = self.max_slots  # Start at the throughput of a fixed pool
+        self.limit = max(self.min_slots, min(initial, self.max_slots))
+        self.interval = interval
+        self._active = 0
+        # From the top, the first step can only be down.
+        self._direction = 1 if self.limit < self.max_slots else -1
+        self._last_rate = None
+        self._cond = threading.Condition()
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_files = 0
+
+    @contextmanager
+    def slot(self):
+        """Context manager that holds one upload slot, waiting for a free one."""
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def record_success(self, size):
+        """Counts a completed upload and adjusts the limit once a window is full."""
+        with self._cond:
+            self._window_bytes += size
+            self._window_files += 1
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < self.interval or self._window_files < self.limit:
+                return
+            rate = self._window_bytes / elapsed
+            if self._last_rate is not None and rate < self._last_rate * (1 + MIN_GAIN):
+                self._direction = -self._direction  # The last step did not help
+            self._last_rate = rate
+            new_limit = self.limit + self._direction
+            if not self.min_slots <= new_limit <= self.max_slots:
+                self._direction = -self._direction
+                new_limit = self.limit
+            self._set_limit(
+                new_limit, "%.1f MB/s measured" % (rate / (1024**2)), reset_rate=False
+            )
+
+    def record_failure(self, kind):
+        """Backs off straight away when an upload fails because of the link."""
+        if kind not in (FAILURE_NETWORK, FAILURE_SERVER):
+            return
+        with self._cond:
+            self._direction = 1
+            self._set_limit(
+                max(self.min_slots, self.limit // 2), f"{kind} failure", reset_rate=True
+            )
+
+    def _set_limit(self, new_limit, reason, reset_rate):
+        if new_limit != self.limit:
+            logging.info(
+                "Concurrent uploads: %d -> %d (%s)", self.limit, new_limit, reason
+            )
+            self.limit = new_limit
+            self._cond.notify_all()
+        if reset_rate:
+            self._last_rate = None
+        self._reset_window()
+
+
+def parse_hours(text):
+    """Parses "HH:MM-HH:MM" into a (start, end) pair of datetime.time."""
+    start, end = text.split("-")
+    start = datetime.datetime.strptime(start.strip(), "%H:%M").time()
+    end = end.strip()
+    if end == "24:00":
+        return start, datetime.time.max
+    return start, datetime.datetime.strptime(end, "%H:%M").time()
+
+
+class BandwidthCap:
+    """
+    An upload rate limit that applies only during working hours, or always
+    if hours is "always".
+    """
+
+    def __init__(self, mbps, hours=WORKING_HOURS, days=WORKING_DAYS):
+        self.rate_limit = mbps * 1024**2
+        self.always = hours == "always"
+        self.hours = None if self.always else parse_hours(hours)
+        self.days = days
+
+    def rate(self, now=None):
+        """Returns the cap in bytes per second at time now, or None if uncapped."""
+        if self.always:
+            return self.rate_limit
+        now = now or datetime.datetime.now()
+        start, end = self.hours
+        if now.weekday() in self.days and start <= now.time() < end:
+            return self.rate_limit
+        return None
+
+
+class TokenBucket:
+    """
+    Blocks senders so that the combined rate stays under rate(), a callable
+    returning bytes per second or None for no limit.
+    """
+
+    def __init__(self, rate, burst=TOKEN_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, size):
+        """Waits until size more bytes may be sent."""
+        rate = self.rate()
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now - self.burst) + size / rate
+            delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
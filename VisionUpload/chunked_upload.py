@@ -0,0 +1,155 @@
+"""
+Resumable chunked uploads for large scan files.
+
+A file is split into fixed-size chunks. Each confirmed chunk (offset, length
+and SHA-256) is recorded in the upload ledger, so an upload interrupted by a
+crash, a network drop or a rerun the next day resumes from the chunks the
+server already holds instead of sending every byte again. Several chunks of
+the same file are sent in parallel to fill fast links.
+"""
+
+import os
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from http_engine import VisionHttpError
+from phase_metrics import NULL_TIMER
+
+CHUNK_SIZE = 64 * 1024**2  # Bytes per chunk
+CHUNKED_UPLOAD_THRESHOLD = 256 * 1024**2  # Smaller files are sent in one request
+CHUNK_PARALLELISM = 4  # Chunks of one file in flight at once
+
+Chunk = namedtuple("Chunk", ["index", "offset", "length"])
+
+
+class ChunkChecksumError(Exception):
+    """Raised when the server does not confirm a chunk or its checksum differs."""
+
+
+def plan_chunks(size, chunk_size=CHUNK_SIZE):
+    """Splits a file of size bytes into a list of Chunks."""
+    return [
+        Chunk(index, offset, min(chunk_size, size - offset))
+        for index, offset in enumerate(range(0, size, chunk_size))
+    ]
+
+
+def _resume_or_start(client, ledger, key, file_path, size, create_record):
+    """
+    Returns (record_id, upload_id, chunk_size, done) where done maps the
+    indexes of chunks already confirmed by both the ledger and the server to
+    their checksums.
+    """
+    session = ledger.get_chunk_session(*key)
+    if session is not None:
+        try:
+            received = client.get_received_chunks(session.record_id, session.upload_id)
+        except VisionHttpError as e:
+            if e.status not in (404, 410):
+                raise
+            logging.warning(
+                "Server no longer has the partial upload of %s; starting again",
+                file_path,
+            )
+        else:
+            confirmed = ledger.confirmed_chunks(*key)
+            done = {i: confirmed[i] for i in received if i in confirmed}
+            logging.info(
+                "Resuming upload of %s: %d chunks already confirmed",
+                file_path,
+                len(done),
+            )
+            return session.record_id, session.upload_id, session.chunk_size, done
+
+    record_id = create_record()
+    upload_id = client.start_chunked_upload(
+        record_id, os.path.basename(file_path), size, CHUNK_SIZE
+    )
+    ledger.start_chunk_session(*key, record_id, upload_id, CHUNK_SIZE)
+    return record_id, upload_id, CHUNK_SIZE, {}
+
+
+def upload_file_chunked(
+    client, ledger, key, file_path, size, create_record, timer=NULL_TIMER
+):
+    """
+    Uploads file_path in chunks, resuming an earlier attempt if the ledger has
+    one. key is the ledger key (rel_path, size, mtime); create_record is called
+    to create the Vision record when a fresh upload is needed. Sending the
+    chunks is timed as the "transfer" phase of timer. A chunk is recorded in
+    the ledger only once the server confirms it: by echoing a matching
+    checksum or, if it echoes none, by listing the chunk as received.
+    Returns the record id.
+    """
+    record_id, upload_id, chunk_size, done = _resume_or_start(
+        client, ledger, key, file_path, size, create_record
+    )
+
+    def send(chunk):
+        hasher = hashlib.sha256()
+        response = client.upload_chunk(
+            record_id,
+            upload_id,
+            chunk.index,
+            file_path,
+            chunk.offset,
+            chunk.length,
+            hasher,
+        )
+        checksum = hasher.hexdigest()
+        echoed = (response or {}).get("sha256")
+        if echoed is None:
+            if chunk.index not in client.get_received_chunks(record_id, upload_id):
+                raise ChunkChecksumError(
+                    f"Server did not confirm chunk {chunk.index} of {file_path}"
+                )
+        elif echoed != checksum:
+            raise ChunkChecksumError(
+                f"Chunk {chunk.index} of {file_path} was corrupted in transit"
+            )
+        ledger.record_chunk(*key, chunk.index, chunk.offset, chunk.length, checksum)
+        logging.debug("Confirmed chunk %d of %s", chunk.index, file_path)
+
+    pending = [c for c in plan_chunks(size, chunk_size) if c.index not in done]
+    with timer.phase("transfer"):
+        with ThreadPoolExecutor(max_workers=CHUNK_PARALLELISM) as pool:
+            # list() re-raises the first failed chunk; confirmed ones stay recorded.
+            list(pool.map(send, pending))
+
+        client.complete_chunked_upload(record_id, upload_id)
+    return record_id
+
+
+def upload_scan_file_resumable(
+    client,
+    ledger,
+    key,
+    file_path,
+    size,
+    scan_date,
+    module_text,
+    survey_text,
+    level_text,
+    timer=NULL_TIMER,
+):
+    """
+    Executes the create → chunked upload → save sequence for a large scan file,
+    picking up where an interrupted attempt left off.
+    """
+
+    def create_record():
+        with timer.phase("create"):
+            return client.create_record(scan_date, module_text, survey_text, level_text)
+
+    # The record is created in its own phase, before the transfer starts.
+    record_id = upload_file_chunked(
+        client, ledger, key, file_path, size, create_record, timer
+    )
+    logging.info("File upload completed for %s", file_path)
+    with timer.phase("save"):
+        client.save_record(record_id)
+    ledger.clear_chunk_session(*key)
+    logging.info("File saved successfully for %s", file_path)
+    return record_id
@@ -0,0 +1,139 @@
+"""
+Pre-flight integrity checks for E57 scan files.
+
+A truncated or corrupted scan is otherwise only rejected by Vision after it
+has been uploaded in full. Each file is memory-mapped and checked against the
+E57 (ASTM E2807) layout: the 48-byte header signature and version, the
+physical length recorded in the header against the size on disk, and the
+CRC-32C checksum stored in the last four bytes of every page. Files are
+checked in parallel in a process pool.
+
+The fast CRC-32C C extension (the optional "crc32c" package) is used when it
+is installed. Without it, checksums are computed in pure Python, which is too
+slow for multi-gigabyte scans, so only a sample of pages spread across each
+file is checked.
+"""
+
+import os
+import mmap
+import struct
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from crc32c import crc32c as _fast_crc32c
+except ImportError:
+    _fast_crc32c = None
+
+E57_EXTENSION = ".e57"
+E57_SIGNATURE = b"ASTM-E57"
+E57_MAJOR_VERSION = 1
+# fileSignature, majorVersion, minorVersion, filePhysicalLength,
+# xmlPhysicalOffset, xmlLogicalLength, pageSize (all little-endian)
+E57_HEADER = struct.Struct("<8sIIQQQQ")
+CHECKSUM_SIZE = 4  # Big-endian CRC-32C at the end of every page
+SAMPLED_PAGES = 64  # Pages checked per file without the crc32c package
+
+
+def _make_crc32c_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _make_crc32c_table()
+
+
+def _python_crc32c(data):
+    crc = 0xFFFFFFFF
+    table = _CRC32C_TABLE
+    for byte in bytes(data):
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+crc32c = _fast_crc32c or _python_crc32c
+
+
+def full_checksums_available():
+    """True if every page of every file can be checked in reasonable time."""
+    return _fast_crc32c is not None
+
+
+def _pages_to_check(page_count):
+    if full_checksums_available() or page_count <= SAMPLED_PAGES:
+        return range(page_count)
+    step = (page_count - 1) / (SAMPLED_PAGES - 1)
+    return sorted(set(round(i * step) for i in range(SAMPLED_PAGES)))
+
+
+def check_e57_file(path):
+    """
+    Checks one E57 file. Returns None if it looks intact, otherwise a short
+    description of the first problem found.
+    """
+    try:
+        size = os.path.getsize(path)
+        if size < E57_HEADER.size:
+            return f"file is only {size} bytes long; too short for an E57 header"
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            (
+                signature,
+                major,
+                minor,
+                physical_length,
+                xml_offset,
+                xml_length,
+                page_size,
+            ) = E57_HEADER.unpack_from(data, 0)
+            if signature != E57_SIGNATURE:
+                return "not an E57 file (bad header signature)"
+            if major != E57_MAJOR_VERSION:
+                return f"unsupported E57 version {major}.{minor}"
+            if physical_length != size:
+                return (
+                    f"file is {size} bytes but its header says {physical_length};"
+                    " it is probably truncated"
+                )
+            if page_size <= CHECKSUM_SIZE or size % page_size:
+                return f"invalid page size {page_size} in header"
+            if xml_offset + xml_length > size:
+                return "XML section lies beyond the end of the file"
+
+            pages = memoryview(data)
+            try:
+                payload = page_size - CHECKSUM_SIZE
+                for page in _pages_to_check(size // page_size):
+                    start = page * page_size
+                    (expected,) = struct.unpack_from(">I", data, start + payload)
+                    if crc32c(pages[start : start + payload]) != expected:
+                        return f"checksum mismatch in page {page} (offset {start})"
+            finally:
+                pages.release()
+    except (OSError, ValueError) as e:
+        return f"could not be read: {e}"
+    return None
+
+
+def check_scan_files(paths, workers=None):
+    """
+    Checks the E57 files among paths in a process pool. Files with other
+    extensions are not checked. Returns {path: problem or None}.
+    """
+    paths = [p for p in paths if p.lower().endswith(E57_EXTENSION)]
+    if not paths:
+        return {}
+    if not full_checksums_available():
+        logging.info(
+            "The crc32c package is not installed; checking %d sample pages per file",
+            SAMPLED_PAGES,
+        )
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(check_e57_file, paths)))
@@ -0,0 +1,225 @@
+"""
+Change detection for the Vision upload watch mode.
+
+Watches the Parent / Survey / Level / Date folders for new or changed scan
+files. On Linux, inotify is used through ctypes. Elsewhere, and on network
+shares where inotify does not see remote writes, the folder tree is polled
+instead: each poll stats only the directories, and lists a directory again
+only when its mtime has changed. Files are reported as ready only after their
+size and mtime have stayed the same for a configurable window, so scans that
+are still being copied are never uploaded.
+"""
+
+import os
+import sys
+import time
+import select
+import struct
+import logging
+import ctypes
+import ctypes.util
+
+WATCH_DEPTH = 3  # Parent (0) / Survey (1) / Level (2) / Date (3)
+
+# inotify event flags (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+# Plain writes (IN_MODIFY) are left out: a large copy would raise a constant
+# stream of events, and growing files are re-checked by StabilityTracker anyway.
+_WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _depth(root, path):
+    rel = os.path.relpath(path, root)
+    return 0 if rel == "." else len(rel.split(os.sep))
+
+
+def _subdirs(path):
+    try:
+        return [entry.path for entry in os.scandir(path) if entry.is_dir()]
+    except OSError:
+        return []
+
+
+class PollingWatcher:
+    """Detects changed folders by polling directory mtimes."""
+
+    def __init__(self, root, interval=10.0):
+        self.root = root
+        self.interval = interval
+        self._dir_mtimes = {}
+        self._discover(root)
+
+    def _discover(self, path):
+        """Records path and its sub-folders down to the date level."""
+        try:
+            self._dir_mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            return
+        if _depth(self.root, path) < WATCH_DEPTH:
+            for child in _subdirs(path):
+                self._discover(child)
+
+    def changed_dirs(self, timeout=None):
+        """
+        Sleeps for the poll interval (or timeout, if shorter) and returns the
+        set of folders whose contents changed since the last call.
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        changed = set()
+        for path, old_mtime in list(self._dir_mtimes.items()):
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self._dir_mtimes.pop(path, None)
+                continue
+            if mtime == old_mtime:
+                continue
+            self._dir_mtimes[path] = mtime
+            changed.add(path)
+            if _depth(self.root, path) < WATCH_DEPTH:
+                for child in _subdirs(path):
+                    if child not in self._dir_mtimes:
+                        self._discover(child)
+                        changed.add(child)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Detects changed folders with Linux inotify."""
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.root = root
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}
+        self._add_tree(root)
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux")
+
+    def _add_tree(self, path):
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(path), ctypes.c_uint32(_WATCH_MASK)
+        )
+        if wd < 0:
+            logging.warning("Could not watch '%s' (errno %d)", path, ctypes.get_errno())
+            return
+        self._paths[wd] = path
+        if _depth(self.root, path) < WATCH_DEPTH:
+            for child in _subdirs(path):
+                self._add_tree(child)
+
+    def changed_dirs(self, timeout=None):
+        """
+        Waits up to timeout seconds for events and returns the set of folders
+        whose contents changed. Newly created folders are watched straight away.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[
+                offset + _EVENT_HEADER.size : offset + _EVENT_HEADER.size + name_len
+            ]
+            offset += _EVENT_HEADER.size + name_len
+            parent = self._paths.get(wd)
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            if parent is None:
+                continue
+            changed.add(parent)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                child = os.path.join(parent, os.fsdecode(name.rstrip(b"\0")))
+                if _depth(self.root, child) <= WATCH_DEPTH:
+                    self._add_tree(child)
+                    # Files may have landed before the watch was in place.
+                    changed.add(child)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(root, poll_interval=10.0, force_polling=False):
+    """Returns an InotifyWatcher where possible, otherwise a PollingWatcher."""
+    if not force_polling and InotifyWatcher.available():
+        try:
+            watcher = InotifyWatcher(root)
+            logging.info("Watching %s with inotify", root)
+            return watcher
+        except OSError as e:
+            logging.warning("inotify unavailable (%s); falling back to polling", e)
+    logging.info("Watching %s by polling every %.0f s", root, poll_interval)
+    return PollingWatcher(root, poll_interval)
+
+
+class StabilityTracker:
+    """
+    Holds candidate files until their size and mtime have not changed for
+    stable_seconds, so half-copied scans are never queued.
+    """
+
+    def __init__(self, stable_seconds=60.0):
+        self.stable_seconds = stable_seconds
+        self._candidates = {}  # path -> (size, mtime, stable_since)
+
+    def __len__(self):
+        return len(self._candidates)
+
+    def observe(self, path, size, mtime, now=None):
+        """Records the current size and mtime of a candidate file."""
+        now = time.monotonic() if now is None else now
+        previous = self._candidates.get(path)
+        if previous is None or previous[:2] != (size, mtime):
+            self._candidates[path] = (size, mtime, now)
+
+    def refresh(self, now=None):
+        """Re-stats every candidate, restarting the window for any that changed."""
+        now = time.monotonic() if now is None else now
+        for path in list(self._candidates):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._candidates[path]  # Deleted or moved away
+                continue
+            self.observe(path, stat.st_size, stat.st_mtime, now)
+
+    def pop_ready(self, now=None):
+        """Removes and returns (path, size, mtime) for every stable file."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, (size, mtime, since) in list(self._candidates.items()):
+            if now - since >= self.stable_seconds:
+                del self._candidates[path]
+                ready.append((path, size, mtime))
+        return ready
@@ -0,0 +1,342 @@
+"""
+Direct HTTP upload engine for the Vision upload script.
+
+Selenium is only used to log in; the session cookies are then harvested and
+records are created and file bodies streamed straight to Vision's HTTP
+endpoints over pooled keep-alive connections. Files are sent in fixed-size
+chunks so a multi-GB scan is never held in memory.
+"""
+
+import os
+import json
+import queue
+import logging
+import http.client
+from urllib.parse import urlsplit, quote
+
+from phase_metrics import NULL_TIMER
+
+# Centralized endpoint paths, relative to the Vision base URL.
+HTTP_ENDPOINTS = {
+    "create_record": "/api/records",
+    "upload_file": "/api/records/{record_id}/files?name={file_name}",
+    "save_record": "/api/records/{record_id}/save",
+    "start_chunked_upload": "/api/records/{record_id}/uploads",
+    "chunked_upload": "/api/records/{record_id}/uploads/{upload_id}",
+    "upload_chunk": "/api/records/{record_id}/uploads/{upload_id}/chunks/{index}?offset={offset}",
+    "complete_chunked_upload": "/api/records/{record_id}/uploads/{upload_id}/complete",
+    "list_levels": "/api/levels",
+    "list_surveys": "/api/surveys",
+    "list_records": "/api/records?level={level}",
+}
+
+STREAM_CHUNK_SIZE = 4 * 1024**2  # Bytes read from disk and sent per write
+HTTP_TIMEOUT = 60  # Seconds without socket activity before a request fails
+
+
+class VisionHttpError(Exception):
+    """Raised when Vision answers a request with an unexpected status."""
+
+    def __init__(self, method, path, status, body):
+        super().__init__(f"{method} {path} returned HTTP {status}: {body[:200]!r}")
+        self.status = status
+
+
+class ConnectionPool:
+    """A small pool of keep-alive HTTP connections to a single host."""
+
+    def __init__(self, base_url, size=4, timeout=HTTP_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        """Returns an idle connection, opening a new one if none is available."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def release(self, conn, reusable=True):
+        """Returns a connection to the pool, or closes it if it cannot be reused."""
+        if reusable:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def close(self):
+        """Closes all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def cookies_from_driver(driver):
+    """Harvests the authenticated session cookies from a Selenium driver."""
+    return {cookie["name"]: cookie["value"] for cookie in driver.get_cookies()}
+
+
+def cookies_from_file(cookie_path):
+    """Returns the session cookies a browser run saved to cookie_path, or {}."""
+    try:
+        with open(cookie_path, "r") as f:
+            saved = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    return {
+        cookie["name"]: cookie["value"]
+        for cookie in saved
+        if isinstance(cookie, dict) and "name" in cookie and "value" in cookie
+    }
+
+
+class VisionHttpClient:
+    """
+    Talks to Vision's HTTP endpoints using the cookies of a logged-in session.
+    Safe to share between threads; each request takes its own pooled connection.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        cookies,
+        pool_size=4,
+        chunk_size=STREAM_CHUNK_SIZE,
+        throttle=None,
+    ):
+        self.pool = ConnectionPool(base_url, size=pool_size)
+        self.chunk_size = chunk_size
+        self.throttle = throttle  # Optional TokenBucket shared by all uploads
+        self.headers = {
+            "Cookie": "; ".join(f"{name}={value}" for name, value in cookies.items()),
+            "Accept": "application/json",
+            "Connection": "keep-alive",
+        }
+        # Frameworks that use double-submit CSRF protection expect the token echoed back.
+        if "XSRF-TOKEN" in cookies:
+            self.headers["X-XSRF-TOKEN"] = cookies["XSRF-TOKEN"]
+
+    def _url(self, endpoint, **params):
+        return self.pool.base_path + HTTP_ENDPOINTS[endpoint].format(**params)
+
+    def request_json(self, method, path, payload=None, expect=(200, 201)):
+        """Sends a JSON request and returns the decoded JSON response (or None)."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        headers = dict(self.headers)
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(len(body))
+
+        conn = self.pool.acquire()
+        reusable = False
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            reusable = not response.will_close
+        finally:
+            self.pool.release(conn, reusable)
+
+        if response.status not in expect:
+            raise VisionHttpError(method, path, response.status, data)
+        return json.loads(data) if data else None
+
+    def stream_file(
+        self,
+        method,
+        path,
+        file_path,
+        size,
+        offset=0,
+        progress=None,
+        hasher=None,
+    ):
+        """
+        Streams size bytes of file_path, starting at offset, as the request body.
+        progress, if given, is called with the number of bytes sent so far, and
+        hasher (a hashlib object) is updated with every byte sent.
+        Returns the decoded JSON response (or None).
+        """
+        headers = dict(self.headers)
+        headers["Content-Type"] = "application/octet-stream"
+        headers["Content-Length"] = str(size)
+
+        conn = self.pool.acquire()
+        reusable = False
+        try:
+            conn.putrequest(method, path, skip_accept_encoding=True)
+            for name, value in headers.items():
+                conn.putheader(name, value)
+            conn.endheaders()
+
+            sent = 0
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                while sent < size:
+                    chunk = f.read(min(self.chunk_size, size - sent))
+                    if not chunk:
+                        raise IOError(f"{file_path} ended after {offset + sent} bytes")
+                    if self.throttle is not None:
+                        self.throttle.consume(len(chunk))
+                    conn.send(chunk)
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    sent += len(chunk)
+                    if progress:
+                        progress(sent)
+
+            response = conn.getresponse()
+            data = response.read()
+            reusable = not response.will_close
+        finally:
+            self.pool.release(conn, reusable)
+
+        if response.status not in (200, 201, 204):
+            raise VisionHttpError(method, path, response.status, data)
+        return json.loads(data) if data else None
+
+    def create_record(self, scan_date, module_text, survey_text, level_text):
+        """Creates a new scan record and returns its id."""
+        record = self.request_json(
+            "POST",
+            self._url("create_record"),
+            {
+                "date": scan_date.strftime("%Y-%m-%d"),
+                "module": module_text,
+                "survey": survey_text,
+                "level": level_text,
+            },
+        )
+        return record["id"]
+
+    def upload_file(self, record_id, file_path, size, progress=None):
+        """Streams a whole file into an existing record."""
+        path = self._url(
+            "upload_file",
+            record_id=quote(str(record_id)),
+            file_name=quote(os.path.basename(file_path)),
+        )
+        return self.stream_file("PUT", path, file_path, size, progress=progress)
+
+    def save_record(self, record_id):
+        """Saves (commits) a record once its files are uploaded."""
+        return self.request_json(
+            "POST", self._url("save_record", record_id=quote(str(record_id)))
+        )
+
+    def start_chunked_upload(self, record_id, file_name, size, chunk_size):
+        """Opens a resumable chunked upload for a file and returns its upload id."""
+        upload = self.request_json(
+            "POST",
+            self._url("start_chunked_upload", record_id=quote(str(record_id))),
+            {"name": file_name, "size": size, "chunk_size": chunk_size},
+        )
+        return upload["upload_id"]
+
+    def get_received_chunks(self, record_id, upload_id):
+        """Returns the set of chunk indexes the server already holds."""
+        upload = self.request_json(
+            "GET",
+            self._url(
+                "chunked_upload",
+                record_id=quote(str(record_id)),
+                upload_id=quote(str(upload_id)),
+            ),
+        )
+        return set(upload["received"])
+
+    def upload_chunk(
+        self, record_id, upload_id, index, file_path, offset, length, hasher
+    ):
+        """
+        Streams one chunk of a file. hasher is fed the bytes sent; the server
+        echoes the SHA-256 it computed so the caller can compare the two.
+        Returns the decoded JSON response.
+        """
+        path = self._url(
+            "upload_chunk",
+            record_id=quote(str(record_id)),
+            upload_id=quote(str(upload_id)),
+            index=index,
+            offset=offset,
+        )
+        return self.stream_file(
+            "PUT", path, file_path, length, offset=offset, hasher=hasher
+        )
+
+    def complete_chunked_upload(self, record_id, upload_id):
+        """Asks the server to assemble all chunks into the final file."""
+        return self.request_json(
+            "POST",
+            self._url(
+                "complete_chunked_upload",
+                record_id=quote(str(record_id)),
+                upload_id=quote(str(upload_id)),
+            ),
+        )
+
+    def _list_names(self, endpoint):
+        items = self.request_json("GET", self._url(endpoint)) or []
+        return [item["name"] if isinstance(item, dict) else item for item in items]
+
+    def list_levels(self):
+        """Returns the names of all levels in Vision."""
+        return self._list_names("list_levels")
+
+    def list_surveys(self):
+        """Returns the names of all surveys in Vision."""
+        return self._list_names("list_surveys")
+
+    def list_records(self, level_text):
+        """
+        Returns every record on a level as a list of dicts with id, date,
+        survey, level, saved and files ({file name: size}).
+        """
+        return self.request_json(
+            "GET", self._url("list_records", level=quote(level_text))
+        )
+
+    def close(self):
+        self.pool.close()
+
+
+def upload_scan_file_http(
+    client,
+    file_path,
+    size,
+    scan_date,
+    module_text,
+    survey_text,
+    level_text,
+    timer=NULL_TIMER,
+):
+    """
+    Executes the create → upload → save sequence for a single scan file over HTTP.
+    """
+    with timer.phase("create"):
+        record_id = client.create_record(
+            scan_date, module_text, survey_text, level_text
+        )
+    logging.info("Created record %s for %s", record_id, file_path)
+    with timer.phase("transfer"):
+        client.upload_file(record_id, file_path, size)
+    logging.info("File upload completed for %s", file_path)
+    with timer.phase("save"):
+        client.save_record(record_id)
+    logging.info("File saved successfully for %s", file_path)
+    return record_id
@@ -0,0 +1,139 @@
+"""
+Job ordering for the Vision upload workers.
+
+Every change of level costs a page transition in the browser, so jobs are
+grouped by survey and level (and by date within a level, so the form values
+can be reused between consecutive files). Each worker keeps taking jobs from
+the level it already has open, and only moves to another level once its own
+is exhausted, preferring levels no other worker is on. For batch uploads,
+next_batch() hands out consecutive files of one date folder together.
+
+The order of the levels and of the files within them is set by a policy:
+
+    folder          folder order, as before
+    smallest-first  small files first, for fast early progress
+    largest-first   large files first, so no long upload is left running
+                    alone at the end; best overall throughput
+"""
+
+import threading
+from itertools import chain, zip_longest
+from collections import OrderedDict
+
+SCHEDULE_POLICIES = ("folder", "smallest-first", "largest-first")
+SCHEDULE_POLICY = "folder"
+BATCH_MAX_FILES = 20  # Most files sent in one record by next_batch
+BATCH_MAX_BYTES = 20 * 1024**3  # Most bytes sent in one record by next_batch
+
+
+def order_jobs(jobs, policy=SCHEDULE_POLICY):
+    """
+    Returns an OrderedDict {(survey, level): [jobs]} with the groups and the
+    jobs within each group in the order given by policy.
+    """
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"Unknown schedule policy '{policy}'")
+    groups = OrderedDict()
+    for job in jobs:
+        groups.setdefault((job.survey, job.level), []).append(job)
+    if policy == "folder":
+        for group in groups.values():
+            group.sort(key=lambda job: job.scan_date)
+        return groups
+
+    largest_first = policy == "largest-first"
+    for group in groups.values():
+        # Dates stay together; within a date, order by size.
+        group.sort(
+            key=lambda job: (job.scan_date, -job.size if largest_first else job.size)
+        )
+    ordered = sorted(
+        groups.items(),
+        key=lambda item: sum(job.size for job in item[1]),
+        reverse=largest_first,
+    )
+    return OrderedDict(ordered)
+
+
+class JobScheduler:
+    """
+    Thread-safe source of jobs for the upload workers. next_job() prefers a
+    job on the level the calling worker was given last, which is the level it
+    has open.
+    """
+
+    def __init__(self, jobs, policy=SCHEDULE_POLICY):
+        self._groups = order_jobs(jobs, policy)
+        self._worker_levels = {}  # worker_id -> (survey, level) of its last job
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(group) for group in self._groups.values())
+
+    def next_job(self, worker_id):
+        """Returns the next job for the worker, or None when no jobs are left."""
+        batch = self.next_batch(worker_id, max_files=1)
+        return batch[0] if batch else None
+
+    def next_batch(
+        self, worker_id, max_files=BATCH_MAX_FILES, max_bytes=BATCH_MAX_BYTES
+    ):
+        """
+        Returns the next jobs for the worker that share a date folder, up to
+        max_files and max_bytes (but always at least one), or [] when no jobs
+        are left.
+        """
+        with self._lock:
+            key = self._pick(self._worker_levels.pop(worker_id, None))
+            if key is None:
+                return []
+            group = self._groups[key]
+            batch = [group.pop(0)]
+            size = batch[0].size
+            while (
+                group
+                and len(batch) < max_files
+                and group[0].scan_date == batch[0].scan_date
+                and size + group[0].size <= max_bytes
+            ):
+                size += group[0].size
+                batch.append(group.pop(0))
+            if not group:
+                del self._groups[key]
+            self._worker_levels[worker_id] = key
+            return batch
+
+    def upcoming(self, count):
+        """
+        Returns up to count jobs likely to be handed out next: those on the
+        levels workers are on, taken in turn, then the rest in order.
+        """
+        with self._lock:
+            busy = [
+                key
+                for key in dict.fromkeys(self._worker_levels.values())
+                if key in self._groups
+            ]
+            rest = [key for key in self._groups if key not in busy]
+            interleaved = chain.from_iterable(
+                zip_longest(*(self._groups[key] for key in busy))
+            )
+            jobs = chain(
+                (job for job in interleaved if job is not None),
+                chain.from_iterable(self._groups[key] for key in rest),
+            )
+            return [job for job, _ in zip(jobs, range(count))]
+
+    def _pick(self, current_level):
+        if current_level in self._groups:
+            return current_level
+        if not self._groups:
+            return None
+        # Start on a level no other worker is on; if all are taken, help out
+        # on the one with the most work left.
+        busy = set(self._worker_levels.values())
+        for key in self._groups:
+            if key not in busy:
+                return key
+        return max(self._groups, key=lambda key: len(self._groups[key]))
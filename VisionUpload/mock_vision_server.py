@@ -0,0 +1,715 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Vision, for testing and benchmarking without production.
+
+Run it with `python mock_vision_server.py --port 8765` and point VISION_URL at
+http://localhost:8765. It serves both the HTTP endpoints used by the direct
+upload engine and a small web app with the same buttons, date picker,
+dropdowns, drop zone and toast as the real Vision form, so the browser engine
+can be driven against it too. Opening the app logs the browser in. Request
+latency and upload bandwidth can be limited to mimic a remote server.
+Uploaded bodies are read in chunks and discarded; only their sizes are kept.
+"""
+
+import re
+import time
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import itertools
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MOCK_LEVELS = ["Level 1", "Level 2", "Deck A"]
+MOCK_SURVEYS = ["Blanket Scan", "Progress Scan"]
+MOCK_MODULES = ["Module", "Point Cloud"]
+THROTTLE_BURST = 0.25  # Seconds of bandwidth an idle link may send at once
+TOAST_SECONDS = 2  # How long the "Successfully Saved" toast stays up
+SESSION_COOKIE = "vision_session"
+SESSION_VALUE = "mock-session"
+READ_CHUNK_SIZE = 1024**2
+
+
+# The mock web app. Element classes and texts follow the real Vision form so
+# that the selectors in vision_browser.py work unchanged. /*CONFIG*/null is
+# replaced with the levels, surveys and modules to offer.
+MOCK_APP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Mock Vision</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+td { padding: 4px 12px; cursor: pointer; border-bottom: 1px solid #ddd; }
+.record-cell { display: inline-block; min-width: 120px; padding: 2px 8px; }
+.v-dialog { display: none; position: fixed; top: 10%; left: 20%; width: 60%;
+  background: #fff; border: 1px solid #888; padding: 16px; }
+.v-dialog--active { display: block; }
+.v-date-picker { border: 1px solid #888; padding: 8px; margin: 4px 0; }
+.v-date-picker button { margin: 2px; }
+.v-date-picker-years li { cursor: pointer; }
+.v-select { margin: 8px 0; }
+.v-menu__content { display: none; border: 1px solid #888; background: #fff; }
+.menuable__content__active { display: block; }
+.v-list-item__title { padding: 2px 8px; cursor: pointer; }
+.drop { border: 2px dashed #888; padding: 24px; margin: 8px 0; }
+.v-snack { position: fixed; bottom: 16px; left: 16px; background: #333;
+  color: #fff; padding: 8px 16px; }
+</style>
+</head>
+<body>
+<div class="v-toolbar">
+  <button class="v-btn" type="button" data-create="project"><span>Create</span></button>
+  <button class="v-btn" type="button" data-create="survey"><span>Create</span></button>
+  <button class="v-btn" type="button" data-create="scan"><span>Create</span></button>
+</div>
+<h3 id="current-level">No level selected</h3>
+<table><tbody id="levels"></tbody></table>
+<div class="records" id="records" data-level=""></div>
+
+<div class="v-dialog" id="other-dialog">
+  <p>Only scans can be created in the mock.</p>
+  <button class="v-btn" type="button" data-close><span>Close</span></button>
+</div>
+
+<div class="v-dialog" id="scan-dialog">
+  <div id="step-start">
+    <p>New scan record</p>
+    <button class="v-btn" type="button" id="continue"><span>Continue</span></button>
+    <button class="v-btn" type="button" data-close><span>Cancel</span></button>
+  </div>
+  <div id="step-form" style="display: none">
+    <div class="v-text-field">
+      <label>Date *</label><input type="text" readonly id="date">
+    </div>
+    <div class="v-date-picker" id="picker" style="display: none">
+      <div class="v-date-picker-header__value"><button type="button" id="picker-header"></button></div>
+      <div class="v-date-picker-table--date" id="day-table"></div>
+      <div class="v-date-picker-table--month" id="month-table" style="display: none"></div>
+      <ul class="v-date-picker-years" id="year-list" style="display: none"></ul>
+    </div>
+    <div class="v-select" id="module-field">
+      <label>Module</label>
+      <div class="v-select__selection"></div>
+      <input type="text" data-vv-name="Module" autocomplete="off">
+    </div>
+    <div class="v-select" id="survey-field">
+      <label>Survey</label>
+      <div class="v-select__selection"></div>
+      <input type="text" data-vv-name="Survey" autocomplete="off">
+    </div>
+    <div class="drop">Drop scan files here</div>
+    <div id="upload-status"></div>
+    <button class="v-btn" type="button" id="save"><span>Save</span></button>
+    <button class="v-btn" type="button" data-close><span>Cancel</span></button>
+  </div>
+</div>
+
+<div class="v-menu__content" id="menu"></div>
+<div id="toasts"></div>
+
+<script>
+var CONFIG = /*CONFIG*/null;
+var MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+var state = { level: null, recordId: null, uploads: [], picker: null, field: null };
+
+function $(id) { return document.getElementById(id); }
+function show(el, visible) { el.style.display = visible ? '' : 'none'; }
+function pad(n) { return (n < 10 ? '0' : '') + n; }
+function api(method, path, body) {
+  return fetch(path, {
+    method: method,
+    headers: { 'Content-Type': 'application/json' },
+    body: body === undefined ? undefined : JSON.stringify(body)
+  }).then(function (response) {
+    if (!response.ok) { throw new Error(method + ' ' + path + ': ' + response.status); }
+    return response.json();
+  });
+}
+function toast(text, seconds) {
+  var el = document.createElement('div');
+  el.className = 'v-snack';
+  el.textContent = text;
+  $('toasts').appendChild(el);
+  setTimeout(function () { el.remove(); }, seconds * 1000);
+}
+
+// ----- Levels -----
+CONFIG.levels.forEach(function (name) {
+  var row = document.createElement('tr');
+  var cell = document.createElement('td');
+  cell.textContent = name;
+  cell.addEventListener('click', function () {
+    state.level = name;
+    $('current-level').textContent = 'Level: ' + name;
+    loadRecords();
+  });
+  row.appendChild(cell);
+  $('levels').appendChild(row);
+});
+
+// ----- Records -----
+function loadRecords() {
+  var level = state.level;
+  return api('GET', '/api/records?level=' + encodeURIComponent(level)).then(function (records) {
+    if (level !== state.level) { return; }
+    var list = $('records');
+    list.innerHTML = '';
+    records.forEach(function (record) {
+      Object.keys(record.files).forEach(function (name) {
+        var row = document.createElement('div');
+        row.className = 'record-row';
+        row.setAttribute('data-record-id', record.id);
+        [record.date || '', record.survey || '', name, String(record.files[name]),
+         record.saved ? 'Saved' : 'Draft'].forEach(function (text) {
+          var cell = document.createElement('span');
+          cell.className = 'record-cell';
+          cell.textContent = text;
+          row.appendChild(cell);
+        });
+        list.appendChild(row);
+      });
+    });
+    $('records').setAttribute('data-level', level);
+  });
+}
+
+// ----- Dialogs -----
+function openDialog(id) { $(id).classList.add('v-dialog--active'); }
+function closeDialogs() {
+  document.querySelectorAll('.v-dialog--active').forEach(function (dialog) {
+    dialog.classList.remove('v-dialog--active');
+  });
+  show($('picker'), false);
+  closeMenu();
+}
+document.querySelectorAll('[data-create]').forEach(function (button) {
+  button.addEventListener('click', function () {
+    if (button.getAttribute('data-create') !== 'scan') { return openDialog('other-dialog'); }
+    state.recordId = null;
+    state.uploads = [];
+    $('upload-status').textContent = '';
+    show($('step-start'), true);
+    show($('step-form'), false);
+    openDialog('scan-dialog');
+  });
+});
+document.querySelectorAll('[data-close]').forEach(function (button) {
+  button.addEventListener('click', closeDialogs);
+});
+document.addEventListener('keydown', function (e) {
+  if (e.key === 'Escape') { closeDialogs(); }
+});
+$('continue').addEventListener('click', function () {
+  state.recordId = api('POST', '/api/records', { level: state.level })
+    .then(function (record) { return record.id; });
+  show($('step-start'), false);
+  show($('step-form'), true);
+});
+
+// ----- Date picker -----
+function setView(view) {
+  show($('day-table'), view === 'date');
+  show($('month-table'), view === 'month');
+  show($('year-list'), view === 'year');
+  state.picker.view = view;
+  renderPicker();
+}
+function renderPicker() {
+  var p = state.picker;
+  $('picker-header').textContent = p.view === 'date' ? MONTHS[p.month] + ' ' + p.year : String(p.year);
+  var days = $('day-table'), months = $('month-table'), years = $('year-list');
+  days.innerHTML = months.innerHTML = years.innerHTML = '';
+  if (p.view === 'date') {
+    var count = new Date(p.year, p.month + 1, 0).getDate();
+    for (var d = 1; d <= count; d++) {
+      days.appendChild(pickerButton(String(d), pickDay.bind(null, d)));
+    }
+  } else if (p.view === 'month') {
+    MONTHS.forEach(function (name, m) {
+      months.appendChild(pickerButton(name, function () { p.month = m; setView('date'); }));
+    });
+  } else {
+    for (var y = p.year + 5; y >= p.year - 15; y--) {
+      var item = document.createElement('li');
+      item.textContent = String(y);
+      item.addEventListener('click', function (year) {
+        p.year = year;
+        setView('month');
+      }.bind(null, y));
+      years.appendChild(item);
+    }
+  }
+}
+function pickerButton(text, onClick) {
+  var button = document.createElement('button');
+  var label = document.createElement('div');
+  button.type = 'button';
+  label.textContent = text;
+  button.appendChild(label);
+  button.addEventListener('click', onClick);
+  return button;
+}
+function pickDay(day) {
+  var p = state.picker;
+  $('date').value = p.year + '-' + pad(p.month + 1) + '-' + pad(day);
+  show($('picker'), false);
+}
+$('date').addEventListener('click', function () {
+  var now = new Date();
+  state.picker = { year: now.getFullYear(), month: now.getMonth(), view: 'date' };
+  show($('picker'), true);
+  setView('date');
+});
+$('picker-header').addEventListener('click', function () {
+  setView(state.picker.view === 'date' ? 'month' : 'year');
+});
+
+// ----- Dropdowns -----
+function selectField(input) {
+  var name = input.getAttribute('data-vv-name');
+  return { input: input, items: name === 'Module' ? CONFIG.modules : CONFIG.surveys,
+           selection: input.closest('.v-select').querySelector('.v-select__selection') };
+}
+function matches(field) {
+  var text = field.input.value.trim().toLowerCase();
+  return field.items.filter(function (item) { return item.toLowerCase().indexOf(text) === 0; });
+}
+function openMenu(field) {
+  state.field = field;
+  var menu = $('menu');
+  menu.innerHTML = '';
+  matches(field).forEach(function (item) {
+    var el = document.createElement('div');
+    el.className = 'v-list-item__title';
+    el.textContent = item;
+    el.addEventListener('mousedown', function (e) {
+      e.preventDefault();
+      choose(field, item);
+    });
+    menu.appendChild(el);
+  });
+  menu.classList.add('menuable__content__active');
+}
+function closeMenu() {
+  $('menu').classList.remove('menuable__content__active');
+  state.field = null;
+}
+function choose(field, item) {
+  field.selection.textContent = item;
+  field.input.value = '';
+  closeMenu();
+}
+document.querySelectorAll('[data-vv-name]').forEach(function (input) {
+  var field = selectField(input);
+  input.addEventListener('focus', function () { openMenu(field); });
+  input.addEventListener('click', function () { openMenu(field); });
+  input.addEventListener('input', function () { openMenu(field); });
+  input.addEventListener('blur', function () { setTimeout(closeMenu, 100); });
+  input.addEventListener('keydown', function (e) {
+    if (e.key !== 'Enter') { return; }
+    var found = matches(field);
+    if (found.length) { choose(field, found[0]); }
+  });
+});
+
+// ----- Upload -----
+var dropZone = document.querySelector('.drop');
+['dragenter', 'dragover'].forEach(function (name) {
+  dropZone.addEventListener(name, function (e) { e.preventDefault(); });
+});
+dropZone.addEventListener('drop', function (e) {
+  e.preventDefault();
+  var files = Array.prototype.slice.call((e.dataTransfer && e.dataTransfer.files) || []);
+  var previous = state.recordId;
+  files.forEach(function (file) {
+    var status = document.createElement('div');
+    status.textContent = 'Uploading ' + file.name;
+    $('upload-status').appendChild(status);
+    // Like some browsers' upload queues, optionally send one file at a time.
+    var upload = (CONFIG.sequentialUploads ? previous : state.recordId).then(function () {
+      return state.recordId;
+    }).then(function (recordId) {
+      // XMLHttpRequest rather than fetch, so the upload progress can be followed.
+      return new Promise(function (resolve, reject) {
+        var xhr = new XMLHttpRequest();
+        xhr.open('PUT', '/api/records/' + recordId + '/files?name=' + encodeURIComponent(file.name));
+        xhr.upload.addEventListener('progress', function (e) {
+          status.textContent = 'Uploading ' + file.name + ' ' +
+            Math.round(100 * e.loaded / (e.total || file.size || 1)) + '%';
+        });
+        xhr.addEventListener('load', function () {
+          if (xhr.status >= 200 && xhr.status < 300) { resolve(); } else { reject(); }
+        });
+        xhr.addEventListener('error', reject);
+        xhr.send(file);
+      });
+    }).then(function () {
+      status.textContent = 'Uploaded ' + file.name;
+    }, function () {
+      status.textContent = 'Failed: ' + file.name;
+    });
+    state.uploads.push(upload);
+    previous = upload;
+  });
+});
+$('save').addEventListener('click', function () {
+  var fields = {
+    date: $('date').value,
+    module: selectField(document.querySelector('[data-vv-name=Module]')).selection.textContent,
+    survey: selectField(document.querySelector('[data-vv-name=Survey]')).selection.textContent,
+    level: state.level
+  };
+  Promise.all(state.uploads).then(function () { return state.recordId; })
+    .then(function (recordId) { return api('POST', '/api/records/' + recordId + '/save', fields); })
+    .then(function () {
+      closeDialogs();
+      toast('Successfully Saved', CONFIG.toastSeconds);
+      loadRecords();
+    }, function (error) {
+      toast('Save failed: ' + error.message, CONFIG.toastSeconds);
+    });
+});
+</script>
+</body>
+</html>
+"""
+
+
+class Throttle:
+    """Caps the combined rate of all uploads to the server, in bytes per second."""
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, size):
+        """Blocks until size more bytes may be received."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Time spent reading counts towards the budget, up to a short burst.
+            self._next = max(self._next, now - THROTTLE_BURST) + size / self.rate
+            delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MockVisionState:
+    """In-memory records shared by all request handlers."""
+
+    def __init__(self, levels=MOCK_LEVELS, surveys=MOCK_SURVEYS, modules=MOCK_MODULES):
+        self.lock = threading.Lock()
+        self.levels = list(levels)
+        self.surveys = list(surveys)
+        self.modules = list(modules)
+        self.records = {}
+        self.uploads = {}
+        self._ids = itertools.count(1)
+
+    def create_record(self, fields):
+        with self.lock:
+            record_id = next(self._ids)
+            self.records[record_id] = dict(fields, id=record_id, files={}, saved=False)
+            return self.records[record_id]
+
+    def start_upload(self, record_id, fields):
+        with self.lock:
+            upload_id = str(next(self._ids))
+            self.uploads[upload_id] = dict(fields, record_id=record_id, chunks={})
+            return upload_id
+
+
+class MockVisionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+    state = None  # Set by make_server
+    latency = 0.0  # Seconds added before every response
+    sequential_uploads = False  # Whether the web app sends dropped files one by one
+    throttle = Throttle()
+
+    routes = [
+        ("GET", re.compile(r"^/$"), "handle_index"),
+        ("GET", re.compile(r"^/login$"), "handle_login"),
+        ("POST", re.compile(r"^/api/records$"), "handle_create"),
+        ("PUT", re.compile(r"^/api/records/(\d+)/files$"), "handle_upload"),
+        ("POST", re.compile(r"^/api/records/(\d+)/save$"), "handle_save"),
+        ("GET", re.compile(r"^/api/records$"), "handle_list"),
+        ("GET", re.compile(r"^/api/levels$"), "handle_list_levels"),
+        ("GET", re.compile(r"^/api/surveys$"), "handle_list_surveys"),
+        ("POST", re.compile(r"^/api/records/(\d+)/uploads$"), "handle_start_upload"),
+        ("GET", re.compile(r"^/api/records/(\d+)/uploads/(\w+)$"), "handle_get_upload"),
+        (
+            "PUT",
+            re.compile(r"^/api/records/(\d+)/uploads/(\w+)/chunks/(\d+)$"),
+            "handle_upload_chunk",
+        ),
+        (
+            "POST",
+            re.compile(r"^/api/records/(\d+)/uploads/(\w+)/complete$"),
+            "handle_complete_upload",
+        ),
+    ]
+
+    def log_message(self, format, *args):
+        logging.debug("mock vision: " + format, *args)
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        self.query = parse_qs(parts.query)
+        if self.latency:
+            time.sleep(self.latency)
+        for method, pattern, handler in self.routes:
+            match = pattern.match(parts.path)
+            if method == self.command and match:
+                if parts.path.startswith("/api/") and not self._authenticated():
+                    self._discard_body()
+                    return self.send_json(401, {"error": "not logged in"})
+                return getattr(self, handler)(*match.groups())
+        self._discard_body()
+        self.send_json(404, {"error": "not found"})
+
+    do_GET = do_POST = do_PUT = _dispatch
+
+    # ----- Helpers -----
+
+    def _authenticated(self):
+        cookies = self.headers.get("Cookie", "")
+        return f"{SESSION_COOKIE}={SESSION_VALUE}" in cookies
+
+    def _discard_body(self):
+        self._read_body()
+
+    def _read_body(self, hasher=None):
+        """Reads the request body in chunks and returns the number of bytes read."""
+        remaining = int(self.headers.get("Content-Length") or 0)
+        received = 0
+        while remaining > 0:
+            chunk = self.rfile.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            self.throttle.consume(len(chunk))
+            if hasher is not None:
+                hasher.update(chunk)
+            received += len(chunk)
+            remaining -= len(chunk)
+        return received
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_body(self, status, body, content_type, extra_headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_body(status, body, "application/json", extra_headers)
+
+    # ----- Routes -----
+
+    def handle_index(self):
+        config = {
+            "levels": self.state.levels,
+            "surveys": self.state.surveys,
+            "modules": self.state.modules,
+            "toastSeconds": TOAST_SECONDS,
+            "sequentialUploads": self.sequential_uploads,
+        }
+        body = MOCK_APP_HTML.replace("/*CONFIG*/null", json.dumps(config))
+        self.send_body(
+            200,
+            body.encode("utf-8"),
+            "text/html; charset=utf-8",
+            [("Set-Cookie", f"{SESSION_COOKIE}={SESSION_VALUE}; Path=/")],
+        )
+
+    def handle_login(self):
+        self.send_body(
+            200,
+            b"<html><body>Logged in</body></html>",
+            "text/html",
+            [("Set-Cookie", f"{SESSION_COOKIE}={SESSION_VALUE}; Path=/")],
+        )
+
+    def handle_create(self):
+        record = self.state.create_record(self.read_json())
+        self.send_json(201, {"id": record["id"]})
+
+    def handle_upload(self, record_id):
+        record = self.state.records.get(int(record_id))
+        if record is None:
+            self._discard_body()
+            return self.send_json(404, {"error": "no such record"})
+        name = unquote(self.query.get("name", ["upload"])[0])
+        received = self._read_body()
+        with self.state.lock:
+            record["files"][name] = received
+        self.send_json(200, {"name": name, "size": received})
+
+    def handle_save(self, record_id):
+        fields = self.read_json()
+        record = self.state.records.get(int(record_id))
+        if record is None:
+            return self.send_json(404, {"error": "no such record"})
+        with self.state.lock:
+            # The web form sends its fields on save; the HTTP engine sends none.
+            record.update(
+                {k: v for k, v in fields.items() if k not in ("id", "files", "saved")}
+            )
+            record["saved"] = True
+        self.send_json(200, {"id": record["id"], "saved": True})
+
+    def _find_upload(self, record_id, upload_id):
+        upload = self.state.uploads.get(upload_id)
+        if upload is None or upload["record_id"] != int(record_id):
+            return None
+        return upload
+
+    def handle_start_upload(self, record_id):
+        if int(record_id) not in self.state.records:
+            self._discard_body()
+            return self.send_json(404, {"error": "no such record"})
+        upload_id = self.state.start_upload(int(record_id), self.read_json())
+        self.send_json(201, {"upload_id": upload_id})
+
+    def handle_get_upload(self, record_id, upload_id):
+        upload = self._find_upload(record_id, upload_id)
+        if upload is None:
+            return self.send_json(404, {"error": "no such upload"})
+        with self.state.lock:
+            received = sorted(upload["chunks"])
+        self.send_json(200, {"received": received})
+
+    def handle_upload_chunk(self, record_id, upload_id, index):
+        upload = self._find_upload(record_id, upload_id)
+        if upload is None:
+            self._discard_body()
+            return self.send_json(404, {"error": "no such upload"})
+        hasher = hashlib.sha256()
+        received = self._read_body(hasher)
+        offset = int(self.query.get("offset", ["0"])[0])
+        with self.state.lock:
+            upload["chunks"][int(index)] = (offset, received)
+        self.send_json(200, {"index": int(index), "sha256": hasher.hexdigest()})
+
+    def handle_complete_upload(self, record_id, upload_id):
+        upload = self._find_upload(record_id, upload_id)
+        if upload is None:
+            return self.send_json(404, {"error": "no such upload"})
+        with self.state.lock:
+            received = sum(length for _, length in upload["chunks"].values())
+            if received != upload["size"]:
+                return self.send_json(
+                    409, {"error": "incomplete upload", "received": received}
+                )
+            self.state.records[int(record_id)]["files"][upload["name"]] = received
+            del self.state.uploads[upload_id]
+        self.send_json(200, {"name": upload["name"], "size": received})
+
+    def handle_list(self):
+        filters = {
+            key: values[0]
+            for key, values in self.query.items()
+            if key in ("level", "date", "survey")
+        }
+        with self.state.lock:
+            records = [
+                dict(record, files=dict(record["files"]))
+                for record in self.state.records.values()
+                if all(record.get(key) == value for key, value in filters.items())
+            ]
+        self.send_json(200, records)
+
+    def handle_list_levels(self):
+        self.send_json(200, [{"name": name} for name in self.state.levels])
+
+    def handle_list_surveys(self):
+        self.send_json(200, [{"name": name} for name in self.state.surveys])
+
+
+def make_server(
+    host="127.0.0.1",
+    port=0,
+    levels=MOCK_LEVELS,
+    surveys=MOCK_SURVEYS,
+    latency=0.0,
+    bandwidth=None,
+    sequential_uploads=False,
+):
+    """
+    Creates (but does not start) a mock Vision server. Port 0 picks a free port;
+    the actual address is available as server.server_address. latency (seconds)
+    is added to every request and bandwidth (bytes per second) caps uploads.
+    With sequential_uploads, the web app uploads dropped files one at a time.
+    """
+    state = MockVisionState(levels, surveys)
+    handler = type(
+        "BoundMockVisionHandler",
+        (MockVisionHandler,),
+        {
+            "state": state,
+            "latency": latency,
+            "throttle": Throttle(bandwidth),
+            "sequential_uploads": sequential_uploads,
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, **kwargs):
+    """Starts a mock Vision server on a background thread and returns it."""
+    server = make_server(host, port, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, help="upload bandwidth cap in MB/s (default: none)"
+    )
+    parser.add_argument(
+        "--sequential-uploads",
+        action="store_true",
+        help="upload the files of a drop one at a time, not all at once",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    server = make_server(
+        args.host,
+        args.port,
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024**2 if args.bandwidth else None,
+        sequential_uploads=args.sequential_uploads,
+    )
+    logging.info("Mock Vision listening on http://%s:%d", *server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
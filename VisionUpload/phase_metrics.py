@@ -0,0 +1,258 @@
+"""
+Per-phase timing instrumentation for the Vision upload script.
+
+Each phase of a file upload (create, continue, date, module, survey, drop,
+transfer, save, toast, retry, ...) is timed with a monotonic clock and
+appended as a JSON line to a metrics file shared by all runs. The history is
+used to summarise a run by phase percentiles and to fit the upload time
+estimate shown before a run starts.
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+METRICS_PATH = os.path.join(
+    os.path.expanduser("~"), ".vision_upload", "phase_metrics.jsonl"
+)
+MIN_ESTIMATE_SAMPLES = 10  # Completed files needed before the fitted estimate is used
+
+# The estimate used before any history exists: 30 s of form filling per file
+# plus the transfer at 100 MB/s.
+FALLBACK_SECONDS_PER_FILE = 30
+FALLBACK_MBPS = 100
+
+
+def _mbps(size, seconds):
+    return size / (1024**2) / seconds if seconds > 0 and size else None
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class MetricsRecorder:
+    """Thread-safe writer of phase records for one run."""
+
+    def __init__(self, path=METRICS_PATH, engine=None):
+        self.path = path
+        self.engine = engine
+        self.run_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._durations = defaultdict(list)
+        self._bytes_done = 0
+        self._started = time.monotonic()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+
+    def record(self, file_path, size, phase, seconds, ok=True, attempt=1, files=1):
+        """Appends a single phase record; files counts the files of a batch."""
+        record = {
+            "ts": time.time(),
+            "run": self.run_id,
+            "engine": self.engine,
+            "file": file_path,
+            "size": size,
+            "phase": phase,
+            "seconds": round(seconds, 4),
+            "mbps": _mbps(size, seconds) if phase in ("transfer", "file") else None,
+            "ok": ok,
+            "attempt": attempt,
+            "files": files,
+        }
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            if ok:
+                self._durations[phase].append(seconds)
+                if phase == "file":
+                    self._bytes_done += size
+
+    def timer(self, file_path, size, files=1):
+        """Returns a PhaseTimer for one file, or a batch of files of size bytes."""
+        return PhaseTimer(self, file_path, size, files)
+
+    def summary(self):
+        """Returns {phase: {count, mean, p50, p90, p99}} for this run."""
+        with self._lock:
+            durations = {phase: sorted(v) for phase, v in self._durations.items()}
+        return {
+            phase: {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p99": percentile(values, 0.99),
+            }
+            for phase, values in durations.items()
+        }
+
+    def log_summary(self):
+        """Logs a per-phase percentile table and the run's effective throughput."""
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info("Phase timings for this run (seconds):")
+        logging.info(
+            "%-10s %6s %8s %8s %8s %8s", "phase", "count", "mean", "p50", "p90", "p99"
+        )
+        for phase, stats in sorted(summary.items()):
+            logging.info(
+                "%-10s %6d %8.2f %8.2f %8.2f %8.2f",
+                phase,
+                stats["count"],
+                stats["mean"],
+                stats["p50"],
+                stats["p90"],
+                stats["p99"],
+            )
+        elapsed = time.monotonic() - self._started
+        logging.info(
+            "Uploaded %.2f GB in %.2f hours (%.1f MB/s effective)",
+            self._bytes_done / (1024**3),
+            elapsed / 3600,
+            _mbps(self._bytes_done, elapsed) or 0.0,
+        )
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PhaseTimer:
+    """Times the phases of one file's upload, across retries."""
+
+    def __init__(self, recorder, file_path, size, files=1):
+        self.recorder = recorder
+        self.file_path = file_path
+        self.size = size
+        self.files = files
+        self.attempt = 0
+        self._started = time.monotonic()
+
+    def next_attempt(self):
+        self.attempt += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that records how long the enclosed block took."""
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.recorder.record(
+                self.file_path,
+                self.size,
+                name,
+                time.monotonic() - start,
+                ok=ok,
+                attempt=max(self.attempt, 1),
+                files=self.files,
+            )
+
+    def finish(self, ok):
+        """Records the file's total time, including retries."""
+        self.recorder.record(
+            self.file_path,
+            self.size,
+            "file",
+            time.monotonic() - self._started,
+            ok=ok,
+            attempt=max(self.attempt, 1),
+            files=self.files,
+        )
+
+
+class _NullTimer:
+    """Stand-in used when no metrics are being recorded."""
+
+    attempt = 0
+
+    def next_attempt(self):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def finish(self, ok):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def fit_file_time(path=METRICS_PATH, engine=None):
+    """
+    Fits seconds = overhead + size / throughput to completed files in the
+    history by least squares. If engine is given, only files uploaded with
+    that engine count. A batch counts as one file of its average size and
+    time. Returns (overhead_seconds, seconds_per_byte, sample_count), or
+    None if there are too few samples.
+    """
+    xs, ys = [], []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("phase") != "file" or not record.get("ok"):
+                    continue
+                if engine is not None and record.get("engine") != engine:
+                    continue
+                files = record.get("files") or 1
+                xs.append(record["size"] / files)
+                ys.append(record["seconds"] / files)
+    except IOError:
+        return None
+
+    n = len(xs)
+    if n < MIN_ESTIMATE_SAMPLES:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        # All files the same size: no slope can be fitted, use the mean time.
+        return mean_y, 0.0, n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    slope = max(slope, 0.0)
+    return max(mean_y - slope * mean_x, 0.0), slope, n
+
+
+def estimate_upload_hours(sizes, worker_count=1, path=METRICS_PATH, engine=None):
+    """
+    Estimates the wall-clock hours to upload files of the given sizes with
+    worker_count parallel workers, fitted on past uploads with engine if it
+    is given. Returns (hours, description).
+    """
+    fit = fit_file_time(path, engine)
+    if fit is None:
+        seconds = sum(
+            FALLBACK_SECONDS_PER_FILE + size / (1024**2) / FALLBACK_MBPS
+            for size in sizes
+        )
+        description = f"assuming {FALLBACK_MBPS} MBps; no upload history yet"
+    else:
+        overhead, per_byte, samples = fit
+        seconds = sum(overhead + per_byte * size for size in sizes)
+        history = (
+            f"{samples} past {engine} uploads" if engine else f"{samples} past uploads"
+        )
+        description = f"fitted on {history}: {overhead:.1f} s per file" + (
+            f" + {1 / per_byte / 1024**2:.1f} MB/s" if per_byte else ""
+        )
+    return seconds / max(worker_count, 1) / 3600, description
@@ -0,0 +1,376 @@
+"""
+Live progress of an upload run, on the terminal and over HTTP.
+
+UploadProgress counts the files and bytes queued, done and failed per survey
+and level as the workers report them, and derives the current upload rate
+over a rolling window and an ETA from it. ProgressDisplay redraws a status
+line on the terminal and logs a per-level table every few minutes, so an
+overnight run can be checked at a glance.
+
+start_progress_server() serves the same numbers on a local port, as JSON at
+/progress and in the Prometheus text format at /metrics, so monitoring can
+alert when throughput stalls.
+"""
+
+import sys
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RATE_WINDOW = 600.0  # Seconds of completed uploads the current rate is taken over
+DISPLAY_INTERVAL = 2.0  # Seconds between redraws of the terminal status line
+PROGRESS_LOG_INTERVAL = 300.0  # Seconds between logged per-level progress tables
+PROGRESS_HOST = "127.0.0.1"
+METRIC_PREFIX = "vision_upload"
+
+
+COUNT_FIELDS = (
+    "files",
+    "bytes",
+    "files_done",
+    "bytes_done",
+    "files_failed",
+    "bytes_failed",
+)
+
+
+class _LevelCounts:
+    __slots__ = COUNT_FIELDS
+
+    def __init__(self):
+        self.files = self.bytes = 0
+        self.files_done = self.bytes_done = 0
+        self.files_failed = self.bytes_failed = 0
+
+
+class UploadProgress:
+    """Thread-safe counters for one run, updated by the upload workers."""
+
+    def __init__(self, jobs=(), window=RATE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._levels = OrderedDict()  # (survey, level) -> _LevelCounts
+        self._completions = deque()  # (monotonic time, size) within the window
+        self._in_flight = 0
+        self._started = time.monotonic()
+        self._started_at = time.time()
+        self._last_done_at = None
+        self.add_jobs(jobs)
+
+    def _counts(self, job):
+        return self._levels.setdefault((job.survey, job.level), _LevelCounts())
+
+    def add_jobs(self, jobs):
+        """Adds newly queued jobs to the totals."""
+        with self._lock:
+            for job in jobs:
+                counts = self._counts(job)
+                counts.files += 1
+                counts.bytes += job.size
+
+    def discard_job(self, job):
+        """Takes a queued job that will not be uploaded here out of the totals."""
+        with self._lock:
+            counts = self._counts(job)
+            counts.files -= 1
+            counts.bytes -= job.size
+
+    def start_file(self, job):
+        with self._lock:
+            self._in_flight += 1
+
+    def retry_file(self, job):
+        """Takes job out of the uploads in flight; it will be started again."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def finish_file(self, job, ok):
+        """Counts job as uploaded, or as failed if ok is false."""
+        with self._lock:
+            self._in_flight -= 1
+            counts = self._counts(job)
+            if not ok:
+                counts.files_failed += 1
+                counts.bytes_failed += job.size
+                return
+            counts.files_done += 1
+            counts.bytes_done += job.size
+            self._completions.append((time.monotonic(), job.size))
+            self._last_done_at = time.time()
+
+    def _rate(self, now):
+        """Bytes per second over the window. Caller holds the lock."""
+        while self._completions and self._completions[0][0] < now - self.window:
+            self._completions.popleft()
+        span = min(self.window, now - self._started)
+        if span <= 0:
+            return 0.0
+        return sum(size for _, size in self._completions) / span
+
+    def snapshot(self):
+        """Returns the current progress as a JSON-serialisable dict."""
+        now = time.monotonic()
+        with self._lock:
+            rate = self._rate(now)
+            levels = [
+                {
+                    "survey": survey,
+                    "level": level,
+                    **{field: getattr(c, field) for field in COUNT_FIELDS},
+                }
+                for (survey, level), c in self._levels.items()
+            ]
+            in_flight = self._in_flight
+            last_done_at = self._last_done_at
+        totals = {key: sum(level[key] for level in levels) for key in COUNT_FIELDS}
+        remaining = totals["bytes"] - totals["bytes_done"] - totals["bytes_failed"]
+        return dict(
+            totals,
+            in_flight=in_flight,
+            rate=rate,
+            eta_seconds=remaining / rate if rate and remaining else None,
+            elapsed_seconds=now - self._started,
+            started_at=self._started_at,
+            last_done_at=last_done_at,
+            levels=levels,
+        )
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}"
+
+
+def format_status(snapshot):
+    """Returns a one-line summary of a snapshot."""
+    return "%d/%d files, %.2f/%.2f GB, %.1f MB/s, ETA %s (%d uploading, %d failed)" % (
+        snapshot["files_done"],
+        snapshot["files"],
+        snapshot["bytes_done"] / (1024**3),
+        snapshot["bytes"] / (1024**3),
+        snapshot["rate"] / (1024**2),
+        format_duration(snapshot["eta_seconds"]),
+        snapshot["in_flight"],
+        snapshot["files_failed"],
+    )
+
+
+def log_progress(snapshot):
+    """Logs the overall status and a per-level table."""
+    logging.info("Progress: %s", format_status(snapshot))
+    for level in snapshot["levels"]:
+        logging.info(
+            "  %-20s %-15s %5d/%-5d files %8.2f/%-8.2f GB%s",
+            level["survey"],
+            level["level"],
+            level["files_done"],
+            level["files"],
+            level["bytes_done"] / (1024**3),
+            level["bytes"] / (1024**3),
+            f" ({level['files_failed']} failed)" if level["files_failed"] else "",
+        )
+
+
+class _StatusLineHandler(logging.Handler):
+    """
+    Stands in for a log handler that writes to the status line's stream:
+    clears the status line before each record and draws it again after.
+    """
+
+    def __init__(self, display, handler):
+        super().__init__(handler.level)
+        self.display = display
+        self.handler = handler
+
+    def handle(self, record):
+        with self.display._lock:
+            self.display._clear()
+            self.handler.handle(record)
+            self.display._draw()
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+
+class ProgressDisplay:
+    """
+    Background thread that keeps a status line on the terminal up to date and
+    logs the per-level table every log_interval seconds. Without a terminal
+    only the logged tables are shown. While it runs, log records written to
+    the same stream are printed above the status line.
+    """
+
+    def __init__(
+        self,
+        progress,
+        stream=None,
+        interval=DISPLAY_INTERVAL,
+        log_interval=PROGRESS_LOG_INTERVAL,
+    ):
+        self.progress = progress
+        self.stream = stream or sys.stderr
+        self.interactive = self.stream.isatty()
+        self.interval = interval if self.interactive else log_interval
+        self.log_interval = log_interval
+        self._line = ""
+        self._lock = threading.RLock()
+        self._wrapped = []  # (original, wrapper) log handlers
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="progress-display", daemon=True
+        )
+
+    def start(self):
+        if self.interactive:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                if getattr(handler, "stream", None) is self.stream:
+                    wrapper = _StatusLineHandler(self, handler)
+                    root.removeHandler(handler)
+                    root.addHandler(wrapper)
+                    self._wrapped.append((handler, wrapper))
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the display and logs the final table."""
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            self._clear()
+            self._line = ""
+        root = logging.getLogger()
+        for handler, wrapper in self._wrapped:
+            root.removeHandler(wrapper)
+            root.addHandler(handler)
+        self._wrapped = []
+        log_progress(self.progress.snapshot())
+
+    def _clear(self):
+        if self._line:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+
+    def _draw(self):
+        if self._line:
+            self.stream.write("\r\033[K" + self._line)
+            self.stream.flush()
+
+    def _run(self):
+        last_logged = time.monotonic()
+        while not self._stop.wait(self.interval):
+            snapshot = self.progress.snapshot()
+            if time.monotonic() - last_logged >= self.log_interval:
+                last_logged = time.monotonic()
+                log_progress(snapshot)
+            if self.interactive:
+                with self._lock:
+                    self._line = format_status(snapshot)
+                    self._draw()
+
+
+# ------------------------- HTTP Endpoint -------------------------
+
+
+def prometheus_text(snapshot):
+    """Formats a snapshot in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(
+                '%s="%s"' % (key, val.replace("\\", "\\\\").replace('"', '\\"'))
+                for key, val in labels.items()
+            )
+            lines.append(
+                f"{name}{{{label_text}}} {value}" if labels else f"{name} {value}"
+            )
+
+    def per_level(key):
+        return [
+            ({"survey": level["survey"], "level": level["level"]}, level[key])
+            for level in snapshot["levels"]
+        ]
+
+    metric("files", "gauge", "Files queued for upload.", per_level("files"))
+    metric("files_done", "counter", "Files uploaded.", per_level("files_done"))
+    metric("files_failed", "counter", "Files that failed.", per_level("files_failed"))
+    metric("bytes", "gauge", "Bytes queued for upload.", per_level("bytes"))
+    metric("bytes_done", "counter", "Bytes uploaded.", per_level("bytes_done"))
+    metric("in_flight", "gauge", "Uploads in progress.", [({}, snapshot["in_flight"])])
+    metric(
+        "rate_bytes_per_second",
+        "gauge",
+        "Upload rate over the last %d seconds." % RATE_WINDOW,
+        [({}, round(snapshot["rate"], 1))],
+    )
+    metric(
+        "eta_seconds",
+        "gauge",
+        "Estimated seconds until the queue is done.",
+        [({}, snapshot["eta_seconds"] and round(snapshot["eta_seconds"]))],
+    )
+    metric(
+        "start_time_seconds",
+        "gauge",
+        "Unix time the run started.",
+        [({}, snapshot["started_at"])],
+    )
+    metric(
+        "last_done_time_seconds",
+        "gauge",
+        "Unix time the last file finished uploading.",
+        [({}, snapshot["last_done_at"])],
+    )
+    return "\n".join(lines) + "\n"
+
+
+class ProgressHandler(BaseHTTPRequestHandler):
+    progress = None  # Set by start_progress_server
+
+    def log_message(self, format, *args):
+        logging.debug("progress endpoint: " + format, *args)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = prometheus_text(self.progress.snapshot()).encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path in ("/", "/progress"):
+            body = json.dumps(self.progress.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_progress_server(progress, port, host=PROGRESS_HOST):
+    """Serves progress on a background thread and returns the server."""
+    handler = type("BoundProgressHandler", (ProgressHandler,), {"progress": progress})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="progress-server", daemon=True
+    ).start()
+    logging.info(
+        "Progress available at http://%s:%d/progress and /metrics",
+        *server.server_address,
+    )
+    return server
@@ -0,0 +1,85 @@
+"""
+Single-pass folder scanner for the Vision upload script.
+
+The parent folder is walked once with os.scandir and the result is kept as an
+in-memory tree so that the summary, validation, size estimate and upload loop
+never need to touch the disk again.
+"""
+
+import os
+import logging
+from collections import namedtuple
+
+# A file found during the scan, with its size and modification time cached.
+ScanFile = namedtuple("ScanFile", ["name", "path", "size", "mtime"])
+
+
+class FolderNode:
+    """A scanned folder holding its sub-folders and files, both sorted by name."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.folders = {}
+        self.files = []
+
+    def iter_files(self, exclude=()):
+        """Yields every file in this folder and all of its sub-folders."""
+        for scan_file in self.files:
+            if scan_file.name not in exclude:
+                yield scan_file
+        for folder in self.folders.values():
+            yield from folder.iter_files(exclude)
+
+
+def scan_folder(path):
+    """
+    Scans the folder at path recursively using a single os.scandir pass per
+    directory and returns the root FolderNode.
+    """
+    root = FolderNode(os.path.basename(os.path.normpath(path)) or path, path)
+    _scan_into(root)
+    return root
+
+
+def _scan_into(node):
+    try:
+        entries = sorted(os.scandir(node.path), key=lambda entry: entry.name)
+    except OSError as e:
+        logging.error("Could not read folder '%s': %s", node.path, e)
+        return
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                child = FolderNode(entry.name, entry.path)
+                node.folders[entry.name] = child
+                _scan_into(child)
+            elif entry.is_file():
+                stat = entry.stat()
+                node.files.append(
+                    ScanFile(entry.name, entry.path, stat.st_size, stat.st_mtime)
+                )
+        except OSError as e:
+            logging.error("Could not read '%s': %s", entry.path, e)
+
+
+def iter_date_folders(index):
+    """
+    Yields (survey_node, level_node, date_node) for every folder found at the
+    Parent / Survey / Level / Date depth of the index.
+    """
+    for survey in index.folders.values():
+        for level in survey.folders.values():
+            for date_folder in level.folders.values():
+                yield survey, level, date_folder
+
+
+def summarize(index, exclude=()):
+    """Returns (file_count, total_size_bytes) for all files in the index."""
+    file_count = 0
+    total_size_bytes = 0
+    for scan_file in index.iter_files(exclude):
+        file_count += 1
+        total_size_bytes += scan_file.size
+    return file_count, total_size_bytes
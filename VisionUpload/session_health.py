@@ -0,0 +1,189 @@
+"""
+Health tracking for long-running browser sessions.
+
+A Chrome session that stays open for hundreds of uploads grows in memory
+and DOM size, and its page interactions slow down. Each browser uploader
+keeps a SessionHealth that learns how long every form step took while the
+session was fresh, and compares the recent latencies against that baseline.
+Together with samples of the session's memory use, it decides when the
+session should be replaced by a fresh one between files.
+
+Chrome's resident memory (all of its processes) is read with the optional
+"psutil" package. Without it, only the page's JavaScript heap and DOM node
+count are checked.
+"""
+
+import time
+import logging
+from statistics import median
+from contextlib import contextmanager
+from collections import defaultdict, deque, namedtuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SESSION_RSS_LIMIT = 4 * 1024**3  # Chrome memory (all processes) that triggers a recycle
+JS_HEAP_LIMIT = 1024**3  # Page JavaScript heap that triggers a recycle
+DOM_NODE_LIMIT = 150000  # DOM nodes that trigger a recycle
+LATENCY_DRIFT_LIMIT = 2.5  # Recent step latency, as a multiple of the fresh session's
+LATENCY_DRIFT_MIN_SECONDS = 1.0  # ...that must also be at least this much slower
+BASELINE_SAMPLES = 5  # Samples of each step that set its baseline
+LATENCY_WINDOW = 10  # Recent samples of each step compared with the baseline
+MIN_SESSION_FILES = 5  # Files a session uploads before it is recycled for wear
+UNTIMED_PHASES = ("transfer",)  # Phases that depend on file size, not the page
+
+# Memory use of a browser session. Fields are None where they are unknown.
+SessionSample = namedtuple("SessionSample", ["rss", "js_heap", "dom_nodes"])
+
+
+def process_tree_rss(pid):
+    """Returns the resident memory of process pid and all its children, or None."""
+    if psutil is None or pid is None:
+        return None
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass  # Exited while being measured
+    return total
+
+
+def format_sample(sample):
+    """Returns a short description of a SessionSample."""
+    parts = []
+    if sample.rss is not None:
+        parts.append("Chrome %.2f GB" % (sample.rss / 1024**3))
+    if sample.js_heap is not None:
+        parts.append("JS heap %d MB" % (sample.js_heap / 1024**2))
+    if sample.dom_nodes is not None:
+        parts.append("%d DOM nodes" % sample.dom_nodes)
+    return ", ".join(parts) or "memory unknown"
+
+
+class _StepTimer:
+    """Passes phases on to a PhaseTimer while timing them for a SessionHealth."""
+
+    def __init__(self, health, timer):
+        self._health = health
+        self._timer = timer
+        self.step_seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._timer, name)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        with self._timer.phase(name):
+            yield
+        # Only steps that succeeded count towards the session's latency.
+        if name not in UNTIMED_PHASES:
+            seconds = time.monotonic() - start
+            self.step_seconds += seconds
+            self._health.observe(name, seconds)
+
+
+class SessionHealth:
+    """
+    Step latencies and memory limits of one browser session. Not thread-safe;
+    each session is only used by its own worker.
+    """
+
+    def __init__(
+        self,
+        rss_limit=SESSION_RSS_LIMIT,
+        js_heap_limit=JS_HEAP_LIMIT,
+        dom_node_limit=DOM_NODE_LIMIT,
+        drift_limit=LATENCY_DRIFT_LIMIT,
+    ):
+        self.rss_limit = rss_limit
+        self.js_heap_limit = js_heap_limit
+        self.dom_node_limit = dom_node_limit
+        self.drift_limit = drift_limit
+        self.recycles = 0
+        self._before_recycle = None
+        self.reset()
+
+    def reset(self):
+        """Starts over for a fresh session."""
+        self.started = time.monotonic()
+        self.files = 0
+        self._baselines = defaultdict(list)  # step -> first latencies of the session
+        self._recent = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._file_steps = deque(maxlen=LATENCY_WINDOW)  # step seconds per file
+
+    def track(self, timer):
+        """Returns a timer to pass to the upload in place of timer."""
+        return _StepTimer(self, timer)
+
+    def observe(self, step, seconds):
+        baseline = self._baselines[step]
+        if len(baseline) < BASELINE_SAMPLES:
+            baseline.append(seconds)
+        else:
+            self._recent[step].append(seconds)
+
+    def finish_file(self, tracked_timer):
+        """Records a successful upload timed through track()."""
+        self.files += 1
+        self._file_steps.append(tracked_timer.step_seconds)
+        if self._before_recycle is not None:
+            logging.info(
+                "The recycled browser session took %.1f s for the form steps of "
+                "its first file, against %.1f s per file before it was recycled",
+                tracked_timer.step_seconds,
+                self._before_recycle,
+            )
+            self._before_recycle = None
+
+    def step_seconds(self):
+        """Median seconds per file spent on form steps recently, or None."""
+        return median(self._file_steps) if self._file_steps else None
+
+    def drift(self):
+        """
+        Returns (step, ratio) for the step that has slowed down most against
+        its baseline, or None if no step has slowed down noticeably.
+        """
+        worst = None
+        for step, recent in self._recent.items():
+            if len(recent) < LATENCY_WINDOW // 2:
+                continue
+            baseline = median(self._baselines[step])
+            current = median(recent)
+            if current - baseline < LATENCY_DRIFT_MIN_SECONDS:
+                continue
+            ratio = current / max(baseline, 0.01)
+            if worst is None or ratio > worst[1]:
+                worst = (step, ratio)
+        return worst
+
+    def recycle_reasons(self, sample):
+        """Returns why the session should be recycled, or [] if it is healthy."""
+        if self.files < MIN_SESSION_FILES:
+            return []
+        reasons = []
+        if sample.rss is not None and sample.rss > self.rss_limit:
+            reasons.append("Chrome uses %.2f GB" % (sample.rss / 1024**3))
+        if sample.js_heap is not None and sample.js_heap > self.js_heap_limit:
+            reasons.append("the page's JS heap is %d MB" % (sample.js_heap / 1024**2))
+        if sample.dom_nodes is not None and sample.dom_nodes > self.dom_node_limit:
+            reasons.append("the page has %d DOM nodes" % sample.dom_nodes)
+        drift = self.drift()
+        if drift is not None and drift[1] > self.drift_limit:
+            reasons.append("'%s' steps take %.1fx as long as at the start" % drift)
+        return reasons
+
+    def recycled(self):
+        """Records that the session was replaced, and starts over."""
+        self.recycles += 1
+        self._before_recycle = self.step_seconds()
+        self.reset()
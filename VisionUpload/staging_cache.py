@@ -0,0 +1,310 @@
+"""
+Read-ahead staging of scan files onto fast local disk.
+
+Scans often come straight off USB drives or SMB shares, where the upload's
+file reads compete with slow source I/O. A background thread copies the
+files that are about to be uploaded into a local staging folder while the
+current ones upload, and the uploaders are handed the staged copy instead of
+the original. Copies use copy_file_range or sendfile where the platform has
+them, and large sequential reads otherwise. A copy only gets its final name
+once it is complete, and its size is checked again before it is uploaded.
+
+The staging folder has a size budget. Copies whose upload has finished are
+kept, so a retry or rerun can reuse them, until space is needed, and are then
+evicted least recently used first. Copies waiting to be uploaded are never
+evicted; prefetching simply pauses until space frees up.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+PREFETCH_COUNT = 2  # Upcoming files to keep staged ahead of the uploads
+COPY_BLOCK_SIZE = 64 * 1024**2  # Bytes per copy_file_range/sendfile call
+READ_BUFFER_SIZE = 16 * 1024**2  # Buffer for the plain read/write fallback
+FREE_SPACE_MARGIN = 1024**3  # Disk space always left free on the staging drive
+PARTIAL_SUFFIX = ".part"  # Suffix of a copy still being written
+
+
+def copy_file(src, dst):
+    """
+    Copies src to dst using in-kernel copies where possible. The copy is
+    written under a temporary name and only moved to dst once it is complete,
+    so an interrupted copy never looks finished. Raises IOError if src does
+    not have the size it had when the copy started. Returns the number of
+    bytes copied.
+    """
+    size = os.path.getsize(src)
+    tmp_path = dst + PARTIAL_SUFFIX
+    try:
+        with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+            copied = _copy_data(fsrc, fdst, size)
+        if copied != size:
+            raise IOError(f"copied {copied} of {size} bytes")
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return copied
+
+
+def _copy_data(fsrc, fdst, size):
+    copied = 0
+    for copy_range in _kernel_copies():
+        try:
+            while copied < size:
+                sent = copy_range(
+                    fsrc.fileno(),
+                    fdst.fileno(),
+                    min(COPY_BLOCK_SIZE, size - copied),
+                    copied,
+                )
+                if sent == 0:
+                    break  # Finish with plain reads, which stop at the real end
+                copied += sent
+            if copied == size:
+                return copied
+            break
+        except OSError as e:
+            if copied:
+                raise
+            logging.debug("%s unavailable (%s); trying the next method", copy_range, e)
+    # The kernel copies use explicit offsets, so position both files first.
+    fsrc.seek(copied)
+    fdst.seek(copied)
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        read = fsrc.readinto(buffer)
+        if not read:
+            return copied
+        fdst.write(view[:read])
+        copied += read
+
+
+def _kernel_copies():
+    """Yields the in-kernel copy functions this platform offers, best first."""
+    if hasattr(os, "copy_file_range"):
+        yield lambda src, dst, count, offset: os.copy_file_range(
+            src, dst, count, offset, offset
+        )
+    if hasattr(os, "sendfile") and os.name == "posix":
+
+        def sendfile(src, dst, count, offset):
+            os.lseek(dst, offset, os.SEEK_SET)
+            return os.sendfile(dst, src, offset, count)
+
+        yield sendfile
+
+
+def _cache_key(job):
+    # The size is part of the name so copies can be checked before use.
+    identity = f"{job.rel_path}|{job.size}|{job.mtime}".encode("utf-8")
+    return "%s_%d" % (hashlib.sha1(identity).hexdigest()[:16], job.size)
+
+
+def _key_size(key):
+    """Returns the file size recorded in a cache key, or None."""
+    try:
+        return int(key.rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class StagingCache:
+    """
+    Stages upcoming jobs into directory, within budget bytes. start() begins
+    prefetching the jobs a scheduler is about to hand out; acquire() and
+    release() bracket each upload.
+    """
+
+    def __init__(self, directory, budget, prefetch=PREFETCH_COUNT):
+        self.directory = directory
+        self.budget = budget
+        self.prefetch = prefetch
+        self._cond = threading.Condition()
+        self._staged = {}  # key -> staged size, for every complete copy
+        self._in_use = {}  # key -> number of uploads using the copy
+        self._released = OrderedDict()  # keys whose upload finished, oldest first
+        self._copying = None
+        self._scheduler = None
+        self._thread = None
+        self._stopping = False
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """
+        Adopts complete copies left by an earlier run as evictable entries,
+        and deletes anything else, such as copies cut short by a crash.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            files = [f for f in os.scandir(entry.path)] if entry.is_dir() else []
+            stat = files[0].stat() if len(files) == 1 else None
+            if (
+                stat is None
+                or files[0].name.endswith(PARTIAL_SUFFIX)
+                or stat.st_size != _key_size(entry.name)
+            ):
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._staged[key] = size
+            self._released[key] = None
+        if entries:
+            logging.info(
+                "Staging folder holds %d files (%.2f GB) from earlier runs",
+                len(entries),
+                self.used / (1024**3),
+            )
+
+    @property
+    def used(self):
+        return sum(self._staged.values())
+
+    def _path(self, job):
+        return os.path.join(
+            self.directory, _cache_key(job), os.path.basename(job.file_path)
+        )
+
+    # ----- Uploads -----
+
+    def acquire(self, job):
+        """
+        Returns the path to upload job from: the staged copy if there is one
+        (waiting for it if it is being copied right now), else the original.
+        """
+        key = _cache_key(job)
+        with self._cond:
+            while self._copying == key:
+                self._cond.wait()
+            path = self._path(job)
+            if not self._staged.get(key):
+                return job.file_path
+            try:
+                staged_size = os.path.getsize(path)
+            except OSError:
+                staged_size = None
+            if staged_size != job.size:
+                logging.warning(
+                    "Staged copy of '%s' is incomplete; uploading the original",
+                    job.file_path,
+                )
+                self._drop(key)
+                self._staged[key] = 0  # Do not stage it again
+                return job.file_path
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            self._released.pop(key, None)
+            return path
+
+    def release(self, job):
+        """Marks the upload of job as finished; its copy may now be evicted."""
+        key = _cache_key(job)
+        with self._cond:
+            if key in self._in_use:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+                    self._released[key] = None
+            self._cond.notify_all()
+
+    # ----- Prefetching -----
+
+    def start(self, scheduler):
+        """Starts prefetching the jobs scheduler is about to hand out."""
+        self._scheduler = scheduler
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="staging-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops prefetching once the current copy has finished."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                job = self._next_to_stage()
+                if job is None:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                key = _cache_key(job)
+                self._copying = key
+            try:
+                self._copy(job, key)
+            finally:
+                with self._cond:
+                    self._copying = None
+                    self._cond.notify_all()
+
+    def _next_to_stage(self):
+        """Returns the next upcoming job to copy, making room for it, or None."""
+        for job in self._scheduler.upcoming(self.prefetch):
+            key = _cache_key(job)
+            if key in self._staged:
+                continue
+            if job.size > self.budget:
+                continue  # Would never fit; upload it from the source.
+            if not self._make_room(job.size):
+                return None  # Wait for uploads to finish and free space.
+            return job
+        return None
+
+    def _make_room(self, size):
+        """Evicts released copies until size more bytes fit. Caller holds the lock."""
+        while self.used + size > self.budget and self._released:
+            key, _ = self._released.popitem(last=False)
+            self._drop(key)
+            logging.debug("Evicted staged copy %s", key)
+        if self.used + size > self.budget:
+            return False
+        free = shutil.disk_usage(self.directory).free
+        return free - size > FREE_SPACE_MARGIN
+
+    def _drop(self, key):
+        """Deletes the copy for key. Caller holds the lock."""
+        self._staged.pop(key, None)
+        self._released.pop(key, None)
+        shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+
+    def _copy(self, job, key):
+        path = self._path(job)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            copy_file(job.file_path, path)
+            stat = os.stat(job.file_path)
+            if (stat.st_size, stat.st_mtime) != (
+                job.size,
+                job.mtime,
+            ):
+                raise IOError("the source changed while it was being copied")
+        except (IOError, OSError) as e:
+            logging.warning("Could not stage '%s': %s", job.file_path, e)
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            with self._cond:
+                # Do not try this file again; it is uploaded from the source.
+                self._staged[key] = 0
+            return
+        logging.debug("Staged %s", job.file_path)
+        with self._cond:
+            self._staged[key] = job.size
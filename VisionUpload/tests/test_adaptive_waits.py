@@ -0,0 +1,73 @@
+import pytest
+
+from adaptive_waits import AdaptiveTimeouts, TransferDeadlines
+
+MB = 1024**2
+
+
+def test_default_applies_until_enough_samples():
+    timeouts = AdaptiveTimeouts({"save": 10}, fallback=7, min_samples=5)
+    for _ in range(4):
+        timeouts.observe("save", 1.0)
+
+    assert timeouts.timeout("save") == 10
+    assert timeouts.timeout("unknown") == 7
+
+
+def test_timeout_follows_the_95th_percentile():
+    timeouts = AdaptiveTimeouts({"save": 10}, factor=3.0, floor=0.5)
+    for seconds in [0.5] * 19 + [1.0]:
+        timeouts.observe("save", seconds)
+
+    assert timeouts.timeout("save") == pytest.approx(1.5)
+
+
+def test_timeout_stays_within_its_floor_and_ceiling():
+    timeouts = AdaptiveTimeouts({"fast": 10, "slow": 10}, floor=2.0, ceiling_factor=4.0)
+    for _ in range(5):
+        timeouts.observe("fast", 0.01)
+        timeouts.observe("slow", 100.0)
+
+    assert timeouts.timeout("fast") == 2.0
+    assert timeouts.timeout("slow") == 40.0
+
+
+def test_only_recent_samples_count():
+    timeouts = AdaptiveTimeouts({"save": 100}, floor=0.1, min_samples=2, window=5)
+    for _ in range(10):
+        timeouts.observe("save", 10.0)
+    for _ in range(5):
+        timeouts.observe("save", 1.0)
+
+    assert timeouts.timeout("save") == pytest.approx(3.0)
+
+
+def test_snapshot_lists_default_and_seen_steps():
+    timeouts = AdaptiveTimeouts({"save": 10}, fallback=5)
+    timeouts.observe("toast", 1.0)
+
+    assert timeouts.snapshot() == {"save": 10, "toast": 5}
+
+
+def test_transfer_deadline_assumes_the_minimum_rate_at_first():
+    deadlines = TransferDeadlines(min_rate=MB, margin=4.0, floor=60)
+
+    assert deadlines.deadline(100 * MB) == pytest.approx(60 + 400)
+    assert deadlines.rate is None
+
+
+def test_transfer_deadline_scales_with_measured_throughput():
+    deadlines = TransferDeadlines(min_rate=MB, margin=4.0, floor=60, alpha=0.5)
+    deadlines.observe(100 * MB, 10)
+    deadlines.observe(100 * MB, 5)
+
+    assert deadlines.rate == pytest.approx(15 * MB)
+    assert deadlines.deadline(150 * MB) == pytest.approx(60 + 40)
+
+
+def test_small_or_instant_transfers_are_not_measured():
+    deadlines = TransferDeadlines()
+    deadlines.observe(MB, 0.001)
+    deadlines.observe(100 * MB, 0)
+
+    assert deadlines.rate is None
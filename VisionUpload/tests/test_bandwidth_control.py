@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+
+import bandwidth_control
+from bandwidth_control import BandwidthCap, ConcurrencyController, parse_hours
+from upload_recovery import FAILURE_NETWORK, FAILURE_TRANSIENT_DOM
+
+MB = 1024**2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(bandwidth_control.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def run_window(controller, clock, mb_per_s, seconds=60):
+    """Completes one measurement window at the given throughput."""
+    for _ in range(controller.limit):
+        clock.now += seconds / controller.limit
+        controller.record_success(mb_per_s * MB * seconds / controller.limit)
+
+
+def test_starts_with_every_worker(clock):
+    assert ConcurrencyController(6).limit == 6
+    assert ConcurrencyController(6, initial=2).limit == 2
+
+
+def test_steps_back_up_when_fewer_slots_are_slower(clock):
+    controller = ConcurrencyController(4, interval=60)
+
+    run_window(controller, clock, 100)
+    assert controller.limit == 3
+    run_window(controller, clock, 80)
+    assert controller.limit == 4
+
+
+def test_keeps_stepping_down_while_it_helps(clock):
+    controller = ConcurrencyController(4, interval=60)
+
+    run_window(controller, clock, 50)
+    run_window(controller, clock, 100)
+    assert controller.limit == 2
+
+
+def test_link_failures_halve_the_slots(clock):
+    controller = ConcurrencyController(8)
+
+    controller.record_failure(FAILURE_TRANSIENT_DOM)
+    assert controller.limit == 8
+    controller.record_failure(FAILURE_NETWORK)
+    assert controller.limit == 4
+
+
+def test_cap_applies_only_in_working_hours():
+    cap = BandwidthCap(10, "08:00-18:00")
+    monday = datetime.datetime(2024, 5, 6)
+
+    assert cap.rate(monday.replace(hour=9)) == 10 * MB
+    assert cap.rate(monday.replace(hour=19)) is None
+    assert cap.rate(monday.replace(day=11, hour=9)) is None  # Saturday
+    assert BandwidthCap(10, "always").rate(monday.replace(hour=3)) == 10 * MB
+
+
+def test_parse_hours_accepts_midnight():
+    assert parse_hours("18:00-24:00") == (datetime.time(18), datetime.time.max)
@@ -0,0 +1,153 @@
+import datetime
+from contextlib import contextmanager
+
+import pytest
+
+import chunked_upload
+import mock_vision_server
+from chunked_upload import ChunkChecksumError, upload_scan_file_resumable
+from http_engine import VisionHttpClient
+from upload_ledger import UploadLedger
+
+CHUNK_SIZE = 64 * 1024
+FILE_SIZE = 3 * CHUNK_SIZE + 1000
+SCAN_DATE = datetime.date(2024, 5, 1)
+
+
+class RecordingTimer:
+    """Records each phase with the phases it was nested in."""
+
+    def __init__(self):
+        self.phases = []
+        self._open = []
+
+    @contextmanager
+    def phase(self, name):
+        self.phases.append((name, tuple(self._open)))
+        self._open.append(name)
+        try:
+            yield
+        finally:
+            self._open.pop()
+
+
+@pytest.fixture
+def server():
+    server = mock_vision_server.start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = VisionHttpClient(
+        "http://%s:%d" % server.server_address,
+        {mock_vision_server.SESSION_COOKIE: mock_vision_server.SESSION_VALUE},
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UploadLedger(str(tmp_path), path=str(tmp_path / "ledger.db"))
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def scan_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked_upload, "CHUNK_SIZE", CHUNK_SIZE)
+    path = tmp_path / "scan.e57"
+    path.write_bytes(bytes(range(256)) * (FILE_SIZE // 256) + b"x" * (FILE_SIZE % 256))
+    return str(path)
+
+
+def upload(client, ledger, scan_file, timer=None):
+    return upload_scan_file_resumable(
+        client,
+        ledger,
+        ("scan.e57", FILE_SIZE, 1.0),
+        scan_file,
+        FILE_SIZE,
+        SCAN_DATE,
+        "Module",
+        "Blanket Scan",
+        "Level 1",
+        **({"timer": timer} if timer else {}),
+    )
+
+
+def test_round_trip_saves_the_whole_file(server, client, ledger, scan_file):
+    timer = RecordingTimer()
+    record_id = upload(client, ledger, scan_file, timer)
+
+    record = server.state.records[int(record_id)]
+    assert record["files"] == {"scan.e57": FILE_SIZE}
+    assert record["saved"]
+    assert ledger.get_chunk_session("scan.e57", FILE_SIZE, 1.0) is None
+    assert ("create", ()) in timer.phases
+    assert ("transfer", ()) in timer.phases
+
+
+def test_chunk_without_echo_is_confirmed_by_the_server_list(
+    client, ledger, scan_file, monkeypatch
+):
+    upload_chunk = client.upload_chunk
+
+    def without_echo(*args):
+        response = upload_chunk(*args)
+        response.pop("sha256")
+        return response
+
+    monkeypatch.setattr(client, "upload_chunk", without_echo)
+    upload(client, ledger, scan_file)
+
+
+def test_chunk_the_server_never_got_is_not_recorded(
+    client, ledger, scan_file, monkeypatch
+):
+    monkeypatch.setattr(client, "upload_chunk", lambda *args: {})
+
+    with pytest.raises(ChunkChecksumError, match="did not confirm"):
+        upload(client, ledger, scan_file)
+    assert ledger.confirmed_chunks("scan.e57", FILE_SIZE, 1.0) == {}
+
+
+def test_mismatched_echo_is_rejected(client, ledger, scan_file, monkeypatch):
+    upload_chunk = client.upload_chunk
+
+    def corrupted(*args):
+        return dict(upload_chunk(*args), sha256="0" * 64)
+
+    monkeypatch.setattr(client, "upload_chunk", corrupted)
+
+    with pytest.raises(ChunkChecksumError, match="corrupted"):
+        upload(client, ledger, scan_file)
+    assert ledger.confirmed_chunks("scan.e57", FILE_SIZE, 1.0) == {}
+
+
+def test_interrupted_upload_resumes_from_confirmed_chunks(
+    server, client, ledger, scan_file, monkeypatch
+):
+    upload_chunk = client.upload_chunk
+    sent = []
+    failures = [OSError("connection reset")]
+
+    def fail_last(record_id, upload_id, index, *args):
+        if index == 3 and failures:
+            raise failures.pop()
+        sent.append(index)
+        return upload_chunk(record_id, upload_id, index, *args)
+
+    monkeypatch.setattr(client, "upload_chunk", fail_last)
+    monkeypatch.setattr(chunked_upload, "CHUNK_PARALLELISM", 1)
+    with pytest.raises(OSError):
+        upload(client, ledger, scan_file)
+    del sent[:]
+
+    record_id = upload(client, ledger, scan_file)
+
+    assert sent == [3]
+    assert server.state.records[int(record_id)]["files"] == {"scan.e57": FILE_SIZE}
@@ -0,0 +1,119 @@
+import struct
+
+import pytest
+
+import e57_integrity
+from e57_integrity import (
+    E57_HEADER,
+    E57_SIGNATURE,
+    SAMPLED_PAGES,
+    _pages_to_check,
+    _python_crc32c,
+    check_e57_file,
+    check_scan_files,
+    crc32c,
+)
+from upload_ledger import UploadLedger
+
+PAGE_SIZE = 1024
+PAYLOAD = PAGE_SIZE - 4
+
+
+def e57_bytes(page_count=4, major=1, physical_length=None, page_size=PAGE_SIZE):
+    """Returns a minimal E57 file: a header and pages with valid checksums."""
+    size = page_count * PAGE_SIZE
+    header = E57_HEADER.pack(
+        E57_SIGNATURE,
+        major,
+        0,
+        size if physical_length is None else physical_length,
+        PAGE_SIZE,
+        100,
+        page_size,
+    )
+    data = bytearray()
+    for page in range(page_count):
+        payload = bytearray((page * 7 + i) % 251 for i in range(PAYLOAD))
+        if page == 0:
+            payload[: len(header)] = header
+        data += payload + struct.pack(">I", _python_crc32c(payload))
+    return bytes(data)
+
+
+def write(tmp_path, data, name="scan.e57"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_crc32c_check_value():
+    assert _python_crc32c(b"123456789") == 0xE3069283
+    assert crc32c(b"123456789") == 0xE3069283
+
+
+def test_intact_file_passes(tmp_path):
+    assert check_e57_file(write(tmp_path, e57_bytes())) is None
+
+
+@pytest.mark.parametrize(
+    "data, problem",
+    [
+        (b"ASTM", "too short"),
+        (b"NOT-E57!" + e57_bytes()[8:], "bad header signature"),
+        (e57_bytes(major=2), "unsupported E57 version 2.0"),
+        (e57_bytes(physical_length=8 * PAGE_SIZE), "probably truncated"),
+        (e57_bytes()[:-PAGE_SIZE], "probably truncated"),
+        (e57_bytes(page_size=3), "invalid page size"),
+    ],
+)
+def test_damaged_header_is_reported(tmp_path, data, problem):
+    assert problem in check_e57_file(write(tmp_path, data))
+
+
+def test_checksum_mismatch_names_the_page(tmp_path):
+    data = bytearray(e57_bytes())
+    data[2 * PAGE_SIZE + 10] ^= 0xFF
+
+    problem = check_e57_file(write(tmp_path, bytes(data)))
+
+    assert problem == "checksum mismatch in page 2 (offset %d)" % (2 * PAGE_SIZE)
+
+
+def test_without_crc32c_pages_are_sampled_evenly(monkeypatch):
+    monkeypatch.setattr(e57_integrity, "_fast_crc32c", None)
+
+    assert list(_pages_to_check(10)) == list(range(10))
+    pages = _pages_to_check(10000)
+    assert len(pages) == SAMPLED_PAGES
+    assert (pages[0], pages[-1]) == (0, 9999)
+
+
+def test_check_scan_files_skips_other_files(tmp_path):
+    good = write(tmp_path, e57_bytes(), "good.e57")
+    bad = write(tmp_path, e57_bytes()[:-PAGE_SIZE], "bad.E57")
+    other = write(tmp_path, b"notes", "notes.txt")
+
+    results = check_scan_files([good, bad, other], workers=2)
+
+    assert set(results) == {good, bad}
+    assert results[good] is None
+    assert "truncated" in results[bad]
+
+
+def test_sampled_passes_can_be_left_out_of_the_cache(tmp_path):
+    ledger = UploadLedger(str(tmp_path), path=str(tmp_path / "ledger.db"))
+    ledger.record_integrity_results({("full.e57", 1, 1.0): None})
+    ledger.record_integrity_results(
+        {("sampled.e57", 1, 1.0): None, ("damaged.e57", 1, 1.0): "bad"}, sampled=True
+    )
+
+    assert set(ledger.integrity_results()) == {
+        ("full.e57", 1, 1.0),
+        ("sampled.e57", 1, 1.0),
+        ("damaged.e57", 1, 1.0),
+    }
+    assert ledger.integrity_results(sampled_passes=False) == {
+        ("full.e57", 1, 1.0): None,
+        ("damaged.e57", 1, 1.0): "bad",
+    }
+    ledger.close()
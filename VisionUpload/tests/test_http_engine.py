@@ -0,0 +1,127 @@
+import datetime
+import os
+
+import pytest
+
+import VisionUpload
+import chunked_upload
+import mock_vision_server
+from VisionUpload import HttpUploader, UploadJob, run_upload_pool
+from http_engine import VisionHttpClient, VisionHttpError, upload_scan_file_http
+from upload_ledger import UploadLedger
+
+SCAN_DATE = datetime.date(2024, 5, 1)
+CHUNK_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def server():
+    server = mock_vision_server.start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = VisionHttpClient(
+        "http://%s:%d" % server.server_address,
+        {mock_vision_server.SESSION_COOKIE: mock_vision_server.SESSION_VALUE},
+        pool_size=2,
+    )
+    yield client
+    client.close()
+
+
+def scan_jobs(tmp_path, sizes, level="Level 1"):
+    jobs = []
+    for number, size in enumerate(sizes):
+        rel_path = "Blanket Scan/%s/010524/scan%d.e57" % (level, number)
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(size))
+        jobs.append(
+            UploadJob(
+                survey="Blanket Scan",
+                level=level,
+                scan_date=SCAN_DATE,
+                file_path=str(path),
+                rel_path=rel_path,
+                size=size,
+                mtime=path.stat().st_mtime,
+            )
+        )
+    return jobs
+
+
+def test_single_file_round_trip(server, client, tmp_path):
+    (job,) = scan_jobs(tmp_path, [5000])
+
+    record_id = upload_scan_file_http(
+        client,
+        job.file_path,
+        job.size,
+        job.scan_date,
+        "Scan Module",
+        job.survey,
+        job.level,
+    )
+
+    record = server.state.records[record_id]
+    assert record["saved"]
+    assert record["files"] == {"scan0.e57": 5000}
+    assert (record["date"], record["survey"], record["level"]) == (
+        "2024-05-01",
+        "Blanket Scan",
+        "Level 1",
+    )
+    assert client.list_records("Level 1")[0]["id"] == record_id
+
+
+def test_upload_pool_round_trip(server, client, tmp_path, monkeypatch):
+    # The last file is large enough to go up in resumable chunks.
+    monkeypatch.setattr(VisionUpload, "CHUNKED_UPLOAD_THRESHOLD", 2 * CHUNK_SIZE)
+    monkeypatch.setattr(chunked_upload, "CHUNK_SIZE", CHUNK_SIZE)
+    jobs = scan_jobs(tmp_path, [1000, 2000, 3 * CHUNK_SIZE + 10])
+    jobs += scan_jobs(tmp_path, [4000], level="Level 2")
+    ledger = UploadLedger(str(tmp_path), path=str(tmp_path / "ledger.db"))
+    uploaders = [HttpUploader(client, ledger) for _ in range(2)]
+
+    run_upload_pool(uploaders, jobs, ledger)
+
+    received = {
+        (record["level"], name): size
+        for record in server.state.records.values()
+        if record["saved"]
+        for name, size in record["files"].items()
+    }
+    assert received == {
+        (job.level, os.path.basename(job.file_path)): job.size for job in jobs
+    }
+    assert all(ledger.is_uploaded(job.rel_path, job.size, job.mtime) for job in jobs)
+    assert ledger.dead_letters() == []
+    assert server.state.uploads == {}
+    ledger.close()
+
+
+def test_rejected_session_raises(server, tmp_path):
+    client = VisionHttpClient(
+        "http://%s:%d" % server.server_address,
+        {mock_vision_server.SESSION_COOKIE: "expired"},
+    )
+    (job,) = scan_jobs(tmp_path, [100])
+
+    with pytest.raises(VisionHttpError) as raised:
+        upload_scan_file_http(
+            client,
+            job.file_path,
+            job.size,
+            job.scan_date,
+            "Scan Module",
+            job.survey,
+            job.level,
+        )
+
+    assert raised.value.status == 401
+    assert server.state.records == {}
+    client.close()
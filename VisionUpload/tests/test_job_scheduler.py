@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from VisionUpload import UploadJob
+from job_scheduler import JobScheduler, order_jobs
+
+DAY_1 = datetime.date(2022, 11, 4)
+DAY_2 = datetime.date(2022, 11, 5)
+
+
+def job(level, name, size, scan_date=DAY_1, survey="Blanket Scan"):
+    return UploadJob(
+        survey=survey,
+        level=level,
+        scan_date=scan_date,
+        file_path="/scans/" + name,
+        rel_path="%s/%s/%s" % (survey, level, name),
+        size=size,
+        mtime=1.0,
+    )
+
+
+JOBS = [
+    job("Level 1", "a", 30, DAY_2),
+    job("Level 1", "b", 10),
+    job("Level 1", "c", 20),
+    job("Level 2", "d", 500),
+    job("Deck A", "e", 5),
+]
+
+
+def names(groups):
+    return {
+        level: [j.rel_path[-1] for j in group] for (_, level), group in groups.items()
+    }
+
+
+def test_folder_policy_keeps_folder_order_and_sorts_by_date():
+    groups = order_jobs(JOBS, "folder")
+
+    assert list(names(groups)) == ["Level 1", "Level 2", "Deck A"]
+    assert names(groups)["Level 1"] == ["b", "c", "a"]
+
+
+def test_largest_first_orders_levels_by_total_size_and_keeps_dates_together():
+    groups = order_jobs(JOBS, "largest-first")
+
+    assert list(names(groups)) == ["Level 2", "Level 1", "Deck A"]
+    assert names(groups)["Level 1"] == ["c", "b", "a"]
+
+
+def test_smallest_first_orders_levels_and_files_ascending():
+    groups = order_jobs(JOBS, "smallest-first")
+
+    assert list(names(groups)) == ["Deck A", "Level 1", "Level 2"]
+    assert names(groups)["Level 1"] == ["b", "c", "a"]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        order_jobs(JOBS, "random")
+
+
+def test_workers_stay_on_their_level_and_spread_out():
+    scheduler = JobScheduler(JOBS)
+
+    first = scheduler.next_job(0)
+    second = scheduler.next_job(1)
+    assert (first.level, second.level) == ("Level 1", "Level 2")
+    assert scheduler.next_job(0).level == "Level 1"
+    # Worker 1's level is done; it moves to the level nobody is on.
+    assert scheduler.next_job(1).level == "Deck A"
+    assert len(scheduler) == 1
+
+
+def test_batches_share_a_date_folder_within_their_limits():
+    scheduler = JobScheduler(JOBS)
+
+    batch = scheduler.next_batch(0, max_files=5, max_bytes=1000)
+    assert [j.rel_path[-1] for j in batch] == ["b", "c"]
+    assert [j.rel_path[-1] for j in scheduler.next_batch(0, max_bytes=1)] == ["a"]
+    # A file larger than max_bytes still goes, on its own.
+    assert [j.rel_path[-1] for j in scheduler.next_batch(0, max_bytes=1)] == ["d"]
+
+
+def test_upcoming_interleaves_the_levels_workers_are_on():
+    scheduler = JobScheduler(JOBS)
+    scheduler.next_job(0)
+    scheduler.next_job(1)
+
+    upcoming = [j.rel_path[-1] for j in scheduler.upcoming(3)]
+
+    assert upcoming == ["c", "a", "e"]
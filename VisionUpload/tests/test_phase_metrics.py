@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from phase_metrics import MetricsRecorder, fit_file_time
+
+MB = 1024**2
+
+
+def write_history(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(dict({"phase": "file", "ok": True}, **record)) + "\n")
+
+
+def uploads(engine, overhead, mbps, count=12, files=1):
+    """File records that took overhead seconds per file plus size at mbps."""
+    return [
+        {
+            "engine": engine,
+            "size": files * n * 100 * MB,
+            "seconds": files * (overhead + n * 100 / mbps),
+            "files": files,
+        }
+        for n in range(1, count + 1)
+    ]
+
+
+def test_fit_recovers_overhead_and_throughput(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    write_history(path, uploads("browser", 30.0, 50.0))
+
+    overhead, per_byte, samples = fit_file_time(path)
+
+    assert overhead == pytest.approx(30.0)
+    assert 1 / per_byte / MB == pytest.approx(50.0)
+    assert samples == 12
+
+
+def test_fit_only_uses_the_given_engine(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    write_history(path, uploads("browser", 30.0, 50.0) + uploads("http", 2.0, 100.0))
+
+    assert fit_file_time(path, "http")[0] == pytest.approx(2.0)
+    assert fit_file_time(path, "browser")[0] == pytest.approx(30.0)
+
+
+def test_batches_count_as_their_average_file(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    write_history(
+        path, uploads("browser", 30.0, 50.0) + uploads("browser", 30.0, 50.0, files=8)
+    )
+
+    overhead, per_byte, samples = fit_file_time(path, "browser")
+
+    assert overhead == pytest.approx(30.0)
+    assert samples == 24
+
+
+def test_too_little_history_gives_no_fit(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    write_history(path, uploads("browser", 30.0, 50.0, count=3))
+
+    assert fit_file_time(path) is None
+    assert fit_file_time(str(tmp_path / "missing.jsonl")) is None
+
+
+def test_recorder_writes_the_batch_size(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    recorder = MetricsRecorder(path, engine="browser")
+    timer = recorder.timer("3 files", 300 * MB, 3)
+    with timer.phase("transfer"):
+        pass
+    timer.finish(ok=True)
+    recorder.close()
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["phase"], r["files"], r["engine"]) for r in records] == [
+        ("transfer", 3, "browser"),
+        ("file", 3, "browser"),
+    ]
@@ -0,0 +1,110 @@
+import datetime
+
+import pytest
+
+import upload_plan
+from upload_plan import LeaseBoard, PlanEntry, read_plan, write_plan
+
+JOB = PlanEntry(
+    rel_path="Blanket Scan/Level 1/041122/Scan 001.e57",
+    size=100,
+    mtime=1.0,
+    survey="Blanket Scan",
+    level="Level 1",
+    scan_date=datetime.date(2022, 11, 4),
+)
+OTHER_JOB = JOB._replace(rel_path="Blanket Scan/Level 1/041122/Scan 002.e57")
+
+
+@pytest.fixture(autouse=True)
+def no_settle(monkeypatch):
+    monkeypatch.setattr(upload_plan, "TAKEOVER_SETTLE", 0)
+
+
+@pytest.fixture
+def lease_dir(tmp_path):
+    return str(tmp_path / "leases")
+
+
+def test_plan_round_trip(tmp_path):
+    path = str(tmp_path / "plan.json")
+
+    write_plan(path, str(tmp_path / "Scans"), [JOB, OTHER_JOB])
+
+    assert read_plan(path) == [JOB, OTHER_JOB]
+
+
+def test_only_one_node_claims_a_job(lease_dir):
+    first = LeaseBoard(lease_dir, "node-a")
+    second = LeaseBoard(lease_dir, "node-b")
+
+    assert first.claim(JOB)
+    assert not second.claim(JOB)
+    assert second.claim(OTHER_JOB)
+
+
+def test_released_job_can_be_claimed_again(lease_dir):
+    first = LeaseBoard(lease_dir, "node-a")
+    second = LeaseBoard(lease_dir, "node-b")
+    first.claim(JOB)
+
+    first.release(JOB)
+
+    assert second.claim(JOB)
+
+
+def test_completed_job_is_never_claimed_again(lease_dir):
+    first = LeaseBoard(lease_dir, "node-a")
+    second = LeaseBoard(lease_dir, "node-b")
+    first.claim(JOB)
+
+    first.complete(JOB)
+
+    assert not second.claim(JOB)
+    assert not first.claim(JOB)
+    assert second.unfinished([JOB, OTHER_JOB]) == [OTHER_JOB]
+
+
+def test_expired_lease_is_taken_over(lease_dir):
+    dead = LeaseBoard(lease_dir, "node-a", lease_seconds=-1)
+    alive = LeaseBoard(lease_dir, "node-b")
+    dead.claim(JOB)
+
+    assert alive.claim(JOB)
+
+
+def test_live_lease_is_not_taken_over(lease_dir):
+    holder = LeaseBoard(lease_dir, "node-a")
+    other = LeaseBoard(lease_dir, "node-b", lease_seconds=-1)
+    holder.claim(JOB)
+
+    assert not other.claim(JOB)
+
+
+def test_a_node_takes_back_its_own_lease_after_a_restart(lease_dir):
+    LeaseBoard(lease_dir, "node-a").claim(JOB)
+
+    assert LeaseBoard(lease_dir, "node-a").claim(JOB)
+
+
+def test_renewal_notices_a_takeover_and_drops_the_lease(lease_dir):
+    slow = LeaseBoard(lease_dir, "node-a", lease_seconds=-1)
+    fast = LeaseBoard(lease_dir, "node-b")
+    slow.claim(JOB)
+    fast.claim(JOB)
+
+    slow.renew()
+    slow.release(JOB)
+
+    # The lease still belongs to the node that took it over.
+    assert not LeaseBoard(lease_dir, "node-c").claim(JOB)
+
+
+def test_renewal_does_not_bring_back_a_released_lease(lease_dir):
+    board = LeaseBoard(lease_dir, "node-a")
+    board.claim(JOB)
+    board.release(JOB)
+
+    board.renew()
+
+    assert LeaseBoard(lease_dir, "node-b").claim(JOB)
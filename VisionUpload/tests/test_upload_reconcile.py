@@ -0,0 +1,160 @@
+import datetime
+
+import pytest
+
+import mock_vision_server
+from VisionUpload import UploadJob, listable_levels, reconcile_jobs
+from upload_ledger import UploadLedger
+from upload_reconcile import (
+    DISCREPANCY_DUPLICATE,
+    DISCREPANCY_MISSING,
+    DISCREPANCY_SIZE,
+    DISCREPANCY_UNSAVED,
+    UnrecognisedListingError,
+    parse_record_date,
+    reconcile,
+    remote_files,
+)
+
+SCAN_DATE = datetime.date(2022, 11, 4)
+
+
+def job(name, size=100):
+    return UploadJob(
+        survey="Blanket Scan",
+        level="Level 1",
+        scan_date=SCAN_DATE,
+        file_path="/scans/" + name,
+        rel_path="Blanket Scan/Level 1/041122/" + name,
+        size=size,
+        mtime=1.0,
+    )
+
+
+def record(record_id, files, saved=True, date="2022-11-04"):
+    return {
+        "id": record_id,
+        "survey": "Blanket Scan",
+        "level": "Level 1",
+        "date": date,
+        "saved": saved,
+        "files": files,
+    }
+
+
+def kinds(discrepancies):
+    return {d.job.rel_path.rsplit("/", 1)[-1]: d.kind for d in discrepancies}
+
+
+def test_saved_files_of_the_right_size_match():
+    files = remote_files([record(1, {"a.e57": 100}), record(2, {"b.e57": None})])
+
+    assert reconcile([job("a.e57"), job("b.e57")], files) == []
+
+
+def test_each_kind_of_discrepancy_is_found():
+    files = remote_files(
+        [
+            record(1, {"unsaved.e57": 100}, saved=False),
+            record(2, {"resized.e57": 99}),
+            record(3, {"twice.e57": 100}),
+            record(4, {"twice.e57": 100}),
+            record(5, {"wrong_day.e57": 100}, date="2022-11-05"),
+        ]
+    )
+    jobs = [job(name) for name in ("unsaved.e57", "resized.e57", "twice.e57")]
+    jobs += [job("missing.e57"), job("wrong_day.e57")]
+
+    discrepancies = reconcile(jobs, files)
+
+    assert kinds(discrepancies) == {
+        "unsaved.e57": DISCREPANCY_UNSAVED,
+        "resized.e57": DISCREPANCY_SIZE,
+        "twice.e57": DISCREPANCY_DUPLICATE,
+        "missing.e57": DISCREPANCY_MISSING,
+        "wrong_day.e57": DISCREPANCY_MISSING,
+    }
+    duplicate = [d for d in discrepancies if d.kind == DISCREPANCY_DUPLICATE][0]
+    assert sorted(duplicate.record_ids) == [3, 4]
+
+
+def test_a_saved_copy_of_the_right_size_wins():
+    files = remote_files(
+        [record(1, {"a.e57": 99}, saved=False), record(2, {"a.e57": 100})]
+    )
+
+    assert reconcile([job("a.e57")], files) == []
+
+
+@pytest.mark.parametrize(
+    "listing",
+    [
+        None,
+        {"records": []},
+        [record(1, {"a.e57": 100}, date="04/11/2022")],
+        [dict(record(1, {}), files=["a.e57"])],
+        [dict(record(1, {}), survey="")],
+        ["a.e57"],
+    ],
+)
+def test_unrecognised_listings_are_rejected(listing):
+    with pytest.raises(UnrecognisedListingError):
+        remote_files(listing)
+
+
+def test_parse_record_date():
+    assert parse_record_date(" 2022-11-04 ") == SCAN_DATE
+    assert parse_record_date("4 Nov 2022") is None
+    assert parse_record_date(None) is None
+
+
+class LoggedInDriver:
+    """A browser whose only use here is to hand over the session cookies."""
+
+    def get_cookies(self):
+        return [
+            {
+                "name": mock_vision_server.SESSION_COOKIE,
+                "value": mock_vision_server.SESSION_VALUE,
+            }
+        ]
+
+
+@pytest.fixture
+def server():
+    server = mock_vision_server.start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def add_record(server, files, level="Level 1"):
+    record = server.state.create_record(
+        {"survey": "Blanket Scan", "level": level, "date": "2022-11-04"}
+    )
+    record["files"].update(files)
+    record["saved"] = True
+
+
+def test_reconcile_jobs_queues_missing_files_again(server, tmp_path):
+    url = "http://%s:%d" % server.server_address
+    add_record(server, {"a.e57": 100})
+    ledger = UploadLedger(str(tmp_path), path=str(tmp_path / "ledger.db"))
+    jobs = [job("a.e57"), job("b.e57")]
+    for uploaded in jobs:
+        ledger.record_success(uploaded.rel_path, uploaded.size, uploaded.mtime)
+
+    discrepancies = reconcile_jobs(jobs, ledger, LoggedInDriver(), url)
+
+    assert kinds(discrepancies) == {"b.e57": DISCREPANCY_MISSING}
+    assert not ledger.is_uploaded(jobs[1].rel_path, jobs[1].size, jobs[1].mtime)
+    assert [entry.rel_path for entry in ledger.dead_letters()] == [jobs[1].rel_path]
+    ledger.close()
+
+
+def test_only_levels_listing_files_skip_the_save_toast(server):
+    url = "http://%s:%d" % server.server_address
+    add_record(server, {"a.e57": 100})
+    jobs = [job("a.e57"), job("b.e57")._replace(level="Level 2")]
+
+    assert listable_levels(jobs, LoggedInDriver(), url) == {"Level 1"}
@@ -0,0 +1,121 @@
+import socket
+import http.client
+
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException
+
+import VisionUpload
+from http_engine import VisionHttpError
+from upload_recovery import (
+    FAILURE_FATAL,
+    FAILURE_NETWORK,
+    FAILURE_SERVER,
+    FAILURE_STALE_SESSION,
+    FAILURE_TRANSIENT_DOM,
+    FAILURE_UNKNOWN,
+    UploadFailedError,
+    backoff_delay,
+    classify_http_error,
+)
+from vision_browser import TransferFailedError, classify_browser_error
+
+
+@pytest.mark.parametrize("attempt", range(8))
+def test_backoff_grows_with_equal_jitter_up_to_the_maximum(attempt):
+    delay = min(120.0, 2.0 * 2**attempt)
+
+    for _ in range(50):
+        assert delay / 2 <= backoff_delay(attempt, 2.0, 120.0) <= delay
+
+
+def http_error(status):
+    return VisionHttpError("PUT", "/api/records/1/files", status, b"")
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (http_error(401), FAILURE_STALE_SESSION),
+        (http_error(403), FAILURE_STALE_SESSION),
+        (http_error(500), FAILURE_SERVER),
+        (http_error(503), FAILURE_SERVER),
+        (http_error(429), FAILURE_SERVER),
+        (http_error(408), FAILURE_SERVER),
+        (http_error(400), FAILURE_FATAL),
+        (http_error(404), FAILURE_FATAL),
+        (socket.timeout(), FAILURE_NETWORK),
+        (ConnectionResetError(), FAILURE_NETWORK),
+        (http.client.RemoteDisconnected(), FAILURE_NETWORK),
+        (OSError("unreachable"), FAILURE_NETWORK),
+        (FileNotFoundError(), FAILURE_FATAL),
+        (ValueError(), FAILURE_UNKNOWN),
+    ],
+)
+def test_classify_http_error(error, kind):
+    assert classify_http_error(error) == kind
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (InvalidSessionIdException(), FAILURE_STALE_SESSION),
+        (
+            Exception("unknown error: session deleted: tab crashed"),
+            FAILURE_STALE_SESSION,
+        ),
+        (TransferFailedError("stalled"), FAILURE_NETWORK),
+        (TransferFailedError("HTTP 502", 502), FAILURE_SERVER),
+        (TransferFailedError("HTTP 413", 413), FAILURE_FATAL),
+        (Exception("net::ERR_CONNECTION_RESET"), FAILURE_NETWORK),
+        (TimeoutException(), FAILURE_TRANSIENT_DOM),
+        (ValueError(), FAILURE_UNKNOWN),
+    ],
+)
+def test_classify_browser_error(error, kind):
+    assert classify_browser_error(error) == kind
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(VisionUpload.time, "sleep", lambda seconds: None)
+
+
+def test_retry_recovers_between_attempts(no_sleep):
+    errors = [OSError("reset"), TimeoutError("slow")]
+    recovered = []
+
+    def action():
+        if errors:
+            raise errors.pop(0)
+        return "done"
+
+    result = VisionUpload.retry_action(
+        action, classify=classify_http_error, recover=recovered.append
+    )
+
+    assert result == "done"
+    assert recovered == [FAILURE_NETWORK, FAILURE_NETWORK]
+
+
+def test_fatal_failures_are_not_retried(no_sleep):
+    attempts = []
+
+    def action():
+        attempts.append(1)
+        raise http_error(400)
+
+    with pytest.raises(UploadFailedError) as raised:
+        VisionUpload.retry_action(action, classify=classify_http_error)
+
+    assert len(attempts) == 1
+    assert raised.value.kind == FAILURE_FATAL
+
+
+def test_last_failure_kind_is_reported(no_sleep):
+    def action():
+        raise http_error(503)
+
+    with pytest.raises(UploadFailedError) as raised:
+        VisionUpload.retry_action(action, retries=2, classify=classify_http_error)
+
+    assert raised.value.kind == FAILURE_SERVER
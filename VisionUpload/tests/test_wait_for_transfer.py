@@ -0,0 +1,114 @@
+import time
+import threading
+import http.client
+
+import pytest
+
+import vision_browser
+import mock_vision_server
+from vision_browser import JS_READ_UPLOADS, TransferFailedError, wait_for_transfer
+
+FILE_SIZES = [300 * 1024, 200 * 1024, 100 * 1024]
+PIECE_SIZE = 64 * 1024
+
+
+class SequentialUploadPage:
+    """
+    Stands in for the browser: sends each file to the mock server one after
+    another, the way the mock web app does with sequential uploads, and
+    reports their progress as the upload hook in the page would.
+    """
+
+    def __init__(self, server, record_id, sizes, gap=0.3):
+        self.address = server.server_address
+        self.record_id = record_id
+        self.sizes = sizes
+        self.gap = gap
+        self.uploads = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._send_all, daemon=True)
+        self._thread.start()
+
+    def _send_all(self):
+        for number, size in enumerate(self.sizes):
+            time.sleep(self.gap)
+            entry = {"loaded": 0, "total": size, "done": False, "status": None}
+            with self._lock:
+                self.uploads.append(entry)
+            conn = http.client.HTTPConnection(*self.address)
+            conn.putrequest(
+                "PUT",
+                "/api/records/%d/files?name=scan%d.e57" % (self.record_id, number),
+            )
+            conn.putheader("Content-Length", str(size))
+            conn.putheader(
+                "Cookie",
+                "%s=%s"
+                % (mock_vision_server.SESSION_COOKIE, mock_vision_server.SESSION_VALUE),
+            )
+            conn.endheaders()
+            for offset in range(0, size, PIECE_SIZE):
+                piece = min(PIECE_SIZE, size - offset)
+                conn.send(b"\0" * piece)
+                with self._lock:
+                    entry["loaded"] += piece
+                time.sleep(0.02)
+            status = conn.getresponse().status
+            conn.close()
+            with self._lock:
+                entry["done"], entry["status"] = True, status
+
+    def execute_script(self, script, *args):
+        assert script == JS_READ_UPLOADS
+        with self._lock:
+            return [dict(entry) for entry in self.uploads]
+
+    def find_elements(self, *args):
+        return []
+
+
+@pytest.fixture
+def server():
+    server = mock_vision_server.start_server(sequential_uploads=True)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(vision_browser, "TRANSFER_POLL_INTERVAL", 0.01)
+
+
+def test_mock_app_is_told_to_upload_sequentially(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request("GET", "/")
+    page = conn.getresponse().read().decode("utf-8")
+    conn.close()
+    assert '"sequentialUploads": true' in page
+
+
+def test_batch_waits_for_every_sequential_upload(server):
+    record_id = server.state.create_record({"level": "Level 1"})["id"]
+    page = SequentialUploadPage(server, record_id, FILE_SIZES)
+
+    wait_for_transfer(page, "batch", sum(FILE_SIZES), file_count=len(FILE_SIZES))
+
+    files = server.state.records[record_id]["files"]
+    assert sorted(files.values()) == sorted(FILE_SIZES)
+
+
+def test_single_file_completes_on_its_own(server):
+    record_id = server.state.create_record({"level": "Level 1"})["id"]
+    page = SequentialUploadPage(server, record_id, FILE_SIZES[:1])
+
+    wait_for_transfer(page, "scan0.e57", FILE_SIZES[0])
+
+    assert server.state.records[record_id]["files"] == {"scan0.e57": FILE_SIZES[0]}
+
+
+def test_failed_upload_in_batch_is_reported(server):
+    page = SequentialUploadPage(server, 999, FILE_SIZES[:2])
+
+    with pytest.raises(TransferFailedError, match="HTTP 404"):
+        wait_for_transfer(page, "batch", sum(FILE_SIZES[:2]), file_count=2)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+End-to-end upload benchmark against the local mock Vision server.
+
+Builds synthetic scan trees of the requested file counts and sizes, starts
+a mock Vision server with the given latency and bandwidth, and times one or
+more scenarios on each tree:
+
+    http   the direct HTTP engine, without a browser
+    form   upload_scan_file driving the mock web form in headless Chrome
+    main   the full script, headless and unattended, in a separate process
+           whose home folder is temporary, so its ledgers, metrics and
+           cookies never mix with real upload history
+
+Each result is reported as files/hour and MB/s, and can be appended as a JSON
+line to a file so runs before and after a change can be compared, e.g.
+
+    python upload_benchmark.py --files 20 --size 50 --scenario http form
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+import logging
+import argparse
+import datetime
+import tempfile
+
+from mock_vision_server import (
+    MOCK_LEVELS,
+    MOCK_SURVEYS,
+    SESSION_COOKIE,
+    SESSION_VALUE,
+    start_server,
+)
+from http_engine import VisionHttpClient, upload_scan_file_http
+from upload_ledger import relative_path
+
+SCENARIOS = ("http", "form", "main")
+BENCH_MODULE = "Module"
+BENCH_DATE_FOLDERS = ("041122", "051122")
+
+
+def make_scan_tree(root, file_count, file_size):
+    """
+    Creates file_count sparse scan files of file_size bytes under root, spread
+    over two levels and two dates of the first mock survey. Returns their paths.
+    """
+    paths = []
+    levels = MOCK_LEVELS[:2]
+    for i in range(file_count):
+        level = levels[i % len(levels)]
+        date_dir = BENCH_DATE_FOLDERS[(i // len(levels)) % len(BENCH_DATE_FOLDERS)]
+        folder = os.path.join(root, MOCK_SURVEYS[0], level, date_dir)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"Scan {i + 1:03d}.e57")
+        with open(path, "wb") as f:
+            f.truncate(file_size)
+        paths.append(path)
+    return paths
+
+
+def _scan_fields(root, path):
+    survey, level, date_dir, _ = relative_path(root, path).split("/")
+    return survey, level, datetime.datetime.strptime(date_dir, "%d%m%y").date()
+
+
+def run_http(url, root, paths, args):
+    """Uploads every file with the direct HTTP engine, one at a time."""
+    client = VisionHttpClient(url, {SESSION_COOKIE: SESSION_VALUE})
+    try:
+        for path in paths:
+            survey, level, scan_date = _scan_fields(root, path)
+            upload_scan_file_http(
+                client,
+                path,
+                os.path.getsize(path),
+                scan_date,
+                BENCH_MODULE,
+                survey,
+                level,
+            )
+    finally:
+        client.close()
+
+
+def run_form(url, root, paths, args):
+    """Uploads every file through the mock web form in one headless browser."""
+    from vision_browser import (
+        FormFiller,
+        create_driver,
+        navigate_to_level,
+        upload_scan_file,
+        wait_for_page_ready,
+    )
+
+    driver = create_driver(headless=True)
+    try:
+        driver.get(url)
+        wait_for_page_ready(driver)
+        form_filler = FormFiller(driver) if args.form_fill == "fast" else None
+        current_level = None
+        for path in paths:
+            survey, level, scan_date = _scan_fields(root, path)
+            if level != current_level:
+                navigate_to_level(driver, level)
+                current_level = level
+            upload_scan_file(
+                driver, path, scan_date, BENCH_MODULE, survey, form_filler=form_filler
+            )
+    finally:
+        driver.quit()
+
+
+def run_main(url, root, paths, args):
+    """
+    Runs the whole upload script on the tree, headless and unattended. The
+    script gets a temporary home folder, so everything it keeps under
+    ~/.vision_upload is thrown away afterwards. It is handed the mock's
+    session cookie, so the HTTP engine runs without a browser.
+    """
+    home = tempfile.mkdtemp(prefix="vision_bench_home_")
+    cookie_path = os.path.join(home, "cookies.json")
+    with open(cookie_path, "w") as f:
+        json.dump([{"name": SESSION_COOKIE, "value": SESSION_VALUE, "path": "/"}], f)
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    command = [
+        sys.executable,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "VisionUpload.py"),
+        root,
+        "--url",
+        url,
+        "--engine",
+        args.engine,
+        "--workers",
+        str(args.workers),
+        "--form-fill",
+        args.form_fill,
+        "--headless",
+        "--unattended",
+        "--yes",
+        "--no-verify",
+        "--cookies",
+        cookie_path,
+        "--metrics-file",
+        os.path.join(home, "phase_metrics.jsonl"),
+    ]
+    try:
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            "The upload script failed:\n" + result.stderr[-2000:].rstrip()
+        )
+
+
+RUNNERS = {"http": run_http, "form": run_form, "main": run_main}
+
+
+def benchmark(scenario, url, server, file_count, file_size, args):
+    """Times one scenario on a fresh synthetic tree and returns the result dict."""
+    root = tempfile.mkdtemp(prefix="vision_bench_")
+    try:
+        paths = make_scan_tree(root, file_count, file_size)
+        records_before = len(server.state.records)
+        started = time.monotonic()
+        RUNNERS[scenario](url, root, paths, args)
+        seconds = time.monotonic() - started
+        saved = sum(
+            1
+            for record in list(server.state.records.values())[records_before:]
+            if record["saved"]
+        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    total_mb = file_count * file_size / 1024**2
+    return {
+        "scenario": scenario,
+        "engine": args.engine if scenario == "main" else scenario,
+        "files": file_count,
+        "file_mb": file_size / 1024**2,
+        "saved": saved,
+        "seconds": round(seconds, 3),
+        "files_per_hour": round(file_count / seconds * 3600, 1) if seconds else None,
+        "mb_per_s": round(total_mb / seconds, 2) if seconds else None,
+        "latency": args.latency,
+        "bandwidth_mbps": args.bandwidth,
+        "workers": args.workers,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        nargs="+",
+        choices=SCENARIOS,
+        default=["http"],
+        help="what to time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[10],
+        help="scan counts to try (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--size",
+        type=float,
+        nargs="+",
+        default=[10.0],
+        help="scan sizes to try, in MB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="mock server latency per request, in seconds",
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, help="mock server upload cap in MB/s (default: none)"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("browser", "http"),
+        default="browser",
+        help="engine used by the main scenario",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--form-fill", choices=("fast", "picker"), default="fast")
+    parser.add_argument("--output", help="append each result as a JSON line here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(message)s")
+
+    server = start_server(
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024**2 if args.bandwidth else None,
+    )
+    url = "http://%s:%d" % server.server_address
+
+    print(
+        f"{'scenario':<10} {'files':>6} {'MB/file':>8} {'saved':>6} "
+        f"{'seconds':>9} {'files/h':>9} {'MB/s':>8}"
+    )
+    try:
+        for scenario in args.scenario:
+            for file_count in args.files:
+                for size_mb in args.size:
+                    result = benchmark(
+                        scenario,
+                        url,
+                        server,
+                        file_count,
+                        int(size_mb * 1024**2),
+                        args,
+                    )
+                    print(
+                        f"{scenario:<10} {result['files']:>6} {result['file_mb']:>8.1f} "
+                        f"{result['saved']:>6} {result['seconds']:>9.2f} "
+                        f"{result['files_per_hour']:>9.0f} {result['mb_per_s']:>8.2f}"
+                    )
+                    if args.output:
+                        result["ts"] = time.time()
+                        with open(args.output, "a") as f:
+                            f.write(json.dumps(result) + "\n")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
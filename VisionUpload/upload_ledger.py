@@ -0,0 +1,526 @@
+"""
+Central upload ledger for the Vision upload script.
+
+Replaces the per-date uploaded.log files with a single SQLite database (WAL
+mode) per parent folder. The database is kept on local disk, named after the
+parent folder's path, because the parent folder is usually a network share
+and SQLite's WAL locking does not work over network filesystems. Entries are
+keyed by the file's path
+relative to the parent folder plus its size and mtime, so a scan that changes
+on disk is treated as a new upload. All entries are also held in an in-memory
+dict for O(1) skip checks. Files that still fail after every retry are kept
+in a dead-letter table so they can be replayed later without a rescan.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import datetime
+import logging
+import threading
+from collections import namedtuple
+
+LEDGER_DIR = os.path.join(os.path.expanduser("~"), ".vision_upload", "ledgers")
+# Name of the ledger earlier versions kept in the parent folder.
+LEDGER_FILENAME = "vision_upload_ledger.db"
+
+# Files SQLite keeps next to the ledger while it is open.
+LEDGER_FILENAMES = (LEDGER_FILENAME, LEDGER_FILENAME + "-wal", LEDGER_FILENAME + "-shm")
+
+STATUS_PENDING = "pending"
+STATUS_UPLOADING = "uploading"
+STATUS_UPLOADED = "uploaded"
+STATUS_FAILED = "failed"
+
+# A resumable chunked upload in progress for one version of a file.
+ChunkSession = namedtuple(
+    "ChunkSession", ["record_id", "upload_id", "chunk_size", "started_at"]
+)
+
+# A file that still failed after every retry, kept for a later replay.
+DeadLetter = namedtuple(
+    "DeadLetter",
+    [
+        "rel_path",
+        "size",
+        "mtime",
+        "survey",
+        "level",
+        "scan_date",
+        "kind",
+        "error",
+        "failed_at",
+    ],
+)
+
+LedgerEntry = namedtuple(
+    "LedgerEntry",
+    [
+        "rel_path",
+        "size",
+        "mtime",
+        "status",
+        "attempts",
+        "bytes_uploaded",
+        "first_attempt_at",
+        "last_attempt_at",
+        "completed_at",
+        "error",
+    ],
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    bytes_uploaded INTEGER NOT NULL DEFAULT 0,
+    first_attempt_at REAL,
+    last_attempt_at REAL,
+    completed_at REAL,
+    error TEXT,
+    PRIMARY KEY (rel_path, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS chunk_sessions (
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    record_id TEXT NOT NULL,
+    upload_id TEXT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (rel_path, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    confirmed_at REAL NOT NULL,
+    PRIMARY KEY (rel_path, size, mtime, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    survey TEXT NOT NULL,
+    level TEXT NOT NULL,
+    scan_date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    error TEXT,
+    failed_at REAL NOT NULL,
+    PRIMARY KEY (rel_path, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS integrity_checks (
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    problem TEXT,
+    checked_at REAL NOT NULL,
+    sampled INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (rel_path, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS legacy_logs (
+    rel_path TEXT PRIMARY KEY,
+    imported_at REAL NOT NULL
+);
+"""
+
+
+def ledger_path(root, directory=LEDGER_DIR):
+    """Returns the local ledger path for the parent folder root."""
+    root = os.path.abspath(root)
+    digest = hashlib.sha1(os.path.normcase(root).encode("utf-8")).hexdigest()[:12]
+    name = os.path.basename(root.rstrip("\\/")) or "root"
+    return os.path.join(directory, f"{name}-{digest}.db")
+
+
+def _open_read_only(path):
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def relative_path(root, path):
+    """Returns path relative to root using forward slashes, as stored in the ledger."""
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+class UploadLedger:
+    """
+    Thread-safe record of upload attempts and results.
+
+    Attempts and failures are written in batches; a success is committed
+    straight away (together with anything still pending) so that a crash
+    never causes a finished file to be uploaded twice.
+    """
+
+    def __init__(
+        self, root, batch_size=20, flush_interval=5.0, path=None, read_only=False
+    ):
+        self.root = root
+        self.path = path or ledger_path(root)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+        legacy_path = os.path.join(root, LEDGER_FILENAME)
+        if read_only:
+            # Work on an in-memory copy, so nothing is written anywhere.
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            for source_path in (self.path, legacy_path):
+                if os.path.exists(source_path):
+                    self._copy_from(source_path)
+                    break
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            new_ledger = not os.path.exists(self.path)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            if new_ledger and os.path.exists(legacy_path):
+                self._copy_from(legacy_path)
+                logging.info(
+                    "Copied the ledger in %s to %s; the copy there is no longer used",
+                    root,
+                    self.path,
+                )
+        self._conn.executescript(_SCHEMA)
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(integrity_checks)")
+        ]
+        if "sampled" not in columns:
+            # Ledgers from before sampled checks were told apart; treat their
+            # results as sampled so they are checked in full when possible.
+            self._conn.execute(
+                "ALTER TABLE integrity_checks"
+                " ADD COLUMN sampled INTEGER NOT NULL DEFAULT 1"
+            )
+        self._conn.commit()
+
+        self._entries = {}
+        for row in self._conn.execute("SELECT * FROM uploads"):
+            entry = LedgerEntry(*row)
+            self._entries[(entry.rel_path, entry.size, entry.mtime)] = entry
+        logging.debug("Loaded %d ledger entries from %s", len(self._entries), self.path)
+
+    # ----- Lookups -----
+
+    def get(self, rel_path, size, mtime):
+        """Returns the LedgerEntry for this version of the file, or None."""
+        return self._entries.get((rel_path, size, mtime))
+
+    def is_uploaded(self, rel_path, size, mtime):
+        """True if this exact version of the file has already been uploaded."""
+        entry = self._entries.get((rel_path, size, mtime))
+        return entry is not None and entry.status == STATUS_UPLOADED
+
+    def uploaded_entries(self):
+        """Returns the LedgerEntry of every uploaded file."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry for entry in entries if entry.status == STATUS_UPLOADED]
+
+    # ----- Updates -----
+
+    def record_attempt(self, rel_path, size, mtime):
+        """Marks the start of an upload attempt."""
+        now = time.time()
+        with self._lock:
+            entry = self._current(rel_path, size, mtime)
+            self._store(
+                entry._replace(
+                    status=STATUS_UPLOADING,
+                    attempts=entry.attempts + 1,
+                    first_attempt_at=entry.first_attempt_at or now,
+                    last_attempt_at=now,
+                    error=None,
+                )
+            )
+            self._maybe_flush()
+
+    def record_success(self, rel_path, size, mtime):
+        """Marks the file as uploaded and commits immediately."""
+        with self._lock:
+            entry = self._current(rel_path, size, mtime)
+            self._store(
+                entry._replace(
+                    status=STATUS_UPLOADED,
+                    bytes_uploaded=size,
+                    completed_at=time.time(),
+                    error=None,
+                )
+            )
+            self._conn.execute(
+                "DELETE FROM dead_letters WHERE rel_path = ? AND size = ? AND mtime = ?",
+                (rel_path, size, mtime),
+            )
+            self._flush()
+
+    def record_failure(self, rel_path, size, mtime, error):
+        """Marks the latest attempt as failed."""
+        with self._lock:
+            entry = self._current(rel_path, size, mtime)
+            self._store(entry._replace(status=STATUS_FAILED, error=str(error)))
+            self._maybe_flush()
+
+    # ----- Chunked uploads -----
+
+    def get_chunk_session(self, rel_path, size, mtime):
+        """Returns the ChunkSession for an interrupted chunked upload, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record_id, upload_id, chunk_size, started_at FROM chunk_sessions "
+                "WHERE rel_path = ? AND size = ? AND mtime = ?",
+                (rel_path, size, mtime),
+            ).fetchone()
+        return ChunkSession(*row) if row else None
+
+    def start_chunk_session(
+        self, rel_path, size, mtime, record_id, upload_id, chunk_size
+    ):
+        """Records a new chunked upload, discarding any earlier one for the file."""
+        with self._lock:
+            self._delete_chunk_session(rel_path, size, mtime)
+            self._conn.execute(
+                "INSERT INTO chunk_sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    rel_path,
+                    size,
+                    mtime,
+                    str(record_id),
+                    str(upload_id),
+                    chunk_size,
+                    time.time(),
+                ),
+            )
+            self._flush()
+
+    def confirmed_chunks(self, rel_path, size, mtime):
+        """Returns {chunk_index: sha256} for every chunk the server has confirmed."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_index, sha256 FROM chunks "
+                "WHERE rel_path = ? AND size = ? AND mtime = ?",
+                (rel_path, size, mtime),
+            ).fetchall()
+        return dict(rows)
+
+    def record_chunk(self, rel_path, size, mtime, index, offset, length, sha256):
+        """Records a confirmed chunk and commits it straight away."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (rel_path, size, mtime, index, offset, length, sha256, time.time()),
+            )
+            (uploaded,) = self._conn.execute(
+                "SELECT SUM(length) FROM chunks "
+                "WHERE rel_path = ? AND size = ? AND mtime = ?",
+                (rel_path, size, mtime),
+            ).fetchone()
+            entry = self._current(rel_path, size, mtime)
+            self._store(entry._replace(bytes_uploaded=uploaded))
+            self._flush()
+
+    def clear_chunk_session(self, rel_path, size, mtime):
+        """Forgets the chunked upload state for a file."""
+        with self._lock:
+            self._delete_chunk_session(rel_path, size, mtime)
+            self._flush()
+
+    # ----- Dead letters -----
+
+    def add_dead_letter(
+        self, rel_path, size, mtime, survey, level, scan_date, kind, error
+    ):
+        """Queues a file that failed every retry so it can be replayed later."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dead_letters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    rel_path,
+                    size,
+                    mtime,
+                    survey,
+                    level,
+                    scan_date.isoformat(),
+                    kind,
+                    str(error),
+                    time.time(),
+                ),
+            )
+            self._flush()
+
+    def dead_letters(self):
+        """Returns every queued DeadLetter, oldest failure first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM dead_letters ORDER BY failed_at"
+            ).fetchall()
+        return [
+            DeadLetter(*row)._replace(scan_date=datetime.date.fromisoformat(row[5]))
+            for row in rows
+        ]
+
+    def remove_dead_letter(self, rel_path, size, mtime):
+        """Drops a file from the dead-letter queue."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM dead_letters WHERE rel_path = ? AND size = ? AND mtime = ?",
+                (rel_path, size, mtime),
+            )
+            self._flush()
+
+    # ----- Integrity checks -----
+
+    def integrity_results(self, sampled_passes=True):
+        """
+        Returns {(rel_path, size, mtime): problem or None} for every checked
+        file. Unless sampled_passes is set, files that passed only a sampled
+        check are left out, so they can be checked in full.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rel_path, size, mtime, problem, sampled FROM integrity_checks"
+            ).fetchall()
+        return {
+            (rel_path, size, mtime): problem
+            for rel_path, size, mtime, problem, sampled in rows
+            if sampled_passes or problem is not None or not sampled
+        }
+
+    def record_integrity_results(self, results, sampled=False):
+        """
+        Stores {(rel_path, size, mtime): problem or None} from an integrity
+        check; sampled tells whether only some pages of each file were checked.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO integrity_checks"
+                " (rel_path, size, mtime, problem, checked_at, sampled)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    key + (problem, now, int(sampled))
+                    for key, problem in results.items()
+                ],
+            )
+            self._flush()
+
+    # ----- Legacy import -----
+
+    def import_legacy_log(self, log_path, files):
+        """
+        Imports an old per-date uploaded.log once. files maps the scan file
+        names in that date folder to their ScanFile records. Returns the number
+        of entries imported, or 0 if the log was imported on an earlier run.
+        """
+        log_rel_path = relative_path(self.root, log_path)
+        with self._lock:
+            already = self._conn.execute(
+                "SELECT 1 FROM legacy_logs WHERE rel_path = ?", (log_rel_path,)
+            ).fetchone()
+            if already:
+                return 0
+
+            try:
+                with open(log_path, "r") as log_file:
+                    names = set(line.strip() for line in log_file)
+            except IOError as e:
+                logging.error("Could not read '%s': %s", log_path, e)
+                return 0
+
+            imported = 0
+            for name in names:
+                scan_file = files.get(name)
+                if scan_file is None:
+                    continue
+                rel_path = relative_path(self.root, scan_file.path)
+                entry = self._current(rel_path, scan_file.size, scan_file.mtime)
+                if entry.status == STATUS_UPLOADED:
+                    continue
+                self._store(
+                    entry._replace(
+                        status=STATUS_UPLOADED,
+                        bytes_uploaded=scan_file.size,
+                        completed_at=time.time(),
+                    )
+                )
+                imported += 1
+            self._conn.execute(
+                "INSERT INTO legacy_logs (rel_path, imported_at) VALUES (?, ?)",
+                (log_rel_path, time.time()),
+            )
+            self._flush()
+            return imported
+
+    def flush(self):
+        """Commits any pending updates."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Commits pending updates and closes the database."""
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    # ----- Internals (caller holds the lock) -----
+
+    def _copy_from(self, source_path):
+        """Loads the contents of the ledger at source_path into this one."""
+        try:
+            source = _open_read_only(source_path)
+            try:
+                source.backup(self._conn)
+            finally:
+                source.close()
+        except sqlite3.Error as e:
+            logging.warning("Could not read the ledger %s: %s", source_path, e)
+
+    def _delete_chunk_session(self, rel_path, size, mtime):
+        key = (rel_path, size, mtime)
+        self._conn.execute(
+            "DELETE FROM chunk_sessions WHERE rel_path = ? AND size = ? AND mtime = ?",
+            key,
+        )
+        self._conn.execute(
+            "DELETE FROM chunks WHERE rel_path = ? AND size = ? AND mtime = ?", key
+        )
+
+    def _current(self, rel_path, size, mtime):
+        entry = self._entries.get((rel_path, size, mtime))
+        if entry is None:
+            entry = LedgerEntry(
+                rel_path, size, mtime, STATUS_PENDING, 0, 0, None, None, None, None
+            )
+        return entry
+
+    def _store(self, entry):
+        key = (entry.rel_path, entry.size, entry.mtime)
+        self._entries[key] = entry
+        self._pending[key] = entry
+
+    def _maybe_flush(self):
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                list(self._pending.values()),
+            )
+            self._pending.clear()
+        self._conn.commit()
+        self._last_flush = time.monotonic()
@@ -0,0 +1,278 @@
+"""
+Plan files and lease-based sharding of an upload across several machines.
+
+A plan is the full job list from one folder scan, written as JSON with paths
+relative to the parent folder, so any machine with the share mounted can
+read it wherever the share is mounted. Machines that run the same plan
+split the work through a LeaseBoard: a folder on the shared drive with one
+lease file per job being uploaded and one done marker per job finished.
+
+A lease is taken by creating its file exclusively, and names the node that
+holds it and when it expires. Holders renew their leases in the background
+while the upload runs, so a lease only expires when its node has died or
+lost the share; another node may then take it over. Takeovers replace the
+file and re-read it after a short pause, so when two nodes race for the
+same expired lease only the last writer goes ahead. Expiry uses the wall
+clock, so the machines' clocks should be kept in sync.
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import datetime
+import threading
+from collections import namedtuple
+
+PLAN_VERSION = 1
+LEASE_SECONDS = 600  # Lease lifetime; a dead node's jobs are reclaimed after this
+RENEW_INTERVAL = LEASE_SECONDS / 3  # Seconds between lease renewals
+TAKEOVER_SETTLE = 2.0  # Seconds to wait before checking a takeover of a lease won
+
+# One job in a plan file.
+PlanEntry = namedtuple(
+    "PlanEntry", ["rel_path", "size", "mtime", "survey", "level", "scan_date"]
+)
+
+
+def default_node_id():
+    return socket.gethostname()
+
+
+def default_lease_dir(plan_path):
+    return os.path.splitext(plan_path)[0] + "_leases"
+
+
+def write_plan(path, root, jobs):
+    """Writes jobs to a plan file at path, replacing any existing plan atomically."""
+    plan = {
+        "version": PLAN_VERSION,
+        "created_at": time.time(),
+        "created_by": default_node_id(),
+        "root_name": os.path.basename(os.path.normpath(root)),
+        "jobs": [
+            {
+                "rel_path": job.rel_path,
+                "size": job.size,
+                "mtime": job.mtime,
+                "survey": job.survey,
+                "level": job.level,
+                "scan_date": job.scan_date.isoformat(),
+            }
+            for job in jobs
+        ],
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=1)
+    os.replace(tmp_path, path)
+    logging.info("Wrote a plan of %d files to %s", len(jobs), path)
+
+
+def read_plan(path, root=None):
+    """Returns the PlanEntry list from the plan file at path."""
+    with open(path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version {plan.get('version')} in {path}")
+    if root is not None and plan["root_name"] != os.path.basename(
+        os.path.normpath(root)
+    ):
+        logging.warning(
+            "The plan was made for a folder named '%s', not '%s'",
+            plan["root_name"],
+            os.path.basename(os.path.normpath(root)),
+        )
+    return [
+        PlanEntry(
+            rel_path=entry["rel_path"],
+            size=entry["size"],
+            mtime=entry["mtime"],
+            survey=entry["survey"],
+            level=entry["level"],
+            scan_date=datetime.date.fromisoformat(entry["scan_date"]),
+        )
+        for entry in plan["jobs"]
+    ]
+
+
+def _lease_key(job):
+    identity = f"{job.rel_path}|{job.size}|{job.mtime}".encode("utf-8")
+    return hashlib.sha1(identity).hexdigest()
+
+
+class LeaseBoard:
+    """
+    Claims plan jobs for this node through lease files in directory, which
+    every node running the plan must share.
+    """
+
+    def __init__(self, directory, node_id=None, lease_seconds=LEASE_SECONDS):
+        self.directory = directory
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        self._held = {}  # key -> rel_path of each lease this node holds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _lease_record(self, rel_path):
+        return json.dumps(
+            {
+                "node": self.node_id,
+                "rel_path": rel_path,
+                "expires": time.time() + self.lease_seconds,
+            }
+        )
+
+    def _read_lease(self, key):
+        """Returns the lease record for key, {} if unreadable, or None if none."""
+        try:
+            with open(self._path(key, ".lease"), "r", encoding="utf-8") as f:
+                return json.loads(f.read() or "{}")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return {}  # Being written by another node, or damaged
+
+    def _write_lease(self, key, rel_path):
+        tmp_path = self._path(key, f".{self.node_id}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._lease_record(rel_path))
+        os.replace(tmp_path, self._path(key, ".lease"))
+
+    # ----- Claims -----
+
+    def unfinished(self, jobs):
+        """Returns the jobs that no node has finished yet."""
+        done = {
+            name[: -len(".done")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".done")
+        }
+        return [job for job in jobs if _lease_key(job) not in done]
+
+    def claim(self, job):
+        """
+        Takes the lease on job for this node. Returns False if the job is
+        finished or another node holds a live lease on it.
+        """
+        key = _lease_key(job)
+        if os.path.exists(self._path(key, ".done")):
+            return False
+        try:
+            fd = os.open(
+                self._path(key, ".lease"), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            )
+        except FileExistsError:
+            return self._take_over(key, job.rel_path)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self._lease_record(job.rel_path))
+        with self._lock:
+            self._held[key] = job.rel_path
+        return True
+
+    def _take_over(self, key, rel_path):
+        lease = self._read_lease(key)
+        if lease is None:
+            return False  # Released just now; it is done or another node's retry
+        if lease == {}:
+            # Unreadable: only treat it as expired once the file itself is old.
+            try:
+                age = time.time() - os.path.getmtime(self._path(key, ".lease"))
+            except OSError:
+                return False
+            if age < self.lease_seconds:
+                return False
+        elif lease.get("node") == self.node_id:
+            pass  # Left by an earlier run of this node
+        elif lease.get("expires", 0) > time.time():
+            return False
+        else:
+            logging.info(
+                "Taking over '%s' from node %s, whose lease expired",
+                rel_path,
+                lease.get("node"),
+            )
+        self._write_lease(key, rel_path)
+        time.sleep(TAKEOVER_SETTLE)
+        lease = self._read_lease(key)
+        if not lease or lease.get("node") != self.node_id:
+            return False
+        with self._lock:
+            self._held[key] = rel_path
+        return True
+
+    def complete(self, job):
+        """Marks job as finished for every node and drops its lease."""
+        key = _lease_key(job)
+        with open(self._path(key, ".done"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"node": self.node_id, "done_at": time.time()}))
+        self.release(job)
+
+    def release(self, job):
+        """Drops the lease on job so that another node may try it."""
+        key = _lease_key(job)
+        # Held across the delete so a renewal cannot write the lease back.
+        with self._lock:
+            if self._held.pop(key, None) is None:
+                return
+            lease = self._read_lease(key)
+            if lease and lease.get("node") == self.node_id:
+                try:
+                    os.remove(self._path(key, ".lease"))
+                except OSError:
+                    pass
+
+    # ----- Renewal -----
+
+    def start(self):
+        """Starts renewing this node's leases in the background."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="lease-renewal", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        interval = min(RENEW_INTERVAL, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            self.renew()
+
+    def renew(self):
+        """Extends every lease this node holds."""
+        with self._lock:
+            held = dict(self._held)
+        for key, rel_path in held.items():
+            # Checked and written under the lock, so a lease released in the
+            # meantime is not brought back.
+            with self._lock:
+                if key not in self._held:
+                    continue  # Released since
+                lease = self._read_lease(key)
+                if lease and lease.get("node") != self.node_id:
+                    logging.warning(
+                        "Node %s took over '%s' while it was still uploading here",
+                        lease.get("node"),
+                        rel_path,
+                    )
+                    self._held.pop(key, None)
+                    continue
+                try:
+                    self._write_lease(key, rel_path)
+                except OSError as e:
+                    logging.warning(
+                        "Could not renew the lease on '%s': %s", rel_path, e
+                    )
@@ -0,0 +1,162 @@
+"""
+Bulk confirmation of uploads against the records in Vision.
+
+Waiting up to 30 s for the "Successfully Saved" toast after every file is
+slow, and a missed toast was only logged while the file still counted as
+uploaded. Instead, the record list of each level is fetched once after the
+run and every uploaded file is matched against it by survey, date, file
+name and size. Only levels whose record list could be read before the run
+skip the toast wait; elsewhere it remains the save confirmation. Files with no saved record, or whose record holds a
+different size, are sent back for re-upload; files saved in more than one
+record are reported so the extra records can be cleaned up.
+"""
+
+import logging
+import datetime
+from collections import defaultdict, namedtuple
+
+DISCREPANCY_MISSING = "missing"  # No record holds the file
+DISCREPANCY_UNSAVED = "unsaved"  # Only in records that were never saved
+DISCREPANCY_SIZE = "size_mismatch"  # The saved record holds a different size
+DISCREPANCY_DUPLICATE = "duplicate"  # Saved in more than one record
+
+# Kinds whose files must be uploaded again.
+REUPLOAD_KINDS = (DISCREPANCY_MISSING, DISCREPANCY_UNSAVED, DISCREPANCY_SIZE)
+
+# One file in one Vision record. size is None if Vision did not show it.
+RemoteFile = namedtuple(
+    "RemoteFile", ["record_id", "survey", "level", "scan_date", "name", "size", "saved"]
+)
+
+# A file whose records in Vision do not match what was uploaded.
+Discrepancy = namedtuple("Discrepancy", ["kind", "job", "record_ids", "detail"])
+
+
+class UnrecognisedListingError(ValueError):
+    """Raised when a record list from Vision is not in the expected form."""
+
+
+def parse_record_date(text):
+    """Parses a record date as Vision shows it (YYYY-MM-DD), or returns None."""
+    try:
+        return datetime.datetime.strptime(text.strip(), "%Y-%m-%d").date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def remote_files(records):
+    """
+    Flattens Vision records (dicts with id, survey, level, date, saved and
+    files {name: size}) into one RemoteFile per file. Raises
+    UnrecognisedListingError if any record is not in that form, as the
+    files it holds would otherwise look missing.
+    """
+    if not isinstance(records, list):
+        raise UnrecognisedListingError(
+            "expected a list of records, got %s" % type(records).__name__
+        )
+    files = []
+    for record in records:
+        if (
+            not isinstance(record, dict)
+            or not isinstance(record.get("files"), dict)
+            or not record.get("survey")
+            or parse_record_date(record.get("date")) is None
+        ):
+            raise UnrecognisedListingError("unrecognised record %.100r" % (record,))
+        for name, size in (record.get("files") or {}).items():
+            files.append(
+                RemoteFile(
+                    record_id=record.get("id"),
+                    survey=record.get("survey"),
+                    level=record.get("level"),
+                    scan_date=parse_record_date(record.get("date")),
+                    name=name,
+                    size=size,
+                    saved=bool(record.get("saved")),
+                )
+            )
+    return files
+
+
+def reconcile(jobs, files):
+    """
+    Matches uploaded jobs against the RemoteFiles of their levels and returns
+    a Discrepancy for every job that is not saved in exactly one record.
+    """
+    by_key = defaultdict(list)
+    for remote in files:
+        by_key[(remote.survey, remote.level, remote.scan_date, remote.name)].append(
+            remote
+        )
+
+    discrepancies = []
+    for job in jobs:
+        name = job.rel_path.rsplit("/", 1)[-1]
+        matches = by_key.get((job.survey, job.level, job.scan_date, name), [])
+        saved = [remote for remote in matches if remote.saved]
+        if not matches:
+            discrepancies.append(Discrepancy(DISCREPANCY_MISSING, job, [], None))
+        elif not saved:
+            discrepancies.append(
+                Discrepancy(
+                    DISCREPANCY_UNSAVED,
+                    job,
+                    [remote.record_id for remote in matches],
+                    None,
+                )
+            )
+        elif all(remote.size not in (None, job.size) for remote in saved):
+            discrepancies.append(
+                Discrepancy(
+                    DISCREPANCY_SIZE,
+                    job,
+                    [remote.record_id for remote in saved],
+                    "%s bytes in Vision, %d on disk"
+                    % (", ".join(str(remote.size) for remote in saved), job.size),
+                )
+            )
+        elif len(saved) > 1:
+            discrepancies.append(
+                Discrepancy(
+                    DISCREPANCY_DUPLICATE,
+                    job,
+                    [remote.record_id for remote in saved],
+                    None,
+                )
+            )
+    return discrepancies
+
+
+def log_discrepancies(discrepancies, checked):
+    """Logs the result of reconciling checked files."""
+    if not discrepancies:
+        logging.info("All %d uploaded files are saved in Vision.", checked)
+        return
+    counts = defaultdict(int)
+    for discrepancy in discrepancies:
+        counts[discrepancy.kind] += 1
+    logging.warning(
+        "%d of %d uploaded files do not match Vision (%s)",
+        len(discrepancies),
+        checked,
+        ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())),
+    )
+    for discrepancy in discrepancies:
+        action = (
+            "will be uploaded again"
+            if discrepancy.kind in REUPLOAD_KINDS
+            else "extra records should be deleted"
+        )
+        logging.warning(
+            "  %s: '%s'%s%s; %s",
+            discrepancy.kind,
+            discrepancy.job.rel_path,
+            (
+                " (records %s)" % ", ".join(map(str, discrepancy.record_ids))
+                if discrepancy.record_ids
+                else ""
+            ),
+            f" - {discrepancy.detail}" if discrepancy.detail else "",
+            action,
+        )
@@ -0,0 +1,60 @@
+"""
+Failure classification and retry backoff for the Vision upload script.
+
+Upload failures are sorted into a few kinds so that each can be recovered
+from appropriately before the next attempt: a transient DOM problem only
+needs the open dialog closed, a stale session needs the login restored, and
+network or server errors need the page reloaded after a pause. Retries back
+off exponentially with jitter. Fatal errors are not retried at all.
+"""
+
+import socket
+import random
+import http.client
+
+from http_engine import VisionHttpError
+
+FAILURE_TRANSIENT_DOM = "transient_dom"
+FAILURE_STALE_SESSION = "stale_session"
+FAILURE_NETWORK = "network"
+FAILURE_SERVER = "server_error"
+FAILURE_FATAL = "fatal"
+FAILURE_UNKNOWN = "unknown"
+
+BACKOFF_BASE = 2.0  # Seconds before the first retry
+BACKOFF_MAX = 120.0  # Upper bound for a single retry delay
+
+
+class UploadFailedError(Exception):
+    """Raised when an upload still fails after all retries."""
+
+    def __init__(self, message, kind):
+        super().__init__(message)
+        self.kind = kind
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """
+    Returns the delay before retry number attempt (0-based): exponential
+    growth, capped at maximum, with "equal jitter" so parallel workers that
+    failed together do not retry in lockstep.
+    """
+    delay = min(maximum, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def classify_http_error(error):
+    """Classifies an exception raised by the direct HTTP engine."""
+    if isinstance(error, VisionHttpError):
+        if error.status in (401, 403):
+            return FAILURE_STALE_SESSION
+        if error.status >= 500 or error.status in (408, 429):
+            return FAILURE_SERVER
+        return FAILURE_FATAL
+    if isinstance(error, (socket.timeout, ConnectionError, http.client.HTTPException)):
+        return FAILURE_NETWORK
+    if isinstance(error, FileNotFoundError):
+        return FAILURE_FATAL
+    if isinstance(error, OSError):
+        return FAILURE_NETWORK
+    return FAILURE_UNKNOWN
@@ -0,0 +1,1425 @@
+"""
+Browser automation for the Vision upload script.
+
+Everything that drives Chrome through Selenium lives here so that the main
+script only imports Selenium once a browser is actually needed.
+"""
+
+import os
+import json
+import time
+import datetime
+import logging
+from urllib.parse import unquote
+from collections import defaultdict
+
+from selenium import webdriver
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.by import By
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from selenium.common.exceptions import (
+    TimeoutException,
+    NoSuchElementException,
+    NoSuchWindowException,
+    InvalidSessionIdException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    WebDriverException,
+)
+
+from adaptive_waits import AdaptiveTimeouts, TransferDeadlines, POLL_INTERVAL
+from phase_metrics import NULL_TIMER
+from session_health import (
+    SESSION_RSS_LIMIT,
+    SessionHealth,
+    SessionSample,
+    process_tree_rss,
+    format_sample,
+)
+from upload_recovery import (
+    FAILURE_TRANSIENT_DOM,
+    FAILURE_STALE_SESSION,
+    FAILURE_NETWORK,
+    FAILURE_SERVER,
+    FAILURE_FATAL,
+    FAILURE_UNKNOWN,
+)
+from upload_reconcile import UnrecognisedListingError
+
+# ------------------------- Configuration & Constants -------------------------
+
+# Centralized selectors and constants.
+SELECTORS = {
+    "create_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Create']]",
+    "continue_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Continue']]",
+    "save_button": "//button[contains(@class, 'v-btn') and .//span[normalize-space()='Save']]",
+    "date_label": "//label[normalize-space(.)='Date *']/following-sibling::input",
+    "module_dropdown": "//*[@data-vv-name and normalize-space(@data-vv-name)='Module']",
+    "survey_dropdown": "//*[@data-vv-name and normalize-space(@data-vv-name)='Survey']",
+    "upload_area": "//div[contains(concat(' ', normalize-space(@class), ' '), ' drop ')]",
+    "active_dialog": "//div[contains(@class, 'v-dialog--active')]",
+    "dialog_dismiss_button": "//div[contains(@class, 'v-dialog--active')]//button[contains(@class, 'v-btn') and .//span[normalize-space()='Cancel' or normalize-space()='Close']]",
+    "save_toast": "//*[contains(text(),'Successfully Saved')]",
+}
+
+FORM_FILL_MODE = (
+    "fast"  # "fast" fills the form in one script call; "picker" clicks through
+)
+DATE_INPUT_FORMAT = "%Y-%m-%d"  # Text format of the date field when set directly
+FAST_FILL_FAILURE_LIMIT = (
+    3  # Failures in a row before a field stops using the fast path
+)
+
+# Starting timeouts (seconds) for each named wait step; these are replaced by
+# learned values once enough latencies have been observed.
+STEP_TIMEOUT_DEFAULTS = {
+    "picker_month_view": 10,
+    "picker_year_view": 10,
+    "dialog_closed": 30,
+    "form_ready": 10,
+    "toast_gone": 15,
+    "page_ready": 30,
+    "record_list": 30,
+    "upload_response": 300,
+}
+STEP_TIMEOUTS = AdaptiveTimeouts(STEP_TIMEOUT_DEFAULTS)
+TRANSFER_DEADLINES = TransferDeadlines()
+
+TRANSFER_POLL_INTERVAL = 0.5  # Seconds between checks of a running transfer
+TRANSFER_STALL_SECONDS = 20  # Seconds without bytes sent before a transfer is dead
+TRANSFER_START_SECONDS = 15  # Seconds a dropped file has to start uploading
+MULTIPART_OVERHEAD = 64 * 1024  # Most bytes a form upload adds to the file's size
+TRANSFER_LOG_INTERVAL = 60  # Seconds between progress lines for long transfers
+
+# ------------------------- Helper Functions -------------------------
+
+
+def wait_for_element(driver, by, value, timeout=10):
+    """Waits for an element to be present and returns it."""
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        EC.presence_of_element_located((by, value))
+    )
+
+
+def wait_for_clickable(driver, by, value, timeout=10):
+    """Waits for an element to be clickable and returns it."""
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        EC.element_to_be_clickable((by, value))
+    )
+
+
+def wait_for_step(driver, step, condition):
+    """
+    Waits until condition holds, using the learned timeout for step, and
+    records how long it took so later timeouts adapt to the real latency.
+    """
+    timeout = STEP_TIMEOUTS.timeout(step)
+    start = time.monotonic()
+    result = WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        condition
+    )
+    STEP_TIMEOUTS.observe(step, time.monotonic() - start)
+    return result
+
+
+def wait_for_page_ready(driver):
+    """Waits until the page has finished loading and the Create buttons are shown."""
+    try:
+        wait_for_step(
+            driver,
+            "page_ready",
+            lambda d: d.execute_script("return document.readyState") == "complete"
+            and d.find_elements(By.XPATH, SELECTORS["create_button"]),
+        )
+    except TimeoutException:
+        logging.warning("Page did not become ready; retrying anyway")
+
+
+def drop_file(driver, file_path, target, offsetX=0, offsetY=0):
+    """
+    Simulates drag-and-drop file upload by injecting a hidden file input.
+    file_path may also be a list of paths, which are dropped together.
+    """
+    JS_DROP_FILE = (
+        "var target = arguments[0],"
+        "    offsetX = arguments[1],"
+        "    offsetY = arguments[2],"
+        "    document = target.ownerDocument || document,"
+        "    window = document.defaultView || window;"
+        "var input = document.createElement('INPUT');"
+        "input.type = 'file';"
+        "input.multiple = true;"
+        "input.style.display = 'none';"
+        "input.onchange = function () {"
+        "  var rect = target.getBoundingClientRect(),"
+        "      x = rect.left + (offsetX || (rect.width >> 1)),"
+        "      y = rect.top + (offsetY || (rect.height >> 1)),"
+        "      dataTransfer = { files: this.files };"
+        "  ['dragenter', 'dragover', 'drop'].forEach(function (name) {"
+        "    var evt = document.createEvent('MouseEvent');"
+        "    evt.initMouseEvent(name, true, true, window, 0, 0, 0, x, y, false, false, false, false, 0, null);"
+        "    evt.dataTransfer = dataTransfer;"
+        "    target.dispatchEvent(evt);"
+        "  });"
+        "  setTimeout(function () { document.body.removeChild(input); }, 25);"
+        "};"
+        "document.body.appendChild(input);"
+        "return input;"
+    )
+    try:
+        input_element = driver.execute_script(JS_DROP_FILE, target, offsetX, offsetY)
+        # Selenium selects several files at once when given one path per line.
+        paths = [file_path] if isinstance(file_path, str) else file_path
+        input_element.send_keys("\n".join(paths))
+    except WebDriverException as e:
+        logging.error("Error dropping file: %s", e)
+        raise
+
+
+# ------------------------- Transfer Tracking -------------------------
+
+# Injected into every page: records the progress of each XMLHttpRequest that
+# sends a file, as Chrome's network events do not report bytes sent.
+JS_TRACK_UPLOADS = """
+(function () {
+  if (window.__visionUploadHook) { return; }
+  window.__visionUploadHook = true;
+  window.__visionUploads = [];
+  var open = XMLHttpRequest.prototype.open, send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.open = function (method, url) {
+    this.__visionRequest = { method: String(method).toUpperCase(), url: String(url) };
+    return open.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.send = function (body) {
+    var info = this.__visionRequest;
+    var isFile = body && ((typeof Blob !== 'undefined' && body instanceof Blob) ||
+                          (typeof FormData !== 'undefined' && body instanceof FormData));
+    if (info && (info.method === 'PUT' || info.method === 'POST') && isFile) {
+      var entry = { url: info.url, loaded: 0, total: body.size || null, done: false, status: null };
+      window.__visionUploads.push(entry);
+      this.upload.addEventListener('progress', function (e) {
+        entry.loaded = e.loaded;
+        if (e.lengthComputable) { entry.total = e.total; }
+      });
+      this.addEventListener('loadend', function () {
+        entry.done = true;
+        entry.status = this.status;
+      });
+    }
+    return send.apply(this, arguments);
+  };
+})();
+"""
+
+JS_RESET_UPLOADS = "window.__visionUploads = [];"
+JS_READ_UPLOADS = "return window.__visionUploads || [];"
+
+
+class TransferFailedError(Exception):
+    """Raised when a file transfer fails, stalls or misses its deadline."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def install_upload_tracking(driver):
+    """Injects the upload progress hook into this and every later page."""
+    try:
+        driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": JS_TRACK_UPLOADS}
+        )
+        driver.execute_script(JS_TRACK_UPLOADS)
+    except WebDriverException as e:
+        logging.debug("Upload progress tracking unavailable: %s", e)
+
+
+class NetworkRequests:
+    """
+    Follows the PUT and POST requests that send the given files, from the
+    DevTools network events in Chrome's performance log, to learn when each
+    one ends and with what HTTP status. A request sends a file if its URL
+    holds the file name or its Content-Length fits the file's size, so other
+    requests the page makes meanwhile are ignored.
+    """
+
+    def __init__(self, driver, file_paths=()):
+        self.driver = driver
+        self.files = [
+            (os.path.basename(path), os.path.getsize(path)) for path in file_paths
+        ]
+        self.requests = {}  # requestId -> {"url", "status", "done", "error"}
+        self._candidates = {}  # requestId -> request not matched to a file yet
+        self._lengths = {}  # requestId -> Content-Length sent
+        self.available = True
+        self.poll()
+        self.requests.clear()  # Only requests made from now on count
+        self._candidates.clear()
+        self._lengths.clear()
+
+    def _sends_file(self, url, length):
+        for name, size in self.files:
+            if name in unquote(url or ""):
+                return True
+            if length is not None and size <= length <= size + MULTIPART_OVERHEAD:
+                return True
+        return not self.files
+
+    def _match(self, request_id):
+        request = self._candidates.get(request_id)
+        if request is not None and self._sends_file(
+            request["url"], self._lengths.get(request_id)
+        ):
+            self.requests[request_id] = self._candidates.pop(request_id)
+
+    def poll(self):
+        if not self.available:
+            return
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException as e:
+            logging.debug("Network events unavailable: %s", e)
+            self.available = False
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method, params = message.get("method"), message.get("params", {})
+            request_id = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                if params["request"].get("method") in ("PUT", "POST"):
+                    self._candidates[request_id] = {
+                        "url": params["request"].get("url"),
+                        "status": None,
+                        "done": False,
+                        "error": None,
+                    }
+                    self._match(request_id)
+            elif method == "Network.requestWillBeSentExtraInfo":
+                headers = {
+                    key.lower(): value
+                    for key, value in params.get("headers", {}).items()
+                }
+                length = headers.get("content-length", "")
+                if length.isdigit():
+                    self._lengths[request_id] = int(length)
+                    self._match(request_id)
+            request = self.requests.get(request_id) or self._candidates.get(request_id)
+            if request is not None:
+                if method == "Network.responseReceived":
+                    request["status"] = params["response"].get("status")
+                elif method == "Network.loadingFinished":
+                    request["done"] = True
+                elif method == "Network.loadingFailed":
+                    request["done"] = True
+                    request["error"] = params.get("errorText") or "failed"
+
+
+def _check_statuses(file_path, results):
+    """Raises TransferFailedError for the first failed (status, error) result."""
+    for status, error in results:
+        if error:
+            raise TransferFailedError(f"Upload of {file_path} failed: {error}", status)
+        if status is not None and not 200 <= status < 400:
+            raise TransferFailedError(
+                f"Upload of {file_path} failed with HTTP {status}", status
+            )
+
+
+def wait_for_transfer(driver, file_path, size, network=None, file_count=1):
+    """
+    Waits for the upload of file_count dropped files, size bytes in all, to
+    finish. The page may send them one after another, so the transfer is
+    only complete once every file was seen to finish. Bytes sent are read
+    from the page's upload hook and completion and status from the network
+    events, falling back to the "Uploading" text where neither is available.
+    A transfer that is not seen to start within TRANSFER_START_SECONDS, or
+    that sends nothing for TRANSFER_STALL_SECONDS, fails straight away; one
+    whose progress cannot be seen fails once it outlives a deadline scaled
+    to its size and the measured throughput.
+    """
+    start = last_progress = last_logged = time.monotonic()
+    deadline = TRANSFER_DEADLINES.deadline(size)
+    sent_at = None  # When the last byte was sent
+    best = -1
+    indicator_seen = False
+    while True:
+        now = time.monotonic()
+        uploads = driver.execute_script(JS_READ_UPLOADS) or []
+        if network is not None:
+            network.poll()
+        requests = list(network.requests.values()) if network is not None else []
+
+        if uploads:
+            sent = sum(upload["loaded"] or 0 for upload in uploads)
+            # Files that have not started yet are only known from size.
+            total = max(sum(upload["total"] or 0 for upload in uploads), size)
+            if sent > best:
+                best, last_progress = sent, now
+            if all(upload["done"] for upload in uploads) and (
+                len(uploads) >= file_count or sent >= size
+            ):
+                _check_statuses(
+                    file_path,
+                    [(upload["status"] or None, None) for upload in uploads]
+                    + [(r["status"], r["error"]) for r in requests if r["done"]],
+                )
+                if any(not upload["status"] for upload in uploads):
+                    raise TransferFailedError(f"Upload of {file_path} was aborted")
+                break
+            if sent >= total:
+                # Everything is sent; the server may still be processing it.
+                sent_at = sent_at or now
+                if now - sent_at > STEP_TIMEOUTS.timeout("upload_response"):
+                    raise TransferFailedError(
+                        f"No response after uploading {file_path}"
+                    )
+            elif now - last_progress > TRANSFER_STALL_SECONDS:
+                raise TransferFailedError(
+                    "Upload of %s stalled at %.1f of %.1f MB"
+                    % (file_path, sent / 1024**2, total / 1024**2)
+                )
+            if now - last_logged >= TRANSFER_LOG_INTERVAL:
+                last_logged = now
+                logging.info(
+                    "Uploading %s: %.1f of %.1f MB (%.1f MB/s)",
+                    os.path.basename(file_path),
+                    sent / 1024**2,
+                    total / 1024**2,
+                    sent / 1024**2 / (now - start),
+                )
+        elif requests:
+            if all(request["done"] for request in requests) and (
+                len(requests) >= file_count
+            ):
+                _check_statuses(
+                    file_path, [(r["status"], r["error"]) for r in requests]
+                )
+                break
+        elif driver.find_elements(By.XPATH, "//*[contains(text(),'Uploading')]"):
+            indicator_seen = True
+        elif indicator_seen:
+            break  # No way to follow the request; the page says it is done.
+        elif now - start > TRANSFER_START_SECONDS:
+            raise TransferFailedError(
+                "Upload of %s did not start within %d s"
+                % (file_path, TRANSFER_START_SECONDS)
+            )
+        if now - start > deadline and not uploads:
+            raise TransferFailedError(
+                "Upload of %s did not finish within %d s" % (file_path, deadline)
+            )
+        time.sleep(TRANSFER_POLL_INTERVAL)
+
+    seconds = time.monotonic() - start
+    if sent_at is not None:
+        STEP_TIMEOUTS.observe("upload_response", time.monotonic() - sent_at)
+    TRANSFER_DEADLINES.observe(size, seconds)
+    logging.info(
+        "File upload completed for %s (%.1f MB/s)",
+        file_path,
+        size / 1024**2 / seconds if seconds else 0.0,
+    )
+
+
+# Maps the text of every table cell to its (row, cell) position, so a level
+# row can later be fetched directly instead of searching the whole page.
+JS_SCRAPE_LEVEL_ROWS = """
+var rows = document.querySelectorAll('tr'), positions = {};
+for (var r = 0; r < rows.length; r++) {
+  for (var c = 0; c < rows[r].cells.length; c++) {
+    var name = rows[r].cells[c].textContent.trim();
+    if (name && !(name in positions)) { positions[name] = [r, c]; }
+  }
+}
+return positions;
+"""
+
+JS_LEVEL_CELL = """
+var row = document.querySelectorAll('tr')[arguments[0]];
+return row ? row.cells[arguments[1]] || null : null;
+"""
+
+
+def scrape_level_rows(driver):
+    """Returns {level name: (row, cell)} for the level table on the current page."""
+    positions = driver.execute_script(JS_SCRAPE_LEVEL_ROWS) or {}
+    logging.debug("Indexed %d level table cells", len(positions))
+    return {name: tuple(position) for name, position in positions.items()}
+
+
+def navigate_to_level(driver, level_dir, level_rows=None):
+    """
+    Attempts to locate and click on a level button (i.e. Deck) on the Vision page.
+    If level_rows (from scrape_level_rows) is given, the level's cell is
+    fetched directly from its row; otherwise the page is searched for it.
+    """
+    position = level_rows.get(level_dir) if level_rows else None
+    if position is not None:
+        cell = driver.execute_script(JS_LEVEL_CELL, *position)
+        if cell is not None and cell.text.strip() == level_dir:
+            cell.click()
+            logging.info("Clicked on level '%s'", level_dir)
+            return
+        logging.debug("Level table has changed; searching for '%s'", level_dir)
+    try:
+        level_button = wait_for_clickable(
+            driver, By.XPATH, f"//tr/td[contains(.,'{level_dir}')]"
+        )
+        level_button.click()
+        logging.info("Clicked on level '%s'", level_dir)
+    except TimeoutException:
+        logging.error("Level '%s' not found on the page.", level_dir)
+        raise
+
+
+def select_date(driver, scan_date, current_date):
+    """
+    Selects the scan date by interacting with a Vuetify date-picker.
+    This version narrows the search for the day button to the date-picker table container.
+    """
+    try:
+        # Click on the date input field.
+        date_input = wait_for_clickable(driver, By.XPATH, SELECTORS["date_label"])
+        driver.execute_script("arguments[0].click();", date_input)
+        logging.debug("Clicked on date input")
+
+        # Select the month/year header
+        header_button_xpath = (
+            "//div[contains(@class, 'v-date-picker-header__value')]//button"
+        )
+        header_button = wait_for_clickable(driver, By.XPATH, header_button_xpath)
+        header_button.click()
+        logging.debug("Clicked on month/year header")
+
+        # Wait for the picker to switch to the month view
+        wait_for_step(
+            driver,
+            "picker_month_view",
+            EC.visibility_of_element_located(
+                (By.XPATH, "//div[contains(@class, 'v-date-picker-table--month')]")
+            ),
+        )
+
+        # Click the header again if necessary to switch to the year selection view.
+        header_button = wait_for_clickable(driver, By.XPATH, header_button_xpath)
+        header_button.click()
+        logging.debug("Clicked on year header")
+
+        # Wait for the year selector to appear
+        wait_for_step(
+            driver,
+            "picker_year_view",
+            EC.visibility_of_element_located(
+                (By.XPATH, "//ul[contains(@class, 'v-date-picker-years')]")
+            ),
+        )
+
+        # Select the specific year for the scan date
+        year_str = scan_date.strftime("%Y")
+        year_xpath = f"//li[contains(.,'{year_str}')]"
+        year_button = wait_for_clickable(driver, By.XPATH, year_xpath)
+        year_button.click()
+        logging.debug("Selected scan year: %s", year_str)
+
+        # Select the desired month
+        month_str = scan_date.strftime("%b")
+        month_xpath = f"//button/div[contains(.,'{month_str}')]"
+        month_button = wait_for_clickable(driver, By.XPATH, month_xpath)
+        month_button.click()
+        logging.debug("Selected scan month: %s", month_str)
+
+        # Prepare the day string without any leading zero.
+        day_str = scan_date.strftime("%d").lstrip("0")
+        logging.debug("Looking for day: %s", day_str)
+
+        # Narrow the scope to only elements inside the date-picker table container.
+        day_button_xpath = f"//div[contains(@class, 'v-date-picker-table--date')]//button[.//div[text()='{day_str}']]"
+        day_button = wait_for_clickable(driver, By.XPATH, day_button_xpath)
+        day_button.click()
+        logging.debug("Selected scan day: %s", day_str)
+
+    except TimeoutException as e:
+        logging.error("Timeout while selecting date: %s", e)
+        raise
+
+
+def select_module(driver, module_text):
+    """
+    Finds the module dropdown, sends the module text, and confirms the selection.
+    """
+    try:
+        dropdown = wait_for_clickable(driver, By.XPATH, SELECTORS["module_dropdown"])
+        dropdown.clear()
+        dropdown.send_keys(module_text)
+        logging.debug("Entered module text: %s", module_text)
+        dropdown.send_keys(Keys.RETURN)
+        logging.debug("Confirmed module selection")
+    except TimeoutException:
+        logging.error("Module dropdown not found.")
+        raise
+
+
+def select_survey(driver, survey_text):
+    """
+    Finds the survey dropdown, sends the survey text, and confirms the selection.
+    """
+    try:
+        dropdown = wait_for_clickable(driver, By.XPATH, SELECTORS["survey_dropdown"])
+        dropdown.clear()
+        dropdown.send_keys(survey_text)
+        logging.debug("Entered survey text: %s", survey_text)
+        dropdown.send_keys(Keys.RETURN)
+        logging.debug("Confirmed survey selection")
+    except TimeoutException:
+        logging.error("Survey dropdown not found.")
+        raise
+
+
+# Sets the date, module and survey fields in a single round trip. Fields that
+# already hold the wanted value are left alone. The autocompletes need a short
+# pause for their item list to filter before Enter selects the match, so this
+# runs as an async script. Each field reports "kept", "set", "failed" or "missing".
+JS_FILL_FORM = """
+var values = arguments[0], xpaths = arguments[1], done = arguments[arguments.length - 1];
+function find(xpath) {
+  return document.evaluate(xpath, document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function selection(input) {
+  var field = input.closest('.v-select');
+  var chip = field && field.querySelector('.v-select__selection');
+  return chip ? chip.textContent.trim() : input.value;
+}
+function setValue(input, value) {
+  var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+  setter.call(input, value);
+  input.dispatchEvent(new Event('input', {bubbles: true}));
+  input.dispatchEvent(new Event('change', {bubbles: true}));
+}
+function pressEnter(input) {
+  ['keydown', 'keyup'].forEach(function (type) {
+    input.dispatchEvent(new KeyboardEvent(type,
+      {key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true}));
+  });
+}
+var result = {};
+var date = find(xpaths.date);
+if (!date) { result.date = 'missing'; }
+else if (date.value === values.date) { result.date = 'kept'; }
+else { setValue(date, values.date); result.date = 'set'; }
+
+var selects = ['module', 'survey'].filter(function (name) { return name in values; });
+function next() {
+  var name = selects.shift();
+  if (!name) {
+    setTimeout(function () {
+      if (result.date === 'set' && find(xpaths.date).value !== values.date) {
+        result.date = 'failed';
+      }
+      done(result);
+    }, 100);
+    return;
+  }
+  var input = find(xpaths[name]);
+  if (!input) { result[name] = 'missing'; return next(); }
+  if (selection(input) === values[name]) { result[name] = 'kept'; return next(); }
+  input.focus();
+  setValue(input, values[name]);
+  setTimeout(function () {
+    pressEnter(input);
+    setTimeout(function () {
+      result[name] = selection(input) === values[name] ? 'set' : 'failed';
+      input.blur();
+      next();
+    }, 150);
+  }, 250);
+}
+next();
+"""
+
+
+class FormFiller:
+    """
+    Fills the date, module and survey fields of the Create form for one driver.
+
+    The values for a date folder are prepared once and reused for consecutive
+    files. Any field the batched script cannot set falls back to the
+    click-through helpers for that file; a field that fails
+    FAST_FILL_FAILURE_LIMIT files in a row skips the fast path for the rest
+    of the session.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.slow_fields = set()
+        self._failures = defaultdict(int)  # field -> fast-path failures in a row
+        self._key = None
+        self._values = None
+
+    def fill(self, scan_date, module_text, survey_text):
+        key = (scan_date, module_text, survey_text)
+        if key != self._key:
+            self._key = key
+            self._values = {
+                "date": scan_date.strftime(DATE_INPUT_FORMAT),
+                "module": module_text,
+                "survey": survey_text,
+            }
+
+        values = {k: v for k, v in self._values.items() if k not in self.slow_fields}
+        result = {}
+        if values:
+            # The dialog renders its fields after Continue; fill them once shown.
+            wait_for_step(
+                self.driver,
+                "form_ready",
+                EC.presence_of_element_located((By.XPATH, SELECTORS["date_label"])),
+            )
+            self.driver.set_script_timeout(10)
+            try:
+                result = self.driver.execute_async_script(
+                    JS_FILL_FORM,
+                    values,
+                    {
+                        "date": SELECTORS["date_label"],
+                        "module": SELECTORS["module_dropdown"],
+                        "survey": SELECTORS["survey_dropdown"],
+                    },
+                )
+            except WebDriverException as e:
+                logging.warning("Batched form fill failed: %s", e)
+                result = {}
+            logging.debug("Batched form fill: %s", result)
+
+        fallbacks = {
+            "date": lambda: select_date(self.driver, scan_date, None),
+            "module": lambda: select_module(self.driver, module_text),
+            "survey": lambda: select_survey(self.driver, survey_text),
+        }
+        for field, fallback in fallbacks.items():
+            if result.get(field) in ("kept", "set"):
+                self._failures[field] = 0
+                continue
+            if field not in self.slow_fields:
+                self._failures[field] += 1
+                logging.debug(
+                    "Fast fill of the %s field gave '%s'; clicking through",
+                    field,
+                    result.get(field),
+                )
+                if self._failures[field] >= FAST_FILL_FAILURE_LIMIT:
+                    logging.info("Using click-through fallback for the %s field", field)
+                    self.slow_fields.add(field)
+            fallback()
+
+
+def upload_scan_file(
+    driver,
+    file_path,
+    scan_date,
+    module_text,
+    survey_text,
+    form_filler=None,
+    timer=NULL_TIMER,
+    wait_for_toast=True,
+):
+    """
+    Executes the full sequence to upload a single scan file, or a list of
+    files from one date folder into a single record.
+    If form_filler is given, the form fields are filled through it; otherwise
+    each field is set by clicking through the widgets. Each step is timed
+    as a phase of timer. Without wait_for_toast, the save is not confirmed
+    here but by reconciling the record list afterwards.
+    """
+    current_date = datetime.datetime.now()
+    file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    if len(file_paths) > 1:
+        # Name the batch in log messages.
+        file_path = "%d files in %s" % (
+            len(file_paths),
+            os.path.dirname(file_paths[0]),
+        )
+
+    # Click the "Create" button (using the 3rd instance of the element, per original script)
+    with timer.phase("create"):
+        try:
+            create_buttons = WebDriverWait(driver, 10).until(
+                EC.presence_of_all_elements_located(
+                    (By.XPATH, SELECTORS["create_button"])
+                )
+            )
+            if len(create_buttons) < 3:
+                raise Exception("Not enough 'Create' buttons found.")
+            create_button = create_buttons[2]
+            wait_for_element(driver, By.XPATH, SELECTORS["create_button"])
+            create_button.click()
+            logging.info("Clicked Create button")
+        except TimeoutException as e:
+            logging.error("Create button not clickable: %s", e)
+            raise
+
+    # Click the "Continue" button
+    with timer.phase("continue"):
+        try:
+            continue_button = wait_for_clickable(
+                driver, By.XPATH, SELECTORS["continue_button"]
+            )
+            continue_button.click()
+            logging.info("Clicked Continue button")
+        except TimeoutException:
+            logging.error("Continue button not clickable.")
+            raise
+
+    if form_filler is not None:
+        # Set the date, module and survey fields in one batched call
+        with timer.phase("form"):
+            form_filler.fill(scan_date, module_text, survey_text)
+    else:
+        # Set the scan date using the date picker
+        with timer.phase("date"):
+            select_date(driver, scan_date, current_date)
+
+        # Set the module field
+        with timer.phase("module"):
+            select_module(driver, module_text)
+
+        # Set the survey field
+        with timer.phase("survey"):
+            select_survey(driver, survey_text)
+
+    # Locate the drop area (by class name) and drop the file
+    with timer.phase("drop"):
+        try:
+            drop_area = wait_for_clickable(driver, By.CLASS_NAME, "drop")
+            driver.execute_script(JS_RESET_UPLOADS)
+            network = NetworkRequests(driver, file_paths)
+            drop_file(driver, file_paths, drop_area)
+            logging.info("Dropped file: %s", file_path)
+        except Exception as e:
+            logging.error("Error during file drop: %s", e)
+            raise
+
+    # Follow the upload until it completes, fails or stalls.
+    with timer.phase("transfer"):
+        wait_for_transfer(
+            driver,
+            file_path,
+            sum(os.path.getsize(path) for path in file_paths),
+            network,
+            len(file_paths),
+        )
+
+    # Click the "Save" button
+    with timer.phase("save"):
+        try:
+            save_button = wait_for_clickable(driver, By.XPATH, SELECTORS["save_button"])
+            save_button.click()
+            logging.info("Clicked Save button for %s", file_path)
+        except TimeoutException:
+            logging.error("Save button not clickable for %s", file_path)
+            raise
+
+    if not wait_for_toast:
+        # Only wait for the dialog to close; the record list is checked later.
+        with timer.phase("settle"):
+            try:
+                wait_for_step(
+                    driver,
+                    "dialog_closed",
+                    EC.invisibility_of_element_located(
+                        (By.XPATH, SELECTORS["save_button"])
+                    ),
+                )
+            except TimeoutException:
+                logging.warning("UI did not settle after saving %s", file_path)
+        return
+
+    # wait for toast saying Saved Successfully by checking for that text anywhere
+    with timer.phase("toast"):
+        try:
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_element_located((By.XPATH, SELECTORS["save_toast"]))
+            )
+            logging.info("File saved successfully for %s", file_path)
+        except TimeoutException:
+            logging.error("Save confirmation not found for %s", file_path)
+            # raise
+
+    # Wait for the UI to settle: the dialog closes and the toast disappears.
+    with timer.phase("settle"):
+        try:
+            wait_for_step(
+                driver,
+                "dialog_closed",
+                EC.invisibility_of_element_located(
+                    (By.XPATH, SELECTORS["save_button"])
+                ),
+            )
+            wait_for_step(
+                driver,
+                "toast_gone",
+                EC.invisibility_of_element_located((By.XPATH, SELECTORS["save_toast"])),
+            )
+        except TimeoutException:
+            logging.warning("UI did not settle after saving %s", file_path)
+
+
+def set_upload_throughput(driver, rate):
+    """
+    Limits the browser's upload rate to rate bytes per second through Chrome's
+    network emulation, or removes the limit if rate is None.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd(
+        "Network.emulateNetworkConditions",
+        {
+            "offline": False,
+            "latency": 0,
+            "downloadThroughput": -1,
+            "uploadThroughput": rate if rate else -1,
+        },
+    )
+
+
+# ------------------------- Failure Recovery -------------------------
+
+
+def classify_browser_error(error):
+    """Classifies an exception raised while driving the upload form."""
+    message = str(error)
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)) or any(
+        text in message
+        for text in ("chrome not reachable", "tab crashed", "page crash")
+    ):
+        return FAILURE_STALE_SESSION
+    if isinstance(error, LoginRequiredError):
+        return FAILURE_STALE_SESSION
+    if isinstance(error, TransferFailedError):
+        if error.status is None:
+            return FAILURE_NETWORK
+        if error.status in (401, 403):
+            return FAILURE_STALE_SESSION
+        if error.status >= 500 or error.status in (408, 429):
+            return FAILURE_SERVER
+        return FAILURE_FATAL
+    if "net::ERR_" in message:
+        return FAILURE_NETWORK
+    if isinstance(
+        error,
+        (
+            TimeoutException,
+            NoSuchElementException,
+            StaleElementReferenceException,
+            ElementClickInterceptedException,
+            ElementNotInteractableException,
+        ),
+    ):
+        return FAILURE_TRANSIENT_DOM
+    return FAILURE_UNKNOWN
+
+
+def close_open_dialogs(driver, timeout=5):
+    """
+    Dismisses any open dialog (a half-filled Create form, a date picker, ...)
+    with Escape, then with its Cancel/Close button. Returns True once no
+    dialog is left open.
+    """
+
+    def no_dialog(d):
+        return not d.find_elements(By.XPATH, SELECTORS["active_dialog"])
+
+    if no_dialog(driver):
+        return True
+    driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
+    for button in driver.find_elements(By.XPATH, SELECTORS["dialog_dismiss_button"]):
+        try:
+            button.click()
+        except WebDriverException:
+            pass  # Already closed by Escape, or hidden behind another dialog
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(no_dialog)
+        return True
+    except TimeoutException:
+        return False
+
+
+JS_HEAP_SIZE = "return performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+
+def is_responsive(driver):
+    """True if Chrome and its page still answer a script call."""
+    try:
+        return driver.execute_script("return 1;") == 1
+    except WebDriverException:
+        return False
+
+
+def sample_session(driver):
+    """Returns a SessionSample of the memory used by a Chrome session."""
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    try:
+        dom_nodes = driver.execute_cdp_cmd("Memory.getDOMCounters", {}).get("nodes")
+    except WebDriverException:
+        dom_nodes = None
+    try:
+        js_heap = driver.execute_script(JS_HEAP_SIZE)
+    except WebDriverException:
+        js_heap = None
+    return SessionSample(
+        rss=process_tree_rss(process.pid if process is not None else None),
+        js_heap=js_heap,
+        dom_nodes=dom_nodes,
+    )
+
+
+# ------------------------- Vision Catalog -------------------------
+
+
+def scrape_vision_catalog(driver):
+    """
+    Returns (levels, surveys) as shown on the current Vision page. The level
+    list holds the text of every cell of the level table. The survey list is
+    always empty, so surveys are not checked: it is only shown in the Create
+    form after Continue, and getting that far starts a draft record that
+    cancelling the form leaves behind in Vision.
+    """
+    wait_for_page_ready(driver)
+    levels = sorted(scrape_level_rows(driver))
+    logging.info(
+        "Survey names can only be checked when Vision lists them over HTTP; "
+        "checking level names only"
+    )
+    return levels, []
+
+
+# Reads the record list of the open level: one row per file, with the date,
+# survey, file name, size and status shown in its cells.
+JS_SCRAPE_RECORDS = """
+var list = document.querySelector('.records');
+if (!list || list.getAttribute('data-level') !== arguments[0]) { return null; }
+return {rows: Array.prototype.map.call(list.querySelectorAll('.record-row'), function (row) {
+  return {
+    id: row.getAttribute('data-record-id'),
+    cells: Array.prototype.map.call(row.children, function (cell) {
+      return cell.textContent.trim();
+    })
+  };
+})};
+"""
+
+
+def scrape_level_records(driver, level):
+    """
+    Opens level on the current Vision page and returns its records in the
+    form of the HTTP record list, read from the page in one pass. Raises
+    UnrecognisedListingError if the page shows no record list for the level,
+    or its rows are not in the expected form.
+    """
+    wait_for_page_ready(driver)
+    navigate_to_level(driver, level, scrape_level_rows(driver))
+    # The list is only returned once it shows the level, even if it is empty.
+    try:
+        listing = wait_for_step(
+            driver,
+            "record_list",
+            lambda d: d.execute_script(JS_SCRAPE_RECORDS, level),
+        )
+    except TimeoutException:
+        raise UnrecognisedListingError(
+            "the page of level '%s' shows no record list" % level
+        )
+    records = {}
+    for row in listing["rows"]:
+        if not row["id"] or len(row["cells"]) != 5:
+            raise UnrecognisedListingError("unrecognised record row %.100r" % (row,))
+        scan_date, survey, name, size, status = row["cells"]
+        record = records.setdefault(
+            row["id"],
+            {
+                "id": row["id"],
+                "date": scan_date,
+                "survey": survey,
+                "level": level,
+                "saved": status == "Saved",
+                "files": {},
+            },
+        )
+        record["files"][name] = int(size) if size.isdigit() else None
+    return list(records.values())
+
+
+# ------------------------- Sessions & Login -------------------------
+
+
+class LoginRequiredError(Exception):
+    """Raised when the saved session has expired and no one is there to log in."""
+
+
+def create_driver(headless=False, profile_dir=None):
+    """
+    Starts a new Chrome session. Headless sessions use a fixed desktop-sized
+    window; visible ones are maximized. If profile_dir is given, Chrome keeps
+    its cookies and storage there between runs.
+    """
+    options = webdriver.ChromeOptions()
+    # DevTools network events are read from the performance log.
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+    driver = webdriver.Chrome(options=options)
+    install_upload_tracking(driver)
+    if not headless:
+        driver.maximize_window()
+    return driver
+
+
+def add_cookies(driver, cookies, url):
+    """Loads url (cookies can only be set for the current domain) and adds cookies."""
+    driver.get(url)
+    for cookie in cookies:
+        cookie = dict(cookie)
+        cookie.pop("sameSite", None)
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException as e:
+            logging.warning("Could not copy cookie '%s': %s", cookie.get("name"), e)
+    driver.get(url)
+
+
+def share_session(source_driver, target_driver, url):
+    """
+    Copies the authenticated session cookies from one driver into another so
+    that only a single manual login is needed for all workers.
+    """
+    add_cookies(target_driver, source_driver.get_cookies(), url)
+
+
+def is_logged_in(driver, timeout=10):
+    """True if the Vision page shows the Create buttons, i.e. the session is valid."""
+    try:
+        wait_for_element(driver, By.XPATH, SELECTORS["create_button"], timeout)
+        return True
+    except TimeoutException:
+        return False
+
+
+def save_session_cookies(driver, cookie_path):
+    """Stores the current session cookies so later runs can skip the login."""
+    os.makedirs(os.path.dirname(os.path.abspath(cookie_path)), exist_ok=True)
+    with open(cookie_path, "w") as f:
+        json.dump(driver.get_cookies(), f)
+    logging.debug("Saved session cookies to %s", cookie_path)
+
+
+def load_session_cookies(cookie_path):
+    """Returns previously saved session cookies, or an empty list."""
+    try:
+        with open(cookie_path, "r") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return []
+
+
+def login_to_vision(driver, url, cookie_path=None, interactive=True):
+    """
+    Navigates to Vision and makes sure the session is logged in. A persistent
+    browser profile or saved session cookies are tried first; only if those
+    have expired does the user have to log in manually. Raises
+    LoginRequiredError if a manual login is needed but interactive is False.
+    """
+    driver.get(url)
+    logging.info("Navigated to %s", url)
+
+    saved_cookies = load_session_cookies(cookie_path) if cookie_path else []
+    if is_logged_in(driver, timeout=5):
+        logging.info("Reusing the logged-in browser profile")
+    else:
+        if saved_cookies:
+            add_cookies(driver, saved_cookies, url)
+        if saved_cookies and is_logged_in(driver, timeout=5):
+            logging.info("Restored saved session cookies")
+        elif interactive:
+            input(
+                "Log in to Vision and then press Enter to continue..."
+            )  # Manual login
+        else:
+            raise LoginRequiredError(
+                "The saved Vision session has expired. Run once without "
+                "--unattended and --headless to log in again."
+            )
+
+    if cookie_path:
+        save_session_cookies(driver, cookie_path)
+
+
+class BrowserUploader:
+    """
+    Uploads jobs by driving the Vision web form in a Chrome session.
+
+    After a failure, recover() puts the browser back on the current level's
+    page with no dialog open, so the next attempt starts from a known state.
+    With a SessionHealth, the session is checked before every file and
+    replaced by a fresh Chrome when it has crashed, lost its login or worn
+    out; a crashed session is also replaced when recovering. Without one,
+    sessions are never replaced.
+    """
+
+    def __init__(
+        self,
+        driver,
+        module_text,
+        form_fill_mode=FORM_FILL_MODE,
+        home_url=None,
+        cookie_path=None,
+        confirmed_levels=(),
+        headless=False,
+        profile_dir=None,
+        health=None,
+    ):
+        self.driver = driver
+        self.module_text = module_text
+        self.form_fill_mode = form_fill_mode
+        self.form_filler = FormFiller(driver) if form_fill_mode == "fast" else None
+        self.home_url = home_url or driver.current_url
+        self.cookie_path = cookie_path
+        self.current_level = None
+        self.level_rows = None
+        self.upload_limit = None
+        self.confirmed_levels = confirmed_levels
+        # How to start a replacement for this session's Chrome.
+        self.driver_options = {"headless": headless, "profile_dir": profile_dir}
+        self.health = health
+
+    def open_level(self, survey, level):
+        if self.level_rows is None:
+            # Index the level table once per page load.
+            wait_for_page_ready(self.driver)
+            self.level_rows = scrape_level_rows(self.driver)
+        elif level not in self.level_rows:
+            # The level may have been added since the table was indexed.
+            self.level_rows = scrape_level_rows(self.driver)
+        navigate_to_level(self.driver, level, self.level_rows)
+        self.current_level = level
+
+    def upload(self, job, timer=NULL_TIMER):
+        self._upload(job.file_path, job, timer)
+
+    def upload_batch(self, jobs, timer=NULL_TIMER):
+        """Uploads jobs from one date folder into a single record."""
+        self._upload([job.file_path for job in jobs], jobs[0], timer)
+
+    def _upload(self, file_path, job, timer):
+        if self.health is not None:
+            self.supervise()
+            timer = self.health.track(timer)
+        upload_scan_file(
+            self.driver,
+            file_path,
+            job.scan_date,
+            self.module_text,
+            job.survey,
+            form_filler=self.form_filler,
+            timer=timer,
+            # Saves on these levels are confirmed from the record list later.
+            wait_for_toast=job.level not in self.confirmed_levels,
+        )
+        if self.health is not None:
+            self.health.finish_file(timer)
+
+    def limit_bandwidth(self, rate):
+        """Caps this session's upload rate (bytes per second); None removes the cap."""
+        rate = int(rate) if rate else None
+        if rate != self.upload_limit:
+            set_upload_throughput(self.driver, rate)
+            self.upload_limit = rate
+
+    def classify(self, error):
+        return classify_browser_error(error)
+
+    def recover(self, kind):
+        """Returns the browser to the current level page after a failure of kind."""
+        if kind == FAILURE_TRANSIENT_DOM:
+            try:
+                if close_open_dialogs(self.driver):
+                    return
+            except WebDriverException as e:
+                logging.debug("Could not close dialogs: %s", e)
+            logging.info("Dialog would not close; reloading the page")
+        if (
+            self.health is not None
+            and kind == FAILURE_STALE_SESSION
+            and not is_responsive(self.driver)
+        ):
+            self.recycle(["the browser stopped responding"])
+            return
+        self.reload(restore_session=kind == FAILURE_STALE_SESSION)
+
+    def reload(self, restore_session=False):
+        """
+        Reloads Vision and re-opens the current level. If restore_session is
+        set and the session has lapsed, the saved cookies are loaded again.
+        """
+        self.driver.get(self.home_url)
+        self.level_rows = None
+        if restore_session and not is_logged_in(self.driver, timeout=5):
+            cookies = load_session_cookies(self.cookie_path) if self.cookie_path else []
+            if cookies:
+                add_cookies(self.driver, cookies, self.home_url)
+            if not is_logged_in(self.driver, timeout=5):
+                raise LoginRequiredError("The Vision session has expired.")
+            logging.info("Restored the Vision session from saved cookies")
+        wait_for_page_ready(self.driver)
+        if self.current_level is not None:
+            self.level_rows = scrape_level_rows(self.driver)
+            navigate_to_level(self.driver, self.current_level, self.level_rows)
+
+    # ----- Session health -----
+
+    def supervise(self):
+        """
+        Checks the session between files, and recycles it if Chrome stopped
+        responding, the login lapsed, or its memory or step latency is past
+        the SessionHealth limits.
+        """
+        if not is_responsive(self.driver):
+            self.recycle(["the browser stopped responding"])
+        elif not is_logged_in(self.driver, timeout=5):
+            self.recycle(["the Vision login lapsed"])
+        else:
+            sample = sample_session(self.driver)
+            reasons = self.health.recycle_reasons(sample)
+            if reasons:
+                self.recycle(reasons, sample)
+
+    def recycle(self, reasons, before=None):
+        """
+        Replaces this session's Chrome with a fresh one, logs it in with the
+        session cookies (the live ones, else the saved ones) and re-opens the
+        current level. Raises LoginRequiredError if neither set still works.
+        """
+        logging.info("Recycling the browser session: %s", "; ".join(reasons))
+        started = time.monotonic()
+        files = self.health.files if self.health is not None else None
+        if before is None and is_responsive(self.driver):
+            before = sample_session(self.driver)
+        try:
+            live_cookies = self.driver.get_cookies()
+        except WebDriverException:
+            live_cookies = []
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            logging.debug("Could not quit the old browser session: %s", e)
+
+        self.driver = create_driver(**self.driver_options)
+        if self.form_fill_mode == "fast":
+            self.form_filler = FormFiller(self.driver)
+        self.level_rows = None
+        self.driver.get(self.home_url)
+        saved_cookies = (
+            load_session_cookies(self.cookie_path) if self.cookie_path else []
+        )
+        for cookies in (live_cookies, saved_cookies):
+            if is_logged_in(self.driver, timeout=5):
+                break
+            if cookies:
+                add_cookies(self.driver, cookies, self.home_url)
+        if not is_logged_in(self.driver, timeout=5):
+            raise LoginRequiredError(
+                "The Vision session could not be restored in a new browser."
+            )
+        if self.upload_limit:
+            set_upload_throughput(self.driver, self.upload_limit)
+        wait_for_page_ready(self.driver)
+        if self.current_level is not None:
+            self.level_rows = scrape_level_rows(self.driver)
+            navigate_to_level(self.driver, self.current_level, self.level_rows)
+
+        after = sample_session(self.driver)
+        logging.info(
+            "Browser session recycled in %.1f s%s. Before: %s. After: %s.",
+            time.monotonic() - started,
+            " after %d files" % files if files is not None else "",
+            format_sample(before) if before is not None else "not responding",
+            format_sample(after),
+        )
+        if self.health is not None:
+            self.health.recycled()
+
+    def close(self):
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            logging.debug("Could not quit the browser session: %s", e)
+
+
+def create_browser_uploaders(
+    primary_driver,
+    worker_count,
+    url,
+    module_text,
+    form_fill_mode=FORM_FILL_MODE,
+    headless=False,
+    cookie_path=None,
+    confirmed_levels=(),
+    profile_dir=None,
+    recycle=True,
+    rss_limit=SESSION_RSS_LIMIT,
+):
+    """
+    Returns up to worker_count BrowserUploaders. The primary driver must already
+    be logged in; additional sessions reuse its cookies and start on the same
+    page, which is also where each uploader returns to when recovering.
+    profile_dir is the primary driver's profile. Unless recycle is False, each
+    session is replaced when it wears out or Chrome uses more than rss_limit.
+    On confirmed_levels the save toast is not waited for.
+    """
+
+    def health():
+        return SessionHealth(rss_limit=rss_limit) if recycle else None
+
+    home_url = primary_driver.current_url or url
+    uploaders = [
+        BrowserUploader(
+            primary_driver,
+            module_text,
+            form_fill_mode,
+            home_url,
+            cookie_path,
+            confirmed_levels,
+            headless,
+            profile_dir,
+            health(),
+        )
+    ]
+    for worker_id in range(1, worker_count):
+        try:
+            driver = create_driver(headless=headless)
+            share_session(primary_driver, driver, home_url)
+            uploaders.append(
+                BrowserUploader(
+                    driver,
+                    module_text,
+                    form_fill_mode,
+                    home_url,
+                    cookie_path,
+                    confirmed_levels,
+                    headless,
+                    health=health(),
+                )
+            )
+        except WebDriverException as e:
+            logging.error("Could not start browser session %d: %s", worker_id, e)
+    return uploaders
@@ -0,0 +1,82 @@
+"""
+Preflight check of folder names against the surveys and levels in Vision.
+
+Survey and level folders must be named exactly as in Vision. A wrong level
+otherwise only shows up when the level cannot be found on the page, and a
+wrong survey may even be saved under whichever survey the dropdown matched.
+The names are fetched from Vision once and every folder in the job list is
+checked before the upload starts, with close matches suggested for any that
+are not found.
+"""
+
+import difflib
+import logging
+from collections import Counter, namedtuple
+
+MATCH_CUTOFF = 0.6  # difflib similarity needed for a name to be suggested
+MAX_SUGGESTIONS = 3
+
+# A folder name that does not exist in Vision.
+NameMismatch = namedtuple("NameMismatch", ["kind", "name", "file_count", "suggestions"])
+
+
+def suggest_names(name, candidates):
+    """Returns up to MAX_SUGGESTIONS Vision names that name was probably meant to be."""
+    folded = {candidate.casefold(): candidate for candidate in candidates}
+    exact_but_case = folded.get(name.casefold())
+    matches = difflib.get_close_matches(
+        name.casefold(), list(folded), n=MAX_SUGGESTIONS, cutoff=MATCH_CUTOFF
+    )
+    suggestions = [folded[match] for match in matches]
+    if exact_but_case is not None:
+        suggestions = [exact_but_case] + [s for s in suggestions if s != exact_but_case]
+    return suggestions[:MAX_SUGGESTIONS]
+
+
+def find_mismatches(jobs, levels, surveys):
+    """
+    Returns a NameMismatch for every survey and level folder used by jobs that
+    is not in Vision. An empty levels or surveys list is not checked.
+    """
+    mismatches = []
+    for kind, names, counts in (
+        ("survey", surveys, Counter(job.survey for job in jobs)),
+        ("level", levels, Counter(job.level for job in jobs)),
+    ):
+        if not names:
+            continue
+        known = set(names)
+        for name, count in sorted(counts.items()):
+            if name not in known:
+                mismatches.append(
+                    NameMismatch(kind, name, count, suggest_names(name, names))
+                )
+    return mismatches
+
+
+def log_mismatches(mismatches):
+    """Logs the folders that do not match Vision, with suggested names."""
+    logging.error("%d folder names do not exist in Vision:", len(mismatches))
+    for mismatch in mismatches:
+        hint = (
+            "did you mean " + " or ".join(f"'{s}'" for s in mismatch.suggestions) + "?"
+            if mismatch.suggestions
+            else "no similar name found"
+        )
+        logging.error(
+            "  %s folder '%s' (%d files): %s",
+            mismatch.kind.capitalize(),
+            mismatch.name,
+            mismatch.file_count,
+            hint,
+        )
+
+
+def filter_mismatched(jobs, mismatches):
+    """Returns the jobs whose survey and level folders both exist in Vision."""
+    bad = {(m.kind, m.name) for m in mismatches}
+    return [
+        job
+        for job in jobs
+        if ("survey", job.survey) not in bad and ("level", job.level) not in bad
+    ]